@@ -5,10 +5,13 @@ from .compiler_handler import CompilerHandler
 from .file_handler import FileHandler
 from .helpers import change_dir, run_sub_process
 from .logging_setup import setup_logging
+from .manifest import Manifest
 from .wrappers import (
     CompilerCommands,
     CompilerWrapper,
+    CythonBuildWrapper,
     CythonWrapper,
+    NuitkaPackageWrapper,
     NuitkaWrapper,
 )
 
@@ -18,8 +21,11 @@ __all__ = [
     "change_dir",
     "run_sub_process",
     "setup_logging",
+    "Manifest",
     "CompilerCommands",
     "CompilerWrapper",
+    "CythonBuildWrapper",
     "CythonWrapper",
+    "NuitkaPackageWrapper",
     "NuitkaWrapper",
 ]
@@ -0,0 +1,307 @@
+"""
+Cython annotation reports, ranking the lines (and the functions) of the
+compiled modules by their interaction with the Python C-API.
+"""
+import ast
+import html
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.helpers import Colors
+from src.hot_modules import load_line_profile
+from src.manifest import MANIFEST_DIR
+from src.results import render_table
+
+logger = logging.getLogger(__name__)
+
+# The directory of the `.pycompile` one where the annotated modules are kept.
+ANNOTATE_DIR = "annotate"
+# The lines (and the functions) within the printed rankings.
+TOP_LINES = 15
+# A source line of the `cython -a` report, with its score and its number.
+SCORE_LINE = re.compile(
+    r'<pre class="cython line score-(?P<score>\d+)"[^>]*>[^<]*'
+    r'<span class="">(?P<line>\d+)</span>: (?P<code>.*?)</pre>'
+)
+MODULE_SCOPE = "<module>"
+
+
+@dataclass
+class LineScore:
+    """
+    The Python C-API interaction ``score`` of a source line, as reported by
+    ``cython -a``, with the CPU (self) time of the line within the last
+    profiled run and the function it belongs to.
+    """
+
+    path: Path
+    line: int
+    score: int
+    code: str
+    function: str = MODULE_SCOPE
+    seconds: float = 0.0
+
+    @property
+    def weighted(self) -> float:
+        """
+        The score weighted by the CPU time of the line.
+        """
+        return self.score * self.seconds
+
+
+def parse_annotation(report: str) -> dict[int, tuple[int, str]]:
+    """
+    The score and the source code of each line of a ``cython -a``
+    HTML ``report``.
+    """
+    scores = {}
+    for match in SCORE_LINE.finditer(report):
+        code = html.unescape(re.sub(r"<[^>]+>", "", match["code"]))
+        scores[int(match["line"])] = (int(match["score"]), code.strip())
+    return scores
+
+
+def enclosing_functions(source: str) -> dict[int, str]:
+    """
+    The (qualified) name of the innermost function of each line
+    of the ``source`` within any function.
+    """
+    functions: dict[int, str] = {}
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(
+                child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+            ):
+                name = f"{prefix}{child.name}"
+                if not isinstance(child, ast.ClassDef):
+                    first = min(
+                        [child.lineno]
+                        + [
+                            decorator.lineno
+                            for decorator in child.decorator_list
+                        ]
+                    )
+                    for line in range(first, (child.end_lineno or first) + 1):
+                        functions[line] = name
+                visit(child, f"{name}.")
+            else:
+                visit(child, prefix)
+
+    visit(ast.parse(source), "")
+    return functions
+
+
+def annotate_module(file_path: Path, output_dir: Path) -> Optional[Path]:
+    """
+    Runs ``cython -a`` on the ``file_path`` module, its augmenting ``.pxd``
+    file (if any) is taken into account as well.
+
+    :return: the HTML report within the ``output_dir``,
+             ``None`` if ``cython`` failed.
+    """
+    file_path = Path(file_path).resolve()
+    report = Path(output_dir) / f"{file_path.stem}.html"
+    with tempfile.TemporaryDirectory() as build_dir:
+        cmd = [
+            sys.executable,
+            "-m",
+            "cython",
+            "-3",
+            "--annotate",
+            str(file_path),
+            "-o",
+            str(Path(build_dir) / f"{file_path.stem}.c"),
+        ]
+        process = subprocess.run(
+            cmd, cwd=file_path.parent, capture_output=True, check=False
+        )
+        built = Path(build_dir) / f"{file_path.stem}.html"
+        if process.returncode or not built.is_file():
+            logger.warning(
+                "%sFailed to annotate: `%s`, %s%s",
+                Colors.WARNING,
+                file_path,
+                process.stderr.decode(errors="replace").strip(),
+                Colors.RESET,
+            )
+            return None
+        report.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(built, report)
+    return report
+
+
+def line_scores(
+    file_path: Path,
+    report: str,
+    line_seconds: Optional[dict[int, float]] = None,
+) -> list[LineScore]:
+    """
+    The scored lines of the ``file_path`` module from its ``cython -a``
+    HTML ``report``, with the CPU time of each line (``line_seconds``).
+    The lines without any interaction are skipped.
+    """
+    line_seconds = line_seconds or {}
+    functions = enclosing_functions(Path(file_path).read_text(encoding="utf-8"))
+    return [
+        LineScore(
+            path=Path(file_path),
+            line=line,
+            score=score,
+            code=code,
+            function=functions.get(line, MODULE_SCOPE),
+            seconds=line_seconds.get(line, 0.0),
+        )
+        for line, (score, code) in parse_annotation(report).items()
+        if score
+    ]
+
+
+def rank_lines(scores: list[LineScore], weighted: bool) -> list[LineScore]:
+    """
+    Ranks the lines by their ``weighted`` score (if there is a profile),
+    then by their score.
+    """
+    return sorted(
+        scores,
+        key=lambda score: (
+            score.weighted if weighted else 0.0,
+            score.score,
+        ),
+        reverse=True,
+    )
+
+
+def rank_functions(
+    scores: list[LineScore], weighted: bool
+) -> list[tuple[str, int, float, float]]:
+    """
+    Ranks the functions of the modules by the (``weighted``) score of their
+    lines, the module level lines are left out, they only run on import.
+
+    :return: the name, the score, the CPU time and the weighted score
+             of each function.
+    """
+    functions: dict[tuple[Path, str], list[LineScore]] = {}
+    for score in scores:
+        if score.function != MODULE_SCOPE:
+            functions.setdefault((score.path, score.function), []).append(score)
+    ranking = [
+        (
+            f"{path.stem}.{function}",
+            sum(score.score for score in lines),
+            sum(score.seconds for score in lines),
+            sum(score.weighted for score in lines),
+        )
+        for (path, function), lines in functions.items()
+    ]
+    return sorted(
+        ranking,
+        key=lambda item: (item[3] if weighted else 0.0, item[1]),
+        reverse=True,
+    )
+
+
+def annotation_tables(
+    scores: list[LineScore], root: Path, weighted: bool, top: int = TOP_LINES
+) -> str:
+    """
+    Renders the ``top`` lines and functions with the heaviest Python
+    interaction in human-readable tables.
+    """
+    line_rows = [["", "function", "score", "CPU (s)", "weighted", "code"]]
+    for score in rank_lines(scores, weighted)[:top]:
+        try:
+            name = score.path.relative_to(root).as_posix()
+        except ValueError:
+            name = score.path.as_posix()
+        line_rows.append(
+            [
+                f"{name}:{score.line}",
+                score.function,
+                str(score.score),
+                f"{score.seconds:.3f}" if weighted else "-",
+                f"{score.weighted:.3f}" if weighted else "-",
+                score.code[:40],
+            ]
+        )
+    function_rows = [["", "score", "CPU (s)", "weighted"]]
+    for name, total, seconds, weighted_score in rank_functions(
+        scores, weighted
+    )[:top]:
+        function_rows.append(
+            [
+                name,
+                str(total),
+                f"{seconds:.3f}" if weighted else "-",
+                f"{weighted_score:.3f}" if weighted else "-",
+            ]
+        )
+    return (
+        render_table("Python interaction hot spots (lines)", line_rows)
+        + "\n\n"
+        + render_table(
+            "Python interaction hot spots (functions)", function_rows
+        )
+    )
+
+
+def annotate_from_options(
+    input_path: Path, files: dict[str, list[Path]], annotate: bool
+) -> list[LineScore]:
+    """
+    Annotates the ``files`` with ``cython -a`` (printing their hot spots),
+    if ``annotate`` is set. The HTML reports are kept within the
+    ``.pycompile/annotate`` directory next to the ``input_path``, and the
+    lines are weighted by the last ``--hot-only`` profile, if there is one.
+
+    :param input_path: the compiled folder.
+    :param files: the files to be compiled within each directory.
+    :param annotate: annotate the files.
+    """
+    if not annotate:
+        return []
+    input_path = Path(input_path).resolve()
+    root = input_path if input_path.is_dir() else input_path.parent
+    profile = load_line_profile(input_path)
+    scores = []
+    for dir_files in files.values():
+        for file in dir_files:
+            file = Path(file).resolve()
+            output_dir = (
+                root
+                / MANIFEST_DIR
+                / ANNOTATE_DIR
+                / Path(os.path.relpath(file.parent, root))
+            )
+            report = annotate_module(file, output_dir)
+            if report is not None:
+                scores += line_scores(
+                    file,
+                    report.read_text(encoding="utf-8"),
+                    line_seconds=profile.get(file),
+                )
+    if not scores:
+        return scores
+    weighted = any(score.seconds for score in scores)
+    if not weighted:
+        logger.info(
+            "%sNo profile of the modules, run with `--hot-only` "
+            "to weight the hot spots by their CPU time%s",
+            Colors.CYAN,
+            Colors.RESET,
+        )
+    print(
+        f"{Colors.CYAN}{annotation_tables(scores, root, weighted)}\n"
+        f"Annotated modules are kept within: "
+        f"`{root / MANIFEST_DIR / ANNOTATE_DIR}`{Colors.RESET}"
+    )
+    return scores
@@ -1,18 +1,85 @@
 """
 Benchmark implementation
 """
+import json
 import logging
+import multiprocessing
+import os
+import platform
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import asdict
 from pathlib import Path
-from typing import Sequence
+from typing import Optional, Sequence
 
-from src import CompilerWrapper
+from src import CompilerWrapper, NuitkaPackageWrapper
+from src.cache import ArtifactCache
 from src.compiler_handler import CompilerHandler
+from src.daemon import DaemonClient
 from src.file_handler import FileHandler
-from src.helpers import Colors, copy_files, decorate_functions, run_pytest
+from src.helpers import Colors, decorate_functions
+from src.isolated import IsolatedRun, run_isolated
+from src.memory_sampler import DEFAULT_INTERVAL
+from src.stats import SamplingOptions, relative_ci, summarize
+from src.type_stubs import TypedCythonWrapper
+from src.workspace import workspace
 
 logger = logging.getLogger(__name__)
 
+BENCHMARK_WRAPPER = """def benchmark_wrapper(fn):
+                                        def inner(benchmark):
+                                            benchmark(fn)
+                                        return inner
+                        """
+
+# The engine name of the (not compiled) python baseline.
+BASELINE = f"{platform.python_implementation()} {platform.python_version()}"
+# The memory benchmark backends.
+PROFILE_BACKEND = "profile"
+RSS_BACKEND = "rss"
+TRACEMALLOC_BACKEND = "tracemalloc"
+# The number of allocation sites reported by the `tracemalloc` backend.
+TOP_SITES = 10
+# The `pytest` arguments of the memory and the cpu benchmarks.
+PYTEST_ARGS = ["-vv", "-s", "--durations=10"]
+
+
+def _physical_cores(cpus: set[int]) -> list[list[int]]:
+    """
+    Groups the logical ``cpus`` by their physical core (SMT siblings),
+    every cpu is its own core when the topology isn't available.
+    """
+    cores: dict[str, list[int]] = {}
+    for cpu in sorted(cpus):
+        siblings = Path(
+            f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list"
+        )
+        try:
+            core = siblings.read_text(encoding="ascii").strip()
+        except OSError:
+            core = str(cpu)
+        cores.setdefault(core, []).append(cpu)
+    return list(cores.values())
+
+
+def isolated_core_sets(engines: int) -> Optional[list[set[int]]]:
+    """
+    A disjoint set of cpus for each of the ``engines``, one logical cpu
+    of a distinct physical core each, so the benchmarks don't share
+    any execution units.
+
+    :return: None when there aren't enough physical cores
+             (or the cpu affinity isn't supported).
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    cores = _physical_cores(os.sched_getaffinity(0))
+    if len(cores) < engines:
+        return None
+    return [{core[0]} for core in cores[:engines]]
+
 
 class Benchmark:
     """
@@ -60,28 +127,81 @@ class Benchmark:
       actual python functions), and neither we can do for compiled code
       with python *profiling tools*, but it could be an indicator.
 
+    * the ``rss`` memory backend doesn't need any of the above, it samples the
+      RSS and PSS of the (unmodified) test runs of each engine instead.
+
+    * the ``tracemalloc`` memory backend traces the allocations of each
+      (unmodified) test instead, the compiled code allocates through the
+      python allocators as well, so its blocks and bytes are comparable.
+
     * The ``test files`` are needed to be able to execute the functions with the right arguments.
     """
 
-    def __init__(self, input_path: Path):
+    def __init__(  # pylint: disable=R0913 R0917
+        self,
+        input_path: Path,
+        cache: Optional[ArtifactCache] = None,
+        daemon: Optional[DaemonClient] = None,
+        sampling: Optional[SamplingOptions] = None,
+        memory_backend: str = PROFILE_BACKEND,
+        sample_interval: float = DEFAULT_INTERVAL,
+    ):
+        """
+        :param input_path: the directory with the files to be benchmarked.
+        :param cache: when it's given, the executables are restored from it
+                      instead of being recompiled on each run.
+        :param daemon: when it's given, the files are compiled
+                       by the warm compiler daemon.
+        :param sampling: how the cpu benchmark of each test is sampled.
+        :param memory_backend: ``profile`` runs the memory benchmark with
+                               ``memory-profiler``, ``rss`` samples the
+                               RSS and PSS of the test runs and
+                               ``tracemalloc`` traces their allocations.
+        :param sample_interval: the seconds between the RSS samples.
+        """
         self.input_path = input_path
+        self.cache = cache
+        self.daemon = daemon
+        self.sampling = sampling or SamplingOptions()
+        self.memory_backend = memory_backend
+        self.sample_interval = sample_interval
+        self.runs: list[IsolatedRun] = []
 
     @staticmethod
-    def _compile(
-        compiler: CompilerWrapper, temp_dir: Path, prof_func_name: str
+    def _compile(  # pylint: disable=R0914
+        compiler: CompilerWrapper,
+        temp_dir: Path,
+        prof_func_name: str,
+        cache: Optional[ArtifactCache] = None,
+        daemon: Optional[DaemonClient] = None,
     ) -> None:
+        if isinstance(compiler, TypedCythonWrapper):
+            compiler.write_stubs(temp_dir)
         additional_exclude_patterns = [f"*{prof_func_name}.py"]
-        dir_files = FileHandler(
+        file_handler = FileHandler(
             input_path=temp_dir,
             additional_exclude_patterns=additional_exclude_patterns,
-        ).start()
-        compiler_handler = CompilerHandler(
-            files=dir_files,
-            compiler=compiler,
-            clean_source=True,
-            keep_builds=False,
         )
-        compiler_handler.start()
+        dir_files = file_handler.start()
+        jobs_files = [(compiler, dir_files)]
+        if isinstance(compiler, NuitkaPackageWrapper):
+            packages, modules = file_handler.split_packages(
+                dir_files, include_root=False
+            )
+            jobs_files = [
+                (compiler, packages),
+                (compiler.module_compiler(), modules),
+            ]
+        for job_compiler, files in jobs_files:
+            compiler_handler = CompilerHandler(
+                files=files,
+                compiler=job_compiler,
+                clean_source=True,
+                keep_builds=False,
+                cache=cache,
+                daemon=daemon,
+            )
+            compiler_handler.start()
 
         exe_files = [file.name for file in temp_dir.glob("*.so")]
         test_files = [file.name for file in temp_dir.glob("*.py")]
@@ -96,13 +216,15 @@ class Benchmark:
         )
 
     @staticmethod
-    def mem_bench(input_path: Path, prof_func_name: str, engine: str) -> None:
+    def mem_bench(
+        input_path: Path, prof_func_name: str, engine: str
+    ) -> IsolatedRun:
         """
         decorate all the function(s) from the ``input_path`` where their name match
         the ``prof_func_name`` pattern,
         with the ``@profile`` decorator from ``memory_profiler``.
 
-        Finally, invoke pytest within.
+        Finally, invoke pytest within, in a fresh interpreter.
         """
         logger.info(
             "%s Memory benchmark using:`%s` %s",
@@ -110,7 +232,7 @@ class Benchmark:
             engine,
             Colors.RESET,
         )
-        with copy_files(from_dir=input_path) as temp_dir:
+        with workspace(from_dir=input_path) as temp_dir:
             file_handler = FileHandler(
                 input_path=temp_dir,
             )
@@ -121,91 +243,362 @@ class Benchmark:
                 files=files,
                 func_name_pattern=prof_func_name,
             )
-            run_pytest(directory=temp_dir)
+            return run_isolated(
+                directory=temp_dir,
+                engine=engine,
+                bench_type="memory",
+                args=PYTEST_ARGS + [str(temp_dir)],
+            )
 
     @staticmethod
-    def cpu_bench(input_path: Path, engine: str) -> None:
+    def rss_bench(
+        input_path: Path, engine: str, interval: float = DEFAULT_INTERVAL
+    ) -> IsolatedRun:
+        """
+        Invoke pytest on the ``input_path`` tests (without any change) in
+        a fresh interpreter, sampling its RSS and PSS every ``interval``
+        seconds, which works for the compiled modules as well.
+        """
+        logger.info(
+            "%s Memory (RSS) benchmark using:`%s` %s",
+            Colors.CYAN,
+            engine,
+            Colors.RESET,
+        )
+        with workspace(from_dir=input_path) as temp_dir:
+            return run_isolated(
+                directory=temp_dir,
+                engine=engine,
+                bench_type="memory",
+                args=["-vv", "--benchmark-disable", str(temp_dir)],
+                sample_interval=interval,
+            )
+
+    @staticmethod
+    def tracemalloc_bench(
+        input_path: Path, engine: str, top: int = TOP_SITES
+    ) -> IsolatedRun:
+        """
+        Invoke pytest on the ``input_path`` tests (without any change) in
+        a fresh interpreter, tracing the allocations of each test with
+        ``tracemalloc`` and recording its ``top`` allocation sites.
+        """
+        logger.info(
+            "%s Memory (tracemalloc) benchmark using:`%s` %s",
+            Colors.CYAN,
+            engine,
+            Colors.RESET,
+        )
+        with workspace(from_dir=input_path) as temp_dir:
+            return run_isolated(
+                directory=temp_dir,
+                engine=engine,
+                bench_type="memory",
+                args=[
+                    "-vv",
+                    "--benchmark-disable",
+                    f"--pycompile-tracemalloc={top}",
+                    str(temp_dir),
+                ],
+            )
+
+    @staticmethod
+    def cpu_bench(
+        input_path: Path,
+        engine: str,
+        sampling: Optional[SamplingOptions] = None,
+    ) -> IsolatedRun:
         """
         decorate all the test functions from the ``input_path``
         with the ``@benchmark_wrapper`` decorator.
 
-        Finally, invoke pytest within.
+        Finally, invoke pytest within, in a fresh interpreter,
+        and rerun the tests which weren't sampled enough.
         """
+        sampling = sampling or SamplingOptions()
         logger.info(
             "%s CPU benchmark using:`%s` %s",
             Colors.CYAN,
             engine,
             Colors.RESET,
         )
-        with copy_files(from_dir=input_path) as temp_dir:
-            decorator_def = """def benchmark_wrapper(fn):
-                                        def inner(benchmark):
-                                            benchmark(fn)
-                                        return inner
-                        """
-
+        with workspace(from_dir=input_path) as temp_dir:
             file_handler = FileHandler(
                 input_path=temp_dir,
             )
             test_files = file_handler.collect_with_pattern(pattern="*test*.py")
             decorate_functions(
-                decorator_def,
+                BENCHMARK_WRAPPER,
                 "benchmark_wrapper",
                 files=test_files,
                 func_name_pattern="test",
             )
-            run_pytest(directory=temp_dir)
+            run = run_isolated(
+                directory=temp_dir,
+                engine=engine,
+                bench_type="cpu",
+                args=PYTEST_ARGS + sampling.pytest_args() + [str(temp_dir)],
+            )
+            return Benchmark._resample(run, temp_dir, sampling)
+
+    @staticmethod
+    def _resample(
+        run: IsolatedRun, temp_dir: Path, sampling: SamplingOptions
+    ) -> IsolatedRun:
+        """
+        Reruns the tests of the ``run`` with a confidence interval wider than
+        the ``target_ci``, with twice the rounds each time, merging their
+        timings into the ``run``.
+        """
+        for rerun in range(1, sampling.max_reruns + 1):
+            noisy = [
+                test
+                for test, values in run.tests.items()
+                if values.get("data")
+                and relative_ci(values["data"]) > sampling.target_ci
+            ]
+            if not noisy:
+                break
+            logger.info(
+                "%s Resampling #%s test(s) of: `%s`, rerun: %s/%s %s",
+                Colors.CYAN,
+                len(noisy),
+                run.engine,
+                rerun,
+                sampling.max_reruns,
+                Colors.RESET,
+            )
+            extra = run_isolated(
+                directory=temp_dir,
+                engine=run.engine,
+                bench_type="cpu",
+                args=PYTEST_ARGS + sampling.pytest_args(rerun) + noisy,
+            )
+            run.returncode = run.returncode or extra.returncode
+            for test in noisy:
+                values = extra.tests.get(test, {})
+                if values.get("outcome", "passed") != "passed":
+                    run.tests[test]["outcome"] = values["outcome"]
+                data = run.tests[test]["data"] + values.get("data", [])
+                run.tests[test].update(summarize(data), data=data)
+        return run
+
+    @staticmethod
+    def test_bench(input_path: Path, test_files: list[str]) -> IsolatedRun:
+        """
+        Runs the cpu benchmark only for the ``test_files`` of the ``input_path``
+        directory, within a new interpreter so the latest executables
+        are imported.
+        """
+        logger.info(
+            "%s CPU benchmark of:`%s` %s", Colors.CYAN, test_files, Colors.RESET
+        )
+        with workspace(from_dir=input_path) as temp_dir:
+            decorate_functions(
+                BENCHMARK_WRAPPER,
+                "benchmark_wrapper",
+                files=[temp_dir / test_file for test_file in test_files],
+                func_name_pattern="test",
+            )
+            return run_isolated(
+                directory=temp_dir,
+                engine="watch",
+                bench_type="cpu",
+                args=["-q"] + test_files,
+            )
+
+    def _bench(
+        self,
+        bench_type: str,
+        input_path: Path,
+        prof_func_name: str,
+        engine: str,
+    ) -> list[IsolatedRun]:
+        """
+        Runs the ``bench_type`` benchmark(s) of a single engine.
+
+        :return: the new ``runs``.
+        """
+        runs = []
+        if (
+            bench_type in ("memory", "both")
+            and self.memory_backend == RSS_BACKEND
+        ):
+            runs.append(
+                self.rss_bench(
+                    input_path=input_path,
+                    engine=engine,
+                    interval=self.sample_interval,
+                )
+            )
+        elif (
+            bench_type in ("memory", "both")
+            and self.memory_backend == TRACEMALLOC_BACKEND
+        ):
+            runs.append(
+                self.tracemalloc_bench(input_path=input_path, engine=engine)
+            )
+        elif bench_type in ("memory", "both"):
+            runs.append(
+                self.mem_bench(
+                    input_path=input_path,
+                    prof_func_name=prof_func_name,
+                    engine=engine,
+                )
+            )
+        if bench_type in ("cpu", "both"):
+            runs.append(
+                self.cpu_bench(
+                    input_path=input_path, engine=engine, sampling=self.sampling
+                )
+            )
+        self.runs.extend(runs)
+        return runs
+
+    def _pinned_bench(  # pylint: disable=R0913 R0917
+        self,
+        cpus: set[int],
+        output: int,
+        results: int,
+        bench_type: str,
+        input_path: Path,
+        prof_func_name: str,
+        engine: str,
+    ) -> None:
+        """
+        Runs the benchmark(s) of a single engine within a child process
+        pinned to the ``cpus``, writing its output to the ``output`` fd
+        and its ``runs`` as JSON to the ``results`` fd.
+        """
+        os.sched_setaffinity(0, cpus)
+        os.dup2(output, 1)
+        os.dup2(output, 2)
+        sys.stdout = sys.stderr = open(  # pylint: disable=R1732
+            1, "w", encoding="utf-8", buffering=1, closefd=False
+        )
+        try:
+            runs = self._bench(bench_type, input_path, prof_func_name, engine)
+            os.write(
+                results, json.dumps([asdict(run) for run in runs]).encode()
+            )
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+    def _start_concurrent(  # pylint: disable=R0914
+        self,
+        bench_type: str,
+        compilers: Sequence[CompilerWrapper],
+        prof_func_name: str,
+        core_sets: list[set[int]],
+    ) -> None:
+        """
+        Compiles the workspaces of all the ``compilers`` concurrently,
+        then runs the benchmarks of each engine concurrently,
+        each one within its own process pinned to a disjoint core set.
+        """
+        with ExitStack() as stack:
+            temp_dirs = [
+                stack.enter_context(workspace(from_dir=self.input_path))
+                for _ in compilers
+            ]
+            with ThreadPoolExecutor(max_workers=max(1, len(compilers))) as pool:
+                for future in [
+                    pool.submit(
+                        self._compile,
+                        compiler=compiler,
+                        temp_dir=temp_dir,
+                        prof_func_name=prof_func_name,
+                        cache=self.cache,
+                        daemon=self.daemon,
+                    )
+                    for compiler, temp_dir in zip(compilers, temp_dirs)
+                ]:
+                    future.result()
+            runs = [(self.input_path, BASELINE)] + [
+                (temp_dir, str(compiler))
+                for compiler, temp_dir in zip(compilers, temp_dirs)
+            ]
+            context = multiprocessing.get_context("fork")
+            sys.stdout.flush()
+            sys.stderr.flush()
+            processes = []
+            for (input_path, engine), cpus in zip(runs, core_sets):
+                output = stack.enter_context(tempfile.TemporaryFile())
+                results = stack.enter_context(tempfile.TemporaryFile())
+                process = context.Process(
+                    target=self._pinned_bench,
+                    args=(
+                        cpus,
+                        output.fileno(),
+                        results.fileno(),
+                        bench_type,
+                        input_path,
+                        prof_func_name,
+                        engine,
+                    ),
+                )
+                process.start()
+                processes.append((engine, cpus, process, output, results))
+            for engine, cpus, process, output, results in processes:
+                process.join()
+                results.seek(0)
+                self.runs.extend(
+                    IsolatedRun(**run)
+                    for run in json.loads(results.read() or "[]")
+                )
+                output.seek(0)
+                print(
+                    f"{Colors.CYAN} Benchmark of: `{engine}` "
+                    f"pinned to cpus: {sorted(cpus)} {Colors.RESET}"
+                )
+                print(output.read().decode(errors="replace"), flush=True)
+                if process.exitcode:
+                    logger.error(
+                        "%sBenchmark of: `%s` failed with: %s%s",
+                        Colors.FAIL,
+                        engine,
+                        process.exitcode,
+                        Colors.RESET,
+                    )
 
     def start(
         self,
         bench_type: str,
         compilers: Sequence[CompilerWrapper],
         prof_func_name: str = "benchmark",
+        concurrent: bool = False,
     ) -> None:
         """
         Start the benchmark.
+
+        :param concurrent: run the benchmarks of the engines concurrently,
+                           each one pinned to a disjoint physical core,
+                           it falls back to running them one by one if
+                           there aren't enough cores.
         """
-        match bench_type:
-            case "memory":
-                self.mem_bench(
-                    input_path=self.input_path,
-                    prof_func_name=prof_func_name,
-                    engine=sys.version,
-                )
-            case "cpu":
-                self.cpu_bench(input_path=self.input_path, engine=sys.version)
-            case "both":
-                self.mem_bench(
-                    input_path=self.input_path,
-                    prof_func_name=prof_func_name,
-                    engine=sys.version,
+        if concurrent and compilers:
+            core_sets = isolated_core_sets(engines=len(compilers) + 1)
+            if core_sets is not None:
+                self._start_concurrent(
+                    bench_type, compilers, prof_func_name, core_sets
                 )
-                self.cpu_bench(input_path=self.input_path, engine=sys.version)
-
+                return
+            logger.warning(
+                "%sNot enough isolated cores for #%s concurrent benchmarks, "
+                "running them one by one%s",
+                Colors.WARNING,
+                len(compilers) + 1,
+                Colors.RESET,
+            )
+        self._bench(bench_type, self.input_path, prof_func_name, BASELINE)
         for compiler in compilers:
-            with copy_files(from_dir=self.input_path) as temp_dir:
+            with workspace(from_dir=self.input_path) as temp_dir:
                 self._compile(
                     compiler=compiler,
                     temp_dir=temp_dir,
                     prof_func_name=prof_func_name,
+                    cache=self.cache,
+                    daemon=self.daemon,
                 )
-                match bench_type:
-                    case "memory":
-                        self.mem_bench(
-                            input_path=temp_dir,
-                            prof_func_name=prof_func_name,
-                            engine=str(compiler),
-                        )
-                    case "cpu":
-                        self.cpu_bench(
-                            input_path=temp_dir, engine=str(compiler)
-                        )
-                    case "both":
-                        self.mem_bench(
-                            input_path=temp_dir,
-                            prof_func_name=prof_func_name,
-                            engine=str(compiler),
-                        )
-                        self.cpu_bench(
-                            input_path=temp_dir, engine=str(compiler)
-                        )
+                self._bench(bench_type, temp_dir, prof_func_name, str(compiler))
@@ -0,0 +1,227 @@
+"""
+Content-addressed cache of the compiled executables.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+from src.manifest import file_hash, find_executable, python_abi
+from src.wrappers import CompilerWrapper
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "pycompile"
+)
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+# The entries are sharded by the first two (hex) digits of their key.
+SHARD_DIGITS = frozenset("0123456789abcdef")
+
+
+@dataclass
+class CacheStats:
+    """
+    Cache statistics of a run.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def __str__(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"hits: {self.hits}, misses: {self.misses} "
+            f"({hit_rate:.1f}% hit rate), evictions: {self.evictions}"
+        )
+
+
+class ArtifactCache:
+    """
+    ArtifactCache stores the compiled executables (``.so``) keyed by the hash of
+    the source, the module name, the ``CompilerWrapper`` class and ``cmd``,
+    the compiler version, the python ABI and the ``CFLAGS``.
+
+    Cached executables are restored with a hard link (or a copy when
+    the cache lives in another filesystem), and once the cache grows over
+    ``max_size`` the least recently used executables are evicted.
+    example usage::
+        cache = ArtifactCache(cache_dir=Path("~/.cache/pycompile"))
+        if not cache.restore(file_path, compiler):
+            ...
+            cache.store(file_path, compiler)
+        cache.evict()
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+        max_size: int = DEFAULT_MAX_SIZE,
+    ):
+        """
+        :param cache_dir: the cache directory, it's created if it's missing.
+        :param max_size: the maximum size of the cache in bytes.
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_size = max_size
+        self.stats = CacheStats()
+
+    @staticmethod
+    def key(
+        file_path: Path, compiler: CompilerWrapper, dependencies: str = ""
+    ) -> str:
+        """
+        The cache key of the ``file_path`` executable.
+
+        :param dependencies: the hash of the modules it depends on,
+                             see ``ImportGraph.dependencies_hash``.
+        """
+        digest = hashlib.sha256()
+        for part in (
+            file_hash(file_path),
+            dependencies,
+            Path(file_path).name,
+            f"{type(compiler).__module__}.{type(compiler).__qualname__}",
+            compiler.cmd,
+            compiler.version,
+            python_abi(),
+            os.environ.get("CFLAGS", ""),
+        ):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _entries(self) -> Iterator[Path]:
+        if not self.cache_dir.is_dir():
+            return
+        for prefix in self.cache_dir.iterdir():
+            if (
+                prefix.is_dir()
+                and len(prefix.name) == 2
+                and set(prefix.name) <= SHARD_DIGITS
+            ):
+                yield from (
+                    entry for entry in prefix.iterdir() if entry.is_dir()
+                )
+
+    @staticmethod
+    def _link(source: Path, destination: Path) -> None:
+        """
+        Hard links (or copies) the ``source`` to the ``destination``
+        replacing any existing file.
+        """
+        temp_path = destination.with_name(f".{destination.name}.tmp")
+        temp_path.unlink(missing_ok=True)
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copy2(source, temp_path)
+        os.replace(temp_path, destination)
+
+    def restore(
+        self,
+        file_path: Path,
+        compiler: CompilerWrapper,
+        dependencies: str = "",
+    ) -> bool:
+        """
+        Restores the cached executable of ``file_path`` next to it.
+
+        :return: True on a cache hit.
+        """
+        entry = self._entry(self.key(file_path, compiler, dependencies))
+        artifacts = list(entry.iterdir()) if entry.is_dir() else []
+        if not artifacts:
+            self.stats.misses += 1
+            return False
+        self._link(artifacts[0], Path(file_path).parent / artifacts[0].name)
+        os.utime(entry)
+        self.stats.hits += 1
+        logger.debug("Restored from the cache: `%s`", artifacts[0].name)
+        return True
+
+    def store(
+        self,
+        file_path: Path,
+        compiler: CompilerWrapper,
+        built_after: float = 0.0,
+        dependencies: str = "",
+    ) -> None:
+        """
+        Stores the executable of ``file_path`` to the cache.
+
+        :param built_after: timestamp of the compile start, an older executable
+                            means that the compiler failed.
+        :param dependencies: the hash of the modules it depends on.
+        """
+        executable = find_executable(Path(file_path))
+        if not executable or executable.stat().st_mtime < built_after:
+            return
+        entry = self._entry(self.key(file_path, compiler, dependencies))
+        if entry.is_dir():
+            return
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        temp_dir = Path(tempfile.mkdtemp(dir=entry.parent, prefix=".tmp-"))
+        self._link(executable, temp_dir / executable.name)
+        try:
+            temp_dir.rename(entry)
+        except OSError:
+            # Another process stored the same executable.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def detach(file_path: Path) -> None:
+        """
+        Removes a hard linked executable of ``file_path`` before recompiling it,
+        otherwise the compiler would overwrite the cached executable too.
+        """
+        executable = find_executable(Path(file_path))
+        if executable and executable.stat().st_nlink > 1:
+            executable.unlink()
+
+    def evict(self) -> None:
+        """
+        Evicts the least recently used executables until the cache size
+        is within the ``max_size``.
+        """
+        entries = []
+        total_size = 0
+        for entry in self._entries():
+            size = sum(file.stat().st_size for file in entry.iterdir())
+            entries.append((entry.stat().st_mtime, size, entry))
+            total_size += size
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+            self.stats.evictions += 1
+
+    def __repr__(self) -> str:
+        return f"ArtifactCache(cache_dir={self.cache_dir},max_size={self.max_size})"
+
+
+def cache_from_options(
+    cache_dir: Optional[str], cache_size: int
+) -> Optional[ArtifactCache]:
+    """
+    Creates the ``ArtifactCache`` from the cli options,
+    the cache is disabled if there isn't any ``cache_dir``.
+
+    :param cache_dir: the cache directory.
+    :param cache_size: the maximum size of the cache in MiB.
+    """
+    if not cache_dir:
+        return None
+    return ArtifactCache(
+        cache_dir=Path(cache_dir), max_size=cache_size * 1024 * 1024
+    )
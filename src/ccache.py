@@ -0,0 +1,358 @@
+"""
+C compiler caching.
+
+Both engines spend most of their time compiling the generated ``C`` code,
+which is often identical to the previous build.
+``CompilerLauncher`` wires a compiler launcher (``ccache``, ``sccache`` or the
+built-in one) in front of the ``C`` compiler of ``Cython`` and ``Nuitka``.
+
+The built-in launcher is this module run as a script, so it depends only on the
+standard library::
+
+    python -S ccache.py /usr/bin/gcc -c hello.c -o hello.o
+
+it caches the object files keyed by the hash of the preprocessed source,
+the compiler and its flags.
+"""
+import hashlib
+import logging
+import os
+import shlex
+import shutil
+import stat
+import subprocess
+import sys
+import sysconfig
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# The directory of the built-in launcher within the artifact cache one,
+# its name can't be mistaken for a cache shard (two hex digits).
+CC_CACHE_SUBDIR = "c-objects"
+DEFAULT_CC_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "pycompile"
+    / CC_CACHE_SUBDIR
+)
+DEFAULT_CC_CACHE_SIZE = 1024 * 1024 * 1024
+CACHE_DIR_ENV = "PYCOMPILE_CCACHE_DIR"
+STATS_ENV = "PYCOMPILE_CCACHE_STATS"
+BUILTIN_NAME = "pycompile-cc"
+SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx")
+# Counters written by the built-in launcher, as in the ``ccache`` stats log.
+HIT = "preprocessed_cache_hit"
+MISS = "cache_miss"
+HITS = {HIT, "direct_cache_hit"}
+
+
+@dataclass
+class LauncherStats:
+    """
+    ``C`` compiler cache statistics of a run.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    available: bool = True
+
+    def __str__(self) -> str:
+        if not self.available:
+            return "hit rate isn't available"
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0.0
+        return (
+            f"hits: {self.hits}, misses: {self.misses} "
+            f"({hit_rate:.1f}% hit rate)"
+        )
+
+    @classmethod
+    def from_stats_log(cls, stats_log: Path) -> "LauncherStats":
+        """
+        Counts the hits and the misses of a ``ccache`` stats log.
+        """
+        stats = cls()
+        if not stats_log.is_file():
+            return stats
+        for line in stats_log.read_text(errors="replace").splitlines():
+            if line in HITS:
+                stats.hits += 1
+            elif line == MISS:
+                stats.misses += 1
+        return stats
+
+
+class CompilerLauncher:
+    """
+    CompilerLauncher prefixes the ``C`` compiler with a caching launcher,
+    ``ccache`` or ``sccache`` when they are installed,
+    otherwise the built-in launcher.
+    example usage::
+        launcher = CompilerLauncher.detect()
+        with launcher.activate():
+            compiler_handler.start()
+        print(launcher.stats)
+    """
+
+    def __init__(
+        self,
+        binary: Optional[Path] = None,
+        cache_dir: Path = DEFAULT_CC_CACHE_DIR,
+        max_size: int = DEFAULT_CC_CACHE_SIZE,
+    ):
+        """
+        :param binary: the launcher executable, None for the built-in one.
+        :param cache_dir: the cache directory of the built-in launcher.
+        :param max_size: the maximum size of the built-in launcher cache
+                         in bytes.
+        """
+        self.binary = binary
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_size = max_size
+        self.stats = LauncherStats()
+
+    @classmethod
+    def detect(
+        cls,
+        cache_dir: Path = DEFAULT_CC_CACHE_DIR,
+        max_size: int = DEFAULT_CC_CACHE_SIZE,
+    ) -> "CompilerLauncher":
+        """
+        Uses ``ccache`` or ``sccache`` if any of them is installed.
+        """
+        for name in ("ccache", "sccache"):
+            if binary := shutil.which(name):
+                return cls(binary=Path(binary))
+        return cls(cache_dir=cache_dir, max_size=max_size)
+
+    @property
+    def name(self) -> str:
+        """
+        The launcher name.
+        """
+        return self.binary.name if self.binary else BUILTIN_NAME
+
+    def _compiler_shim(self, compiler: Path, flags: list[str]) -> Path:
+        """
+        Creates an executable named after the ``compiler`` which runs it
+        through the launcher, a single executable is needed as ``CC``
+        because ``Nuitka`` detects the compiler by its name.
+        ``ccache`` runs in its masquerade mode through a symbolic link,
+        which ``Nuitka`` recognises instead of adding its own ``ccache``.
+        """
+        shim = self.cache_dir / "bin" / compiler.name
+        shim.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = shim.with_name(f".{shim.name}.{os.getpid()}")
+        temp_path.unlink(missing_ok=True)
+        if self.name == "ccache":
+            temp_path.symlink_to(self.binary)  # type: ignore[arg-type]
+        else:
+            launcher = (
+                f'"{self.binary}"'
+                if self.binary
+                else f'"{sys.executable}" -S "{Path(__file__).resolve()}"'
+            )
+            temp_path.write_text(
+                "#!/bin/sh\n"
+                f'exec {launcher} "{compiler}" {shlex.join(flags)} "$@"\n'
+            )
+            temp_path.chmod(temp_path.stat().st_mode | stat.S_IEXEC)
+        os.replace(temp_path, shim)
+        return shim
+
+    def environment(self, stats_log: Path) -> dict[str, str]:
+        """
+        The environment variables which enable the launcher for the
+        ``setuptools`` builds of ``Cython`` and for ``Nuitka``.
+
+        :param stats_log: the file to count the hits and the misses.
+        """
+        compiler, *flags = shlex.split(
+            os.environ.get("CC") or str(sysconfig.get_config_var("CC") or "cc")
+        )
+        compiler_path = Path(shutil.which(compiler) or compiler).absolute()
+        shim = self._compiler_shim(compiler=compiler_path, flags=flags)
+        environment = {
+            "CC": shlex.join([str(shim), *flags])
+            if self.name == "ccache"
+            else str(shim)
+        }
+        if self.binary is None:
+            environment[CACHE_DIR_ENV] = str(self.cache_dir)
+            environment[STATS_ENV] = str(stats_log)
+        elif self.name == "ccache":
+            environment["CCACHE_STATSLOG"] = str(stats_log)
+        return environment
+
+    @contextmanager
+    def activate(self) -> Iterator[None]:
+        """
+        Enables the launcher for the compilers run within the context,
+        and collects its statistics.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_log = Path(temp_dir) / "stats.log"
+            environment = self.environment(stats_log=stats_log)
+            previous = {name: os.environ.get(name) for name in environment}
+            os.environ.update(environment)
+            try:
+                yield
+            finally:
+                for name, value in previous.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+                self.stats = LauncherStats.from_stats_log(stats_log)
+                self.stats.available = self.name != "sccache"
+        if self.binary is None:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Evicts the least recently used objects of the built-in launcher
+        until the cache size is within the ``max_size``.
+        """
+        entries = [
+            (entry.stat(), entry)
+            for entry in self.cache_dir.glob("??/*")
+            if entry.is_file()
+        ]
+        total_size = sum(entry_stat.st_size for entry_stat, _ in entries)
+        for entry_stat, entry in sorted(
+            entries, key=lambda item: item[0].st_mtime
+        ):
+            if total_size <= self.max_size:
+                break
+            entry.unlink(missing_ok=True)
+            total_size -= entry_stat.st_size
+
+    def __repr__(self) -> str:
+        return (
+            f"CompilerLauncher(binary={self.binary},"
+            f"cache_dir={self.cache_dir},max_size={self.max_size})"
+        )
+
+
+def launcher_from_options(
+    cc_cache: bool, cache_dir: Optional[str] = None
+) -> Optional[CompilerLauncher]:
+    """
+    Creates the ``CompilerLauncher`` from the cli options,
+    the built-in launcher stores its objects within the ``cache_dir``.
+    """
+    if not cc_cache:
+        return None
+    launcher = (
+        CompilerLauncher.detect(cache_dir=Path(cache_dir) / CC_CACHE_SUBDIR)
+        if cache_dir
+        else CompilerLauncher.detect()
+    )
+    logger.info("Using the C compiler launcher: `%s`", launcher.name)
+    return launcher
+
+
+def _compile_job(args: list[str]) -> Optional[tuple[int, str]]:
+    """
+    The position of the output and the source of a cacheable compile job,
+    None for the link and the preprocessor only jobs.
+    """
+    if "-c" not in args or "-o" not in args[:-1]:
+        return None
+    if any(arg.startswith(("-M", "-E", "@")) for arg in args):
+        return None
+    sources = [
+        arg
+        for arg in args[1:]
+        if arg.endswith(SOURCE_SUFFIXES) and not arg.startswith("-")
+    ]
+    if len(sources) != 1:
+        return None
+    return args.index("-o") + 1, sources[0]
+
+
+def _object_key(args: list[str], output_index: int) -> Optional[str]:
+    """
+    Hashes the preprocessed source (with its line markers, so the paths of
+    the source and the headers within the debug info are never stale),
+    the compiler and its flags, like ``ccache`` the current directory
+    is hashed too with debug info.
+    """
+    compile_args = args[: output_index - 1] + args[output_index + 1 :]
+    preprocessed = subprocess.run(
+        [arg for arg in compile_args if arg != "-c"] + ["-E"],
+        capture_output=True,
+        check=False,
+    )
+    if preprocessed.returncode:
+        return None
+    digest = hashlib.sha256()
+    compiler = shutil.which(args[0]) or args[0]
+    compiler_stat = os.stat(compiler)
+    for part in (
+        os.path.realpath(compiler),
+        str(compiler_stat.st_size),
+        str(compiler_stat.st_mtime_ns),
+        *(arg for arg in compile_args if not arg.endswith(SOURCE_SUFFIXES)),
+        os.getcwd() if any(arg.startswith("-g") for arg in args) else "",
+    ):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(preprocessed.stdout)
+    return digest.hexdigest()
+
+
+def _log_result(counter: str) -> None:
+    """
+    Appends the result to the stats log.
+    """
+    if stats_log := os.environ.get(STATS_ENV):
+        with open(stats_log, "a", encoding="utf-8") as log:
+            log.write(f"{counter}\n")
+
+
+def main(args: list[str]) -> int:
+    """
+    Runs the compiler ``args`` restoring the object file from the cache,
+    or storing it after a successful compile.
+    """
+    if not args:
+        print("usage: ccache.py compiler [args..]", file=sys.stderr)
+        return 2
+    job = _compile_job(args)
+    key = _object_key(args, job[0]) if job else None
+    if job is None or key is None:
+        return subprocess.run(args, check=False).returncode
+    output = Path(args[job[0]])
+    entry = (
+        Path(os.environ.get(CACHE_DIR_ENV, DEFAULT_CC_CACHE_DIR))
+        / key[:2]
+        / key
+    )
+    stderr_entry = entry.with_suffix(".stderr")
+    if entry.is_file():
+        shutil.copyfile(entry, output)
+        os.utime(entry)
+        if stderr_entry.is_file():
+            sys.stderr.write(stderr_entry.read_text(errors="replace"))
+        _log_result(HIT)
+        return 0
+    completed = subprocess.run(args, check=False, stderr=subprocess.PIPE)
+    sys.stderr.write(completed.stderr.decode(errors="replace"))
+    _log_result(MISS)
+    if completed.returncode == 0 and output.is_file():
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        if completed.stderr:
+            stderr_entry.write_bytes(completed.stderr)
+        temp_path = entry.with_name(f".{entry.name}.{os.getpid()}")
+        shutil.copyfile(output, temp_path)
+        os.replace(temp_path, entry)
+    return completed.returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
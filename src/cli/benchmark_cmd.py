@@ -2,7 +2,9 @@
 Benchmark command
 """
 import logging
+import platform
 import sys
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Sequence
 
@@ -12,11 +14,28 @@ from src import (
     CompilerCommands,
     CompilerWrapper,
     CythonWrapper,
+    FileHandler,
+    NuitkaPackageWrapper,
     NuitkaWrapper,
     setup_logging,
 )
-from src.benchmark import Benchmark
+from src.benchmark import (
+    BASELINE,
+    PROFILE_BACKEND,
+    RSS_BACKEND,
+    TRACEMALLOC_BACKEND,
+    Benchmark,
+)
+from src.cache import DEFAULT_CACHE_DIR, cache_from_options
+from src.ccache import launcher_from_options
+from src.daemon import daemon_from_options
+from src.directives import sweep_compilers, sweep_table
 from src.helpers import Colors
+from src.history import history_from_options
+from src.memory_sampler import DEFAULT_INTERVAL
+from src.results import report_results
+from src.stats import SamplingOptions, sampling_from_options
+from src.type_stubs import TypedCythonWrapper, stubs_from_options
 
 logger = logging.getLogger(__name__)
 
@@ -33,9 +52,12 @@ logger = logging.getLogger(__name__)
     "-e",
     "--engine",
     default="both",
-    help="compiler wrapper(s) to be used for the benchmark, defaults to `both`.",
+    help="compiler wrapper(s) to be used for the benchmark, defaults to `both`. "
+    "`nuitka-package` compares the per module `nuitka` build "
+    "with the whole package build of each top level package.",
     type=click.Choice(
-        ["cython", "nuitka", "both", "none"], case_sensitive=False
+        ["cython", "nuitka", "nuitka-package", "both", "none"],
+        case_sensitive=False,
     ),
 )
 @click.option(
@@ -60,12 +82,189 @@ logger = logging.getLogger(__name__)
     type=str,
 )
 @click.option("-v", "--verbose", count=True, help="verbose level")
-def benchmark_cmd(
+@click.option(
+    "-cd",
+    "--cache-dir",
+    default=None,
+    envvar="PYCOMPILE_CACHE_DIR",
+    type=click.Path(file_okay=False),
+    help="Restore the executables from a shared cache directory instead of "
+    f"recompiling them, for example: `{DEFAULT_CACHE_DIR}`",
+)
+@click.option(
+    "--cache-size",
+    default=1024,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="Maximum size of the cache in MiB, "
+    "the least recently used executables are evicted",
+)
+@click.option(
+    "-d",
+    "--daemon",
+    "use_daemon",
+    flag_value=True,
+    default=False,
+    help="Submit the compile jobs to the warm daemon "
+    "started with `pycompile daemon`",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Unix socket path of the `--daemon`, defaults to the one of "
+    "`pycompile daemon` (it can be set with `PYCOMPILE_DAEMON_SOCKET`)",
+)
+@click.option(
+    "-cc",
+    "--cc-cache",
+    "cc_cache",
+    flag_value=True,
+    default=False,
+    help="Cache the C compiler output with `ccache`, `sccache` "
+    "or the built-in launcher, and report its hit rate",
+)
+@click.option(
+    "-cr",
+    "--concurrent",
+    "concurrent",
+    flag_value=True,
+    default=False,
+    help="Compile the engines concurrently and run their benchmarks "
+    "concurrently, each one pinned to a distinct physical core, "
+    "it runs them one by one if there aren't enough cores",
+)
+@click.option(
+    "-o",
+    "--output",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Write the timings and the peak memory of each test and engine, "
+    "with the speedups, to a `.json` or a `.csv` file",
+)
+@click.option(
+    "--history",
+    default=None,
+    envvar="PYCOMPILE_HISTORY",
+    type=click.Path(dir_okay=False),
+    help="Append the results to a SQLite database, with the engine versions, "
+    "the git commit and the host fingerprint",
+)
+@click.option(
+    "--fail-on-regression",
+    "fail_on_regression",
+    default=None,
+    type=click.FloatRange(min=0),
+    metavar="PCT",
+    help="Exit with an error if any test is slower than its rolling baseline "
+    "(the median of the last runs on the same host) by more than PCT percent, "
+    "the history defaults to `.pycompile/history.sqlite` of the input path",
+)
+@click.option(
+    "--warmup-iterations",
+    default=SamplingOptions.warmup_iterations,
+    type=click.IntRange(min=0),
+    show_default=True,
+    help="Maximum warmup iterations of each cpu benchmark, 0 disables the warmup",
+)
+@click.option(
+    "--min-rounds",
+    default=SamplingOptions.min_rounds,
+    type=click.IntRange(min=2),
+    show_default=True,
+    help="Minimum rounds of each cpu benchmark",
+)
+@click.option(
+    "--min-time",
+    default=SamplingOptions.min_time,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="Minimum time in seconds of each round of the cpu benchmarks, "
+    "the fast tests are called as many times as needed within a round",
+)
+@click.option(
+    "--max-time",
+    default=SamplingOptions.max_time,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="Maximum time in seconds of each cpu benchmark, "
+    "unless the minimum rounds take longer",
+)
+@click.option(
+    "--target-ci",
+    default=SamplingOptions.target_ci,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    metavar="PCT",
+    help="Rerun the cpu benchmarks (with twice the rounds, up to "
+    f"{SamplingOptions.max_reruns} times) until the 95% confidence interval "
+    "of their mean is within ±PCT percent, 0 disables the reruns",
+)
+@click.option(
+    "-mb",
+    "--memory-backend",
+    default=PROFILE_BACKEND,
+    type=click.Choice(
+        [PROFILE_BACKEND, RSS_BACKEND, TRACEMALLOC_BACKEND],
+        case_sensitive=False,
+    ),
+    show_default=True,
+    help="`profile` decorates the functions matching the profile pattern "
+    "with `@profile` from `memory-profiler`, `rss` samples the RSS and PSS "
+    "(`/proc/<pid>/smaps_rollup`) of the unmodified test runs, "
+    "which works for the compiled modules as well, `tracemalloc` traces "
+    "the allocations of each test and diffs its top allocation sites "
+    "between the engines",
+)
+@click.option(
+    "--sample-interval",
+    default=DEFAULT_INTERVAL,
+    type=click.FloatRange(min=0.001),
+    show_default=True,
+    help="Seconds between the RSS samples of the `rss` memory backend",
+)
+@click.option(
+    "--trace-types",
+    "trace_types",
+    flag_value=True,
+    default=False,
+    help="Trace the types of the functions while running the tests, and "
+    "benchmark `Cython (typed)` as well, which compiles the modules with "
+    "the augmenting `.pxd` files of the observed types",
+)
+@click.option(
+    "--sweep-directives",
+    "sweep_directives",
+    flag_value=True,
+    default=False,
+    help="Benchmark `cython` with each compiler directives preset, and report "
+    "the speedup of each one over the default directives for each module",
+)
+def benchmark_cmd(  # pylint: disable=R0913 R0914 R0917
     input_path: Path,
     engine: str,
     bench_type: str,
     prof_func_name: str,
     verbose: int,
+    cache_dir: str | None,
+    cache_size: int,
+    use_daemon: bool,
+    socket_path: str | None,
+    cc_cache: bool,
+    concurrent: bool,
+    output: str | None,
+    history: str | None,
+    fail_on_regression: float | None,
+    warmup_iterations: int,
+    min_rounds: int,
+    min_time: float,
+    max_time: float,
+    target_ci: float,
+    memory_backend: str,
+    sample_interval: float,
+    trace_types: bool,
+    sweep_directives: bool,
 ) -> None:
     """
     Run a memory and cpu benchmark.
@@ -78,20 +277,84 @@ def benchmark_cmd(
             f"be a directory, exiting...{Colors.RESET}"
         )
         sys.exit(1)
-    benc = Benchmark(input_path=input_path)
+    benc = Benchmark(
+        input_path=input_path,
+        cache=cache_from_options(cache_dir=cache_dir, cache_size=cache_size),
+        daemon=daemon_from_options(use_daemon, socket_path=socket_path),
+        sampling=sampling_from_options(
+            warmup_iterations=warmup_iterations,
+            min_rounds=min_rounds,
+            min_time=min_time,
+            max_time=max_time,
+            target_ci=target_ci,
+        ),
+        memory_backend=memory_backend.lower(),
+        sample_interval=sample_interval,
+    )
     compilers: Sequence[CompilerWrapper] = []
     match engine:
         case "cython":
             compilers = [CythonWrapper(cmd=CompilerCommands.cython_bench)]
         case "nuitka":
             compilers = [NuitkaWrapper(cmd=CompilerCommands.nuitka_bench)]
+        case "nuitka-package":
+            compilers = [
+                NuitkaWrapper(cmd=CompilerCommands.nuitka_bench),
+                NuitkaPackageWrapper(
+                    cmd=CompilerCommands.nuitka_package_bench,
+                    module_cmd=CompilerCommands.nuitka_bench,
+                ),
+            ]
         case "both":
             compilers = [
                 CythonWrapper(cmd=CompilerCommands.cython_bench),
                 NuitkaWrapper(cmd=CompilerCommands.nuitka_bench),
             ]
-    benc.start(
-        compilers=compilers,
-        bench_type=bench_type,
-        prof_func_name=prof_func_name,
+    if trace_types:
+        compilers = [
+            *compilers,
+            TypedCythonWrapper(
+                stubs=stubs_from_options(
+                    input_path, FileHandler(input_path).start(), trace=True
+                ),
+                root=input_path,
+                cmd=CompilerCommands.cython_bench,
+            ),
+        ]
+    compilers = sweep_compilers(compilers, sweep=sweep_directives)
+    launcher = launcher_from_options(cc_cache=cc_cache, cache_dir=cache_dir)
+    with launcher.activate() if launcher else nullcontext():
+        benc.start(
+            compilers=compilers,
+            bench_type=bench_type,
+            prof_func_name=prof_func_name,
+            concurrent=concurrent,
+        )
+    if benc.cache is not None:
+        print(f"{Colors.CYAN} Cache {benc.cache.stats} {Colors.RESET}")
+    if launcher is not None:
+        print(
+            f"{Colors.CYAN} C compiler cache `{launcher.name}` "
+            f"{launcher.stats} {Colors.RESET}"
+        )
+    results = report_results(
+        benc.runs,
+        baseline=BASELINE,
+        output=Path(output) if output is not None else None,
+    )
+    table = (
+        sweep_table(results, input_path, prof_func_name)
+        if sweep_directives
+        else ""
     )
+    if table:
+        print(f"{Colors.CYAN}{table}{Colors.RESET}")
+    store = history_from_options(history, input_path, fail_on_regression)
+    if store is not None and store.record(
+        results,
+        versions={BASELINE: platform.python_version()}
+        | {str(compiler): compiler.version for compiler in compilers},
+        input_path=input_path,
+        threshold=fail_on_regression,
+    ):
+        sys.exit(1)
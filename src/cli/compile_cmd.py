@@ -2,17 +2,32 @@
 Compile command
 """
 import logging
+from contextlib import nullcontext
 from pathlib import Path
 
 import click
 
 from src import (
     CompilerHandler,
+    CompilerWrapper,
+    CythonBuildWrapper,
     CythonWrapper,
     FileHandler,
+    Manifest,
+    NuitkaPackageWrapper,
     NuitkaWrapper,
     setup_logging,
 )
+from src.annotate import annotate_from_options
+from src.cache import DEFAULT_CACHE_DIR, cache_from_options
+from src.ccache import launcher_from_options
+from src.daemon import daemon_from_options
+from src.discovery_index import index_from_options
+from src.engine_plan import DEFAULT_MARGIN, PYTHON, plan_from_options
+from src.helpers import Colors
+from src.hot_modules import DEFAULT_SHARE, hot_files_from_options
+from src.type_stubs import stubs_from_options, write_stubs
+from src.wrappers import DEFAULT_PRESET, DIRECTIVE_PRESETS
 
 logger = logging.getLogger(__name__)
 
@@ -33,15 +48,19 @@ logger = logging.getLogger(__name__)
     multiple=True,
     type=str,
     default=FileHandler("..").exclude_patterns,  # type: ignore[arg-type]
-    help="glob files patterns of the files to be excluded, example: **/ignore_this_module.py",
+    help="glob files patterns of the files to be excluded, example: **/ignore_this_module.py, "
+    "the virtual environments, caches, VCS and build directories "
+    "(.venv, venv, node_modules, __pycache__, .git, .tox, *.build, *.dist, ...) "
+    "are never walked",
 )
 @click.option("-v", "--verbose", count=True, help="verbose level")
 @click.option(
     "-e",
     "--engine",
     default="cython",
-    help="CompilerWrapper to be used, defaults to: `cython`",
-    type=click.Choice(["cython", "nuitka"], case_sensitive=False),
+    help="CompilerWrapper to be used, defaults to: `cython`, "
+    "`auto` chooses the engine of each module from the benchmark of its tests",
+    type=click.Choice(["cython", "nuitka", "auto"], case_sensitive=False),
 )
 @click.option(
     "-cs",
@@ -67,7 +86,173 @@ logger = logging.getLogger(__name__)
     default=False,
     help="Clean final executables (.so) files",
 )
-def compile_cmd(  # pylint: disable=R0913 R0917
+@click.option(
+    "-j",
+    "--jobs",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of files to compile in parallel, defaults to the CPU count",
+)
+@click.option(
+    "-ip",
+    "--in-process",
+    "in_process",
+    flag_value=True,
+    default=False,
+    help="Run `cython` within the pycompile process, "
+    "building each directory at once instead of a `cythonize` per file",
+)
+@click.option(
+    "-inc",
+    "--incremental",
+    "incremental",
+    flag_value=True,
+    default=False,
+    help="Compile only the files which changed since their last build, "
+    "using the `.pycompile/manifest.json` next to the input path",
+)
+@click.option(
+    "-cd",
+    "--cache-dir",
+    default=None,
+    envvar="PYCOMPILE_CACHE_DIR",
+    type=click.Path(file_okay=False),
+    help="Restore the executables from a shared cache directory instead of "
+    f"recompiling them, for example: `{DEFAULT_CACHE_DIR}`",
+)
+@click.option(
+    "--cache-size",
+    default=1024,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="Maximum size of the cache in MiB, "
+    "the least recently used executables are evicted",
+)
+@click.option(
+    "-d",
+    "--daemon",
+    "use_daemon",
+    flag_value=True,
+    default=False,
+    help="Submit the compile jobs to the warm daemon "
+    "started with `pycompile daemon`",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Unix socket path of the `--daemon`, defaults to the one of "
+    "`pycompile daemon` (it can be set with `PYCOMPILE_DAEMON_SOCKET`)",
+)
+@click.option(
+    "-pm",
+    "--package-mode",
+    "package_mode",
+    flag_value=True,
+    default=False,
+    help="Compile each top level package into a single extension module "
+    "with `nuitka`, the modules outside any package are compiled one by one",
+)
+@click.option(
+    "-cc",
+    "--cc-cache",
+    "cc_cache",
+    flag_value=True,
+    default=False,
+    help="Cache the C compiler output with `ccache`, `sccache` "
+    "or the built-in launcher, and report its hit rate",
+)
+@click.option(
+    "-s",
+    "--stream",
+    "stream",
+    flag_value=True,
+    default=False,
+    help="Start compiling the files of each directory as soon as it's found, "
+    "instead of after the whole discovery",
+)
+@click.option(
+    "--index",
+    "use_index",
+    flag_value=True,
+    default=False,
+    help="Rescan only the directories which changed since the last run, "
+    "indexed within the `.pycompile/index.json` next to the input path",
+)
+@click.option(
+    "--plan",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Engine plan file of the `auto` engine, "
+    "defaults to the `.pycompile/plan.json` next to the input path",
+)
+@click.option(
+    "--replan",
+    "replan",
+    flag_value=True,
+    default=False,
+    help="Benchmark the engines of the `auto` engine again, "
+    "instead of applying the existing plan",
+)
+@click.option(
+    "--auto-margin",
+    default=DEFAULT_MARGIN,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    metavar="PCT",
+    help="Minimum speedup (in percent) of a compiled module over "
+    "the python one, for the `auto` engine to compile it",
+)
+@click.option(
+    "--hot-only",
+    "hot_only",
+    flag_value=True,
+    default=False,
+    help="Profile the tests (or the `--hot-entrypoint`) first, and compile "
+    "only the modules which take most of its CPU time",
+)
+@click.option(
+    "--hot-share",
+    default=DEFAULT_SHARE,
+    type=click.FloatRange(min=0, max=100),
+    show_default=True,
+    metavar="PCT",
+    help="Share of the CPU time of the modules the `--hot-only` modules "
+    "have to cover",
+)
+@click.option(
+    "--hot-entrypoint",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Script to be profiled by `--hot-only` instead of the tests",
+)
+@click.option(
+    "--trace-types",
+    "trace_types",
+    flag_value=True,
+    default=False,
+    help="Trace the types of the functions while running the tests, and "
+    "write the augmenting `.pxd` files of the observed types "
+    "before compiling with `cython`",
+)
+@click.option(
+    "--directives",
+    default=DEFAULT_PRESET,
+    type=click.Choice(list(DIRECTIVE_PRESETS), case_sensitive=False),
+    show_default=True,
+    help="Compiler directives preset of `cython`, `fast` turns off "
+    "its bounds, wraparound, division and initialization checks",
+)
+@click.option(
+    "--annotate",
+    "annotate",
+    flag_value=True,
+    default=False,
+    help="Annotate the modules with `cython -a` and rank the lines with the "
+    "heaviest Python interaction, weighted by the last `--hot-only` profile",
+)
+def compile_cmd(  # pylint: disable=R0912 R0913 R0914 R0915 R0917
     input_path: Path,
     exclude_glob_paths: list[str],
     verbose: int,
@@ -75,26 +260,160 @@ def compile_cmd(  # pylint: disable=R0913 R0917
     clean_source: bool,
     keep_builds: bool,
     clean_executables: bool,
+    jobs: int | None,
+    in_process: bool,
+    incremental: bool,
+    cache_dir: str | None,
+    cache_size: int,
+    use_daemon: bool,
+    socket_path: str | None,
+    package_mode: bool,
+    cc_cache: bool,
+    stream: bool,
+    use_index: bool,
+    plan: str | None,
+    replan: bool,
+    auto_margin: float,
+    hot_only: bool,
+    hot_share: float,
+    hot_entrypoint: str | None,
+    trace_types: bool,
+    directives: str,
+    annotate: bool,
 ) -> None:
     """
     Compile the python files using `cython` or `nuitka`.
     """
     setup_logging(verbose)
 
-    dir_files = FileHandler(
+    file_handler = FileHandler(
         input_path=input_path,
         additional_exclude_patterns=exclude_glob_paths,
-    ).start()
-    if dir_files:
-        compiler = (
-            CythonWrapper() if engine.lower() == "cython" else NuitkaWrapper()
+        index=index_from_options(Path(input_path), use_index),
+    )
+    auto = engine.lower() == "auto"
+    needs_all_files = any(
+        (
+            incremental,
+            cache_dir,
+            package_mode,
+            auto,
+            hot_only,
+            trace_types,
+            annotate,
+        )
+    )
+    if stream and needs_all_files:
+        logger.warning(
+            "%sFlag `--stream` can't be used with `--incremental`, "
+            "`--cache-dir`, `--package-mode`, `--hot-only`, `--trace-types`, "
+            "`--annotate` or the `auto` engine, they require all the files%s",
+            Colors.WARNING,
+            Colors.RESET,
         )
-        compiler_handler = CompilerHandler(
-            files=dir_files,
-            compiler=compiler,
-            clean_source=clean_source,
-            keep_builds=keep_builds,
+        stream = False
+    dir_files = {} if stream else file_handler.start()
+    dir_files = hot_files_from_options(
+        Path(input_path),
+        dir_files,
+        hot_only=hot_only,
+        hot_share=hot_share,
+        entrypoint=hot_entrypoint,
+    )
+    if (
+        trace_types or annotate or directives.lower() != DEFAULT_PRESET
+    ) and engine.lower() == "nuitka":
+        logger.warning(
+            "%sFlags `--trace-types`, `--annotate` and `--directives` "
+            "are supported only by `cython`%s",
+            Colors.WARNING,
+            Colors.RESET,
+        )
+    else:
+        if trace_types:
+            write_stubs(
+                stubs_from_options(Path(input_path), dir_files, trace=True)
+            )
+        annotate_from_options(Path(input_path), dir_files, annotate=annotate)
+    if dir_files or stream:
+        cache = cache_from_options(cache_dir=cache_dir, cache_size=cache_size)
+        manifest = (
+            Manifest.for_input_path(Path(input_path)) if incremental else None
+        )
+        daemon = daemon_from_options(use_daemon, socket_path=socket_path)
+        cython_compiler: CompilerWrapper = (
+            CythonBuildWrapper(preset=directives.lower())
+            if in_process
+            else CythonWrapper(preset=directives.lower())
+        )
+        compiler = (
+            cython_compiler if engine.lower() == "cython" else NuitkaWrapper()
         )
-        compiler_handler.start()
-        if clean_executables:
-            compiler_handler.clean_executables()
+        jobs_files = [(compiler, dir_files)]
+        if auto:
+            engine_plan = plan_from_options(
+                Path(input_path), plan=plan, replan=replan, margin=auto_margin
+            )
+            engine_files = engine_plan.split(dir_files)
+            for directory, python_files in engine_files.get(PYTHON, {}).items():
+                logger.info(
+                    "%sLeaving as python: `%s` %s%s",
+                    Colors.CYAN,
+                    directory,
+                    [file.name for file in python_files],
+                    Colors.RESET,
+                )
+            jobs_files = [
+                (cython_compiler, engine_files.get("cython", {})),
+                (NuitkaWrapper(), engine_files.get("nuitka", {})),
+            ]
+        if package_mode:
+            if engine.lower() != "nuitka":
+                logger.warning(
+                    "%sFlag `--package-mode` is supported only by `nuitka`%s",
+                    Colors.WARNING,
+                    Colors.RESET,
+                )
+            else:
+                if not clean_source:
+                    logger.warning(
+                        "%sWithout `--clean-source` the package directories "
+                        "shadow their compiled extension modules, they can't "
+                        "be imported until their `.py` modules are removed%s",
+                        Colors.WARNING,
+                        Colors.RESET,
+                    )
+                package_compiler = NuitkaPackageWrapper()
+                packages, modules = file_handler.split_packages(dir_files)
+                jobs_files = [
+                    (package_compiler, packages),
+                    (package_compiler.module_compiler(), modules),
+                ]
+        launcher = launcher_from_options(cc_cache=cc_cache, cache_dir=cache_dir)
+        with launcher.activate() if launcher else nullcontext():
+            for job_compiler, files in jobs_files:
+                if not files and not stream:
+                    continue
+                compiler_handler = CompilerHandler(
+                    files=files,
+                    compiler=job_compiler,
+                    clean_source=clean_source,
+                    keep_builds=keep_builds,
+                    jobs=jobs,
+                    manifest=manifest,
+                    cache=cache,
+                    daemon=daemon,
+                )
+                if stream:
+                    compiler_handler.stream(file_handler.stream())
+                else:
+                    compiler_handler.start()
+                if clean_executables:
+                    compiler_handler.clean_executables()
+        if cache is not None:
+            print(f"{Colors.CYAN} Cache {cache.stats} {Colors.RESET}")
+        if launcher is not None:
+            print(
+                f"{Colors.CYAN} C compiler cache `{launcher.name}` "
+                f"{launcher.stats} {Colors.RESET}"
+            )
@@ -0,0 +1,102 @@
+"""
+Daemon command
+"""
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+import click
+
+from src import setup_logging
+from src.daemon import (
+    DEFAULT_SOCKET,
+    CompilerDaemon,
+    DaemonClient,
+    warm_environment,
+    warm_interpreter_args,
+)
+from src.helpers import Colors
+
+logger = logging.getLogger(__name__)
+
+
+@click.command(name="daemon")
+@click.option(
+    "-s",
+    "--socket",
+    "socket_path",
+    default=str(DEFAULT_SOCKET),
+    type=click.Path(dir_okay=False),
+    show_default=True,
+    help="Unix socket path of the daemon, "
+    "it can be set with `PYCOMPILE_DAEMON_SOCKET`",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of files to compile in parallel, defaults to the CPU count",
+)
+@click.option(
+    "--stats",
+    "show_stats",
+    flag_value=True,
+    default=False,
+    help="Show the queue depth and the job latencies of a running daemon",
+)
+@click.option(
+    "--stop",
+    flag_value=True,
+    default=False,
+    help="Stop a running daemon",
+)
+@click.option("-v", "--verbose", count=True, help="verbose level")
+def daemon_cmd(
+    socket_path: str,
+    jobs: int | None,
+    show_stats: bool,
+    stop: bool,
+    verbose: int,
+) -> None:
+    """
+    Start a warm compiler daemon, used by `compile --daemon`.
+    """
+    setup_logging(verbose)
+    client = DaemonClient(socket_path=Path(socket_path))
+    if show_stats or stop:
+        if not client.is_running():
+            print(
+                f"{Colors.FAIL} There isn't any daemon at: `{socket_path}`"
+                f"{Colors.RESET}"
+            )
+            sys.exit(1)
+        if show_stats:
+            print(json.dumps(client.stats(), indent=2))
+        if stop:
+            client.shutdown()
+        return
+    interpreter_args = warm_interpreter_args()
+    if interpreter_args is not None:
+        os.execve(
+            interpreter_args[0],
+            [
+                *interpreter_args,
+                "-c",
+                "from src.cli.entrypoint import main; main()",
+                *sys.argv[1:],
+            ],
+            warm_environment(),
+        )
+    daemon = CompilerDaemon(
+        socket_path=Path(socket_path), workers=jobs or os.cpu_count() or 1
+    )
+    print(f"{Colors.CYAN} Listening at: `{socket_path}` {Colors.RESET}")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
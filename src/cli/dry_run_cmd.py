@@ -2,15 +2,30 @@
 dry run command
 """
 import logging
+from collections import Counter
 from pathlib import Path
+from typing import Optional
 
 import click
 
 from src import FileHandler, setup_logging
+from src.discovery_index import (
+    NEVER_COMPILED,
+    STALE,
+    UP_TO_DATE,
+    index_from_options,
+    module_status,
+)
 from src.helpers import Colors
 
 logger = logging.getLogger(__name__)
 
+STATUS_COLORS = {
+    UP_TO_DATE: Colors.GREEN,
+    STALE: Colors.WARNING,
+    NEVER_COMPILED: Colors.FAIL,
+}
+
 
 @click.command(name="dry_run")
 @click.option(
@@ -27,20 +42,55 @@ logger = logging.getLogger(__name__)
     multiple=True,
     type=str,
     default=FileHandler("..").exclude_patterns,  # type: ignore[arg-type]
-    help="glob files patterns of the files to be excluded, example: **/ignore_this_module.py",
+    help="glob files patterns of the files to be excluded, example: **/ignore_this_module.py, "
+    "the virtual environments, caches, VCS and build directories "
+    "(.venv, venv, node_modules, __pycache__, .git, .tox, *.build, *.dist, ...) "
+    "are never walked",
 )
 @click.option("-v", "--verbose", count=True, help="verbose level")
-def dry_run_cmd(
-    input_path: Path, exclude_glob_paths: list[str], verbose: int
+@click.option(
+    "-s",
+    "--status",
+    "status",
+    flag_value=True,
+    default=False,
+    help="Mark each module as up-to-date, stale or never-compiled "
+    "relative to its executable (.so)",
+)
+@click.option(
+    "--index",
+    "use_index",
+    flag_value=True,
+    default=False,
+    help="Rescan only the directories which changed since the last "
+    "`compile --index`, without updating its `.pycompile/index.json`",
+)
+def dry_run_cmd(  # pylint: disable=R0913 R0917
+    input_path: Path,
+    exclude_glob_paths: list[str],
+    verbose: int,
+    status: bool,
+    use_index: bool,
 ) -> None:
     """
     Perform a dry run.
     """
     setup_logging(verbose)
+    index = index_from_options(Path(input_path), use_index, read_only=True)
     file_handler = FileHandler(
-        input_path=input_path, additional_exclude_patterns=exclude_glob_paths
+        input_path=input_path,
+        additional_exclude_patterns=exclude_glob_paths,
+        index=index,
     )
     dir_files = file_handler.start()
+    if index is not None:
+        logger.info(
+            "%sRescanned #%s of #%s directories%s",
+            Colors.CYAN,
+            index.rescanned,
+            len(index),
+            Colors.RESET,
+        )
     if not dir_files:
         print(
             f"{Colors.CYAN} Nothing found at: `{input_path}` path"
@@ -49,13 +99,31 @@ def dry_run_cmd(
         )
         return
 
+    statuses: Counter[str] = Counter()
     for dir_name, files in dir_files.items():
         print(f"{Colors.CYAN} {dir_name} {Colors.RESET}")
-        render_files(files, is_last=False)
+        if status:
+            files_status = {file: module_status(file) for file in files}
+            statuses.update(files_status.values())
+            render_files(files, is_last=False, statuses=files_status)
+        else:
+            render_files(files, is_last=False)
+    if status:
+        print(
+            f"{Colors.CYAN} "
+            + ", ".join(
+                f"{key}: {statuses[key]}"
+                for key in (UP_TO_DATE, STALE, NEVER_COMPILED)
+            )
+            + f" {Colors.RESET}"
+        )
 
 
 def render_files(
-    files: list[Path], indent: str = "", is_last: bool = True
+    files: list[Path],
+    indent: str = "",
+    is_last: bool = True,
+    statuses: Optional[dict[Path, str]] = None,
 ) -> None:
     """
     Render the output in a human-readable format.
@@ -63,4 +131,11 @@ def render_files(
     branch = "└── " if is_last else "├── "
     indent += "    "
     for file in files:
-        print(f"{indent[:-1]}{branch}{file.name}")
+        if statuses is None:
+            print(f"{indent[:-1]}{branch}{file.name}")
+        else:
+            file_status = statuses[file]
+            print(
+                f"{indent[:-1]}{branch}{file.name} "
+                f"{STATUS_COLORS[file_status]}[{file_status}]{Colors.RESET}"
+            )
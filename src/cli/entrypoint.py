@@ -7,7 +7,9 @@ import click
 
 from src.cli.benchmark_cmd import benchmark_cmd
 from src.cli.compile_cmd import compile_cmd
+from src.cli.daemon_cmd import daemon_cmd
 from src.cli.dry_run_cmd import dry_run_cmd
+from src.cli.watch_cmd import watch_cmd
 
 logger = logging.getLogger(__name__)
 
@@ -28,3 +30,5 @@ def main() -> None:
 main.add_command(compile_cmd)
 main.add_command(benchmark_cmd)
 main.add_command(dry_run_cmd)
+main.add_command(daemon_cmd)
+main.add_command(watch_cmd)
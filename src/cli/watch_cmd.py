@@ -0,0 +1,131 @@
+"""
+Watch command
+"""
+import logging
+import sys
+from pathlib import Path
+
+import click
+
+from src import (
+    CompilerWrapper,
+    CythonBuildWrapper,
+    CythonWrapper,
+    FileHandler,
+    NuitkaWrapper,
+    setup_logging,
+)
+from src.helpers import Colors
+from src.watcher import WatchHandler
+
+logger = logging.getLogger(__name__)
+
+
+@click.command(name="watch")
+@click.option(
+    "-i",
+    "--input-path",
+    required=True,
+    type=click.Path(exists=True, file_okay=False),
+    help="Specify the folder input path to be watched, "
+    "by default it will exclude any `test` and `__init__.py` files",
+)
+@click.option(
+    "-ex",
+    "--exclude-glob-paths",
+    required=False,
+    multiple=True,
+    type=str,
+    default=FileHandler("..").exclude_patterns,  # type: ignore[arg-type]
+    help="glob files patterns of the files to be excluded, example: **/ignore_this_module.py, "
+    "the virtual environments, caches, VCS and build directories "
+    "(.venv, venv, node_modules, __pycache__, .git, .tox, *.build, *.dist, ...) "
+    "are never walked",
+)
+@click.option("-v", "--verbose", count=True, help="verbose level")
+@click.option(
+    "-e",
+    "--engine",
+    default="cython",
+    help="CompilerWrapper to be used, defaults to: `cython`",
+    type=click.Choice(["cython", "nuitka"], case_sensitive=False),
+)
+@click.option(
+    "-kb",
+    "--keep-builds",
+    "keep_builds",
+    flag_value=True,
+    default=False,
+    help="Keep temporary build files",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of files to compile in parallel, defaults to the CPU count",
+)
+@click.option(
+    "-ip",
+    "--in-process",
+    "in_process",
+    flag_value=True,
+    default=False,
+    help="Run `cython` within the pycompile process, "
+    "building each directory at once instead of a `cythonize` per file",
+)
+@click.option(
+    "--debounce",
+    default=0.3,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="Seconds without any change before recompiling",
+)
+@click.option(
+    "--polling",
+    flag_value=True,
+    default=False,
+    help="Poll for changes instead of using `inotify`",
+)
+@click.option(
+    "-b",
+    "--bench",
+    flag_value=True,
+    default=False,
+    help="Rerun the cpu benchmark of the matching `test_<module>.py` "
+    "files after each rebuild",
+)
+def watch_cmd(  # pylint: disable=R0913 R0917
+    input_path: Path,
+    exclude_glob_paths: list[str],
+    verbose: int,
+    engine: str,
+    keep_builds: bool,
+    jobs: int | None,
+    in_process: bool,
+    debounce: float,
+    polling: bool,
+    bench: bool,
+) -> None:
+    """
+    Watch the python files and recompile them once they change.
+    """
+    setup_logging(verbose)
+    compiler: CompilerWrapper = NuitkaWrapper()
+    if engine.lower() == "cython":
+        compiler = CythonBuildWrapper() if in_process else CythonWrapper()
+    watch_handler = WatchHandler(
+        input_path=Path(input_path),
+        compiler=compiler,
+        exclude_patterns=exclude_glob_paths,
+        delay=debounce,
+        bench=bench,
+        polling=polling,
+        jobs=jobs,
+        keep_builds=keep_builds,
+    )
+    try:
+        watch_handler.start()
+    except KeyboardInterrupt:
+        print(f"{Colors.CYAN} Stopped watching: `{input_path}` {Colors.RESET}")
+        sys.exit(0)
@@ -2,46 +2,111 @@
 `CompilerHandler` implementation
 """
 import logging
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from pathlib import Path
+from queue import Empty, Queue
+from typing import Iterable, Optional
 
 from tqdm import tqdm
 
-from src.helpers import Colors, change_dir, run_sub_process
+from src.cache import ArtifactCache
+from src.daemon import DaemonClient
+from src.helpers import Colors, run_sub_process
+from src.import_graph import ImportGraph
+from src.manifest import Manifest
 from src.wrappers import CompilerWrapper
 
 logger = logging.getLogger(__name__)
 
 
-class CompilerHandler:
+class CompilerHandler:  # pylint: disable=R0902
     """
     CompilerHandler is responsible for compiling all the ``.py`` files using
     ``Cython`` or ``Nuitka``
     example usage::
         compiler_handler = CompilerHandler(files=dir_files,compiler=compiler,
-                            clean_source=True,keep_builds=True)
+                            clean_source=True,keep_builds=True, jobs=8)
         compiler_handler.start()
     """
 
-    def __init__(
+    def __init__(  # pylint: disable=R0913 R0917
         self,
         files: dict[str, list[Path]],
         compiler: CompilerWrapper,
         clean_source: bool = False,
         keep_builds: bool = True,
+        jobs: Optional[int] = None,
+        manifest: Optional[Manifest] = None,
+        cache: Optional[ArtifactCache] = None,
+        daemon: Optional[DaemonClient] = None,
+        graph: Optional[ImportGraph] = None,
     ):
+        """
+        :param files: valid files within each directory.
+        :param compiler: the compiler to be used.
+        :param clean_source: delete the ``.py`` files after compiling them.
+        :param keep_builds: keep the temporary build files.
+        :param jobs: number of files to be compiled in parallel,
+                     defaults to the number of CPUs.
+        :param manifest: when it's given, only the files which changed since
+                         their last build are compiled.
+        :param cache: when it's given, the executables are restored from it
+                      instead of being recompiled.
+        :param daemon: when it's given, the compile commands are submitted to
+                       the warm compiler daemon instead of a new subprocess.
+        :param graph: the import graph of (at least) the files, unless it's
+                      given it's built from them only once it's needed.
+        """
         self.files = files
         self.compiler = compiler
         self.clean_source = clean_source
         self.keep_builds = keep_builds
+        self.jobs = jobs or os.cpu_count() or 1
+        self.manifest = manifest
+        self.cache = cache
+        self.daemon = daemon
+        self._graph = graph
 
-    @staticmethod
-    def _clean_source_files(files: list[Path]) -> None:
+    @property
+    def graph(self) -> ImportGraph:
         """
-        Cleans the `source` files.
+        The import graph of the files, it's built on its first use
+        (the order of the compile jobs, the dependencies of the ``manifest``
+        and the ``cache`` entries), parsing all the files.
         """
-        deleted = [file.unlink() for file in files]  # type: ignore[func-returns-value]
+        if self._graph is None:
+            self._graph = ImportGraph(files=self.files)
+        return self._graph
+
+    def _clean_source_files(self, files: list[Path]) -> None:
+        """
+        Cleans the `source` files, for a package directory only the modules
+        compiled into its extension module, along with the directories left
+        empty, so the rest of it (tests, data files) is kept and it doesn't
+        shadow the extension module anymore.
+        """
+        for file in files:
+            for source in self.compiler.sources(Path(file)):
+                source.unlink(missing_ok=True)
+            if Path(file).is_dir():
+                for directory, _, _ in sorted(
+                    os.walk(file), key=lambda item: len(item[0]), reverse=True
+                ):
+                    if set(os.listdir(directory)) <= {"__pycache__"}:
+                        shutil.rmtree(directory)
         logger.warning(
-            "%sFlag `--clean-source` is on, deleted " f"#{len(deleted)}" "%s",
+            "%sFlag `--clean-source` is on, deleted " f"#{len(files)}" "%s",
             Colors.CYAN,
             Colors.RESET,
         )
@@ -59,6 +124,140 @@ class CompilerHandler:
             Colors.RESET,
         )
 
+    def _finish_directory(self, dir_files: list[Path]) -> None:
+        """
+        Runs the cleanup steps for a directory once all of its files
+        have been compiled.
+        """
+        if not self.keep_builds:
+            self._clean_build_files(files=dir_files)
+        if self.clean_source:
+            self._clean_source_files(files=dir_files)
+
+    def _files_to_compile(self) -> dict[str, list[Path]]:
+        """
+        All the files, or only the outdated ones when a ``manifest`` is used.
+        """
+        if self.manifest is None:
+            return self.files
+        files: dict[str, list[Path]] = {}
+        skipped = 0
+        for directory, dir_files in self.files.items():
+            outdated = [
+                file
+                for file in dir_files
+                if not self.manifest.is_up_to_date(
+                    Path(file),
+                    self.compiler,
+                    self.graph.dependencies_hash(Path(file)),
+                )
+            ]
+            skipped += len(dir_files) - len(outdated)
+            if outdated:
+                files[directory] = outdated
+        logger.info(
+            "%sSkipping #%s up-to-date file(s)%s",
+            Colors.CYAN,
+            skipped,
+            Colors.RESET,
+        )
+        return files
+
+    def _restore_from_cache(
+        self, files: dict[str, list[Path]]
+    ) -> dict[str, list[Path]]:
+        """
+        Restores the cached executables.
+
+        :return: the files which are missing from the cache.
+        """
+        if self.cache is None:
+            return files
+        missing: dict[str, list[Path]] = {}
+        for directory, dir_files in files.items():
+            for file in dir_files:
+                dependencies = self.graph.dependencies_hash(Path(file))
+                if self.cache.restore(Path(file), self.compiler, dependencies):
+                    if self.manifest is not None:
+                        self.manifest.record(
+                            Path(file), self.compiler, dependencies=dependencies
+                        )
+                else:
+                    self.cache.detach(Path(file))
+                    missing.setdefault(directory, []).append(file)
+        return missing
+
+    def _on_compiled(self, file: Path, started: float) -> None:
+        """
+        Updates the manifest and the cache with a new executable.
+        """
+        if self.manifest is None and self.cache is None:
+            return
+        dependencies = self.graph.dependencies_hash(file)
+        if self.manifest is not None:
+            self.manifest.record(
+                file, self.compiler, started, dependencies=dependencies
+            )
+        if self.cache is not None:
+            self.cache.store(
+                file, self.compiler, started, dependencies=dependencies
+            )
+
+    def _jobs(self, dir_files: list[Path]) -> list[list[Path]]:
+        """
+        Splits the files of a directory into compile jobs,
+        one per file or one per directory for the ``batch`` compilers.
+        """
+        if self.compiler.batch:
+            return [dir_files]
+        return [[file] for file in dir_files]
+
+    def _priority(self, job: list[Path]) -> int:
+        """
+        The longest critical path through the modules of a job.
+        """
+        return max(self.graph.critical_path(Path(file)) for file in job)
+
+    def _submit(
+        self, executor: ThreadPoolExecutor, job: list[Path]
+    ) -> Future[None]:
+        """
+        Submits a compile job to the ``executor``.
+        """
+        if self.compiler.batch:
+            return executor.submit(self.compiler.build, files=job)
+        if self.daemon is not None:
+            return executor.submit(
+                self.daemon.run_sub_process,
+                files=job,
+                compile_cmd=self.compiler.cmd,
+            )
+        return executor.submit(
+            run_sub_process, files=job, compile_cmd=self.compiler.cmd
+        )
+
+    def _job_done(
+        self, future: Future[None], job: list[Path], started: float
+    ) -> Optional[BaseException]:
+        """
+        Records the executables of a finished compile job.
+
+        :return: the error of the job, if it failed.
+        """
+        try:
+            future.result()
+        except Exception as error:  # pylint: disable=broad-except
+            logger.error(
+                "%sFailed to compile: `%s`%s",
+                Colors.FAIL,
+                job,
+                Colors.RESET,
+            )
+            return error
+        for file in job:
+            self._on_compiled(Path(file), started=started)
+        return None
+
     def clean_executables(self) -> None:
         """
         Cleans all the `.so` files.
@@ -67,26 +266,175 @@ class CompilerHandler:
             for executable in Path(directory).glob(pattern="*.so"):
                 executable.unlink(missing_ok=True)
 
-    def start(self) -> None:
+    def start(self) -> None:  # pylint: disable=R0914
         """
         For each ``.py`` file runs the compiler command
-        to build the final executable ``.so``
-        """
-        total_iterations = sum(len(files) for files in self.files.values())
-        for directory, dir_files in tqdm(
-            self.files.items(),
-            total=total_iterations,
-            ascii=True,
-            desc=f"{Colors.CYAN}Compiling using: `{self.compiler}`{Colors.RESET}",
-            dynamic_ncols=True,
+        to build the final executable ``.so``.
+
+        Up to ``jobs`` files (or directories for the ``batch`` compilers)
+        are compiled in parallel, starting from the modules on the longest
+        path of the import graph, the cleanup of each directory runs only
+        after all of its files have been compiled.
+        """
+        files = self._files_to_compile()
+        to_compile = self._restore_from_cache(files)
+        for directory in files.keys() - to_compile.keys():
+            self._finish_directory(dir_files=files[directory])
+        total_iterations = sum(
+            len(dir_files) for dir_files in to_compile.values()
+        )
+        pending = {
+            directory: len(dir_files)
+            for directory, dir_files in to_compile.items()
+        }
+        errors: list[BaseException] = []
+        started = time.time()
+        with (
+            ThreadPoolExecutor(
+                max_workers=max(1, min(self.jobs, total_iterations))
+            ) as executor,
+            tqdm(
+                total=total_iterations,
+                ascii=True,
+                desc=f"{Colors.CYAN}Compiling using: `{self.compiler}`{Colors.RESET}",
+                dynamic_ncols=True,
+            ) as progress,
         ):
-            with change_dir(Path(directory)):
-                try:
-                    run_sub_process(
-                        files=dir_files, compile_cmd=self.compiler.cmd
+            jobs = sorted(
+                (
+                    (directory, job)
+                    for directory, dir_files in to_compile.items()
+                    for job in self._jobs(dir_files)
+                ),
+                key=lambda item: self._priority(item[1]),
+                reverse=True,
+            )
+            futures: dict[Future[None], tuple[str, list[Path]]] = {
+                self._submit(executor, job): (directory, job)
+                for directory, job in jobs
+            }
+            for future in as_completed(futures):
+                directory, job = futures[future]
+                if error := self._job_done(future, job, started):
+                    errors.append(error)
+                progress.set_postfix_str(Path(job[-1]).name)
+                progress.update(len(job))
+                pending[directory] -= len(job)
+                if not pending[directory]:
+                    self._finish_directory(dir_files=files[directory])
+        if self.manifest is not None:
+            self.manifest.save()
+        if self.cache is not None:
+            self.cache.evict()
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _start_discovery(
+        batches: Iterable[tuple[str, list[Path]]],
+        queue: Queue[Optional[tuple[str, list[Path]]]],
+        errors: list[BaseException],
+    ) -> threading.Thread:
+        """
+        Starts a thread consuming the ``batches`` into the ``queue``,
+        it blocks while the ``queue`` is full and puts a None at the end.
+        """
+
+        def discover() -> None:
+            try:
+                for batch in batches:
+                    queue.put(batch)
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+            finally:
+                queue.put(None)
+
+        discovery = threading.Thread(target=discover, daemon=True)
+        discovery.start()
+        return discovery
+
+    def stream(  # pylint: disable=R0914
+        self, batches: Iterable[tuple[str, list[Path]]]
+    ) -> None:
+        """
+        Compiles the files of each directory of the ``batches`` as soon as
+        it's discovered, instead of waiting for the whole discovery.
+
+        The ``batches`` are consumed by a discovery thread into a bounded
+        queue, and up to ``2 * jobs`` compile jobs are in flight. The files of
+        a directory are dropped once it's finished, only its path is kept
+        (for ``clean_executables``), so the memory grows with the number of
+        directories instead of the number of files.
+        The files have to be up-front for the import graph, so
+        the ``manifest`` and the ``cache`` can't be used.
+
+        :param batches: each directory with its valid files,
+                        for example: ``FileHandler.stream()``.
+        """
+        if self.manifest is not None or self.cache is not None:
+            raise ValueError(
+                "Streaming can't be used with a manifest or a cache, "
+                "they require the import graph of all the files"
+            )
+        queue: Queue[Optional[tuple[str, list[Path]]]] = Queue(
+            maxsize=self.jobs
+        )
+        discovery_errors: list[BaseException] = []
+        discovery = self._start_discovery(batches, queue, discovery_errors)
+        jobs: deque[tuple[str, list[Path]]] = deque()
+        in_flight: dict[Future[None], tuple[str, list[Path]]] = {}
+        pending: dict[str, tuple[int, list[Path]]] = {}
+        errors: list[BaseException] = []
+        discovering = True
+        total_iterations = 0
+        started = time.time()
+        with (
+            ThreadPoolExecutor(max_workers=self.jobs) as executor,
+            tqdm(
+                total=0,
+                ascii=True,
+                desc=f"{Colors.CYAN}Compiling using: `{self.compiler}`{Colors.RESET}",
+                dynamic_ncols=True,
+            ) as progress,
+        ):
+            while discovering or jobs or in_flight:
+                for future in [future for future in in_flight if future.done()]:
+                    directory, job = in_flight.pop(future)
+                    if error := self._job_done(future, job, started):
+                        errors.append(error)
+                    progress.set_postfix_str(Path(job[-1]).name)
+                    progress.update(len(job))
+                    remaining, dir_files = pending.pop(directory)
+                    if remaining > len(job):
+                        pending[directory] = (remaining - len(job), dir_files)
+                    else:
+                        self._finish_directory(dir_files=dir_files)
+                while jobs and len(in_flight) < 2 * self.jobs:
+                    directory, job = jobs.popleft()
+                    in_flight[self._submit(executor, job)] = (directory, job)
+                if discovering and not jobs:
+                    try:
+                        batch = queue.get(timeout=0.05 if in_flight else None)
+                    except Empty:
+                        continue
+                    if batch is None:
+                        discovering = False
+                        continue
+                    directory, dir_files = batch
+                    self.files[directory] = []
+                    remaining, previous = pending.get(directory, (0, []))
+                    pending[directory] = (
+                        remaining + len(dir_files),
+                        previous + dir_files,
+                    )
+                    jobs.extend(
+                        (directory, job) for job in self._jobs(dir_files)
                     )
-                finally:
-                    if not self.keep_builds:
-                        self._clean_build_files(files=dir_files)
-                    if self.clean_source:
-                        self._clean_source_files(files=dir_files)
+                    total_iterations += len(dir_files)
+                    progress.total = total_iterations
+                    progress.refresh()
+                elif in_flight:
+                    wait(in_flight, return_when=FIRST_COMPLETED)
+        discovery.join()
+        if errors or discovery_errors:
+            raise (errors or discovery_errors)[0]
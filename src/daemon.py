@@ -0,0 +1,367 @@
+"""
+Persistent compiler daemon.
+
+The daemon listens on a Unix socket and runs the compile jobs in processes forked
+from a warm ``forkserver``, where the compilers are already imported, instead of
+starting a fresh interpreter for every file.
+The protocol is one JSON request/response per line::
+
+    {"op": "compile", "file": "/path/to/module.py", "cmd": "cythonize {} -3"}
+    {"op": "stats"}
+    {"op": "shutdown"}
+"""
+import json
+import logging
+import multiprocessing
+import os
+import runpy
+import shlex
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from src.helpers import Colors
+
+logger = logging.getLogger(__name__)
+
+# The socket is created within a directory only its user can access.
+DEFAULT_SOCKET = Path(
+    os.environ.get(
+        "PYCOMPILE_DAEMON_SOCKET",
+        Path(tempfile.gettempdir())
+        / f"pycompile-{os.getuid()}"
+        / "daemon.sock",
+    )
+)
+# Compiler modules imported once by the `forkserver`,
+# `nuitka` allows only the modules which don't depend on its options.
+PRELOAD_MODULES = [
+    "Cython.Build.Cythonize",
+    "Cython.Compiler.Main",
+    "nuitka.options.Options",
+    "nuitka.plugins.Plugins",
+]
+QUIET_REDIRECT = "2>/dev/null"
+
+
+def parse_command(cmd_str: str) -> tuple[Optional[str], list[str], bool]:
+    """
+    Maps a shell compile command to the module that implements it,
+    only the ``cythonize`` and the ``python -m nuitka`` commands are known.
+
+    :return: the module to be run as ``__main__`` (None for unknown commands),
+             its ``argv`` and if its ``stderr`` is redirected to ``/dev/null``.
+    """
+    tokens = shlex.split(cmd_str)
+    quiet = QUIET_REDIRECT in tokens
+    tokens = [token for token in tokens if token != QUIET_REDIRECT]
+    if (
+        len(tokens) > 2
+        and tokens[0] in ("python", sys.executable)
+        and tokens[1:3] == ["-m", "nuitka"]
+    ):
+        return "nuitka", ["nuitka", *tokens[3:]], quiet
+    if tokens and tokens[0] == "cythonize":
+        return "Cython.Build.Cythonize", tokens, quiet
+    return None, tokens, quiet
+
+
+def warm_interpreter_args() -> Optional[list[str]]:
+    """
+    ``Nuitka`` re-executes itself unless the interpreter runs without ``site``,
+    with ``PYTHONHASHSEED=0`` and without frozen modules.
+
+    :return: the interpreter arguments to restart the daemon with,
+             or None if the current interpreter is already suitable.
+    """
+    if (
+        sys.flags.no_site
+        and os.environ.get("PYTHONHASHSEED") == "0"
+        and (
+            sys.version_info < (3, 11)
+            or getattr(sys, "_xoptions", {}).get("frozen_modules") == "off"
+        )
+    ):
+        return None
+    args = [sys.executable, "-S"]
+    if sys.version_info >= (3, 11):
+        args.extend(["-X", "frozen_modules=off"])
+    return args
+
+
+def warm_environment() -> dict[str, str]:
+    """
+    The environment of the restarted daemon, without ``site``
+    the ``sys.path`` is passed through the ``PYTHONPATH``.
+    """
+    return {
+        **os.environ,
+        "PYTHONHASHSEED": "0",
+        "PYTHONPATH": os.pathsep.join(path for path in sys.path if path),
+    }
+
+
+def private_directory(directory: Path) -> None:
+    """
+    Creates the ``directory`` of the socket, only its user can access it.
+
+    :raises PermissionError: if it exists and it's owned by another user.
+    """
+    directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if directory.stat().st_uid != os.getuid():
+        raise PermissionError(
+            f"Socket directory: `{directory}` is owned by another user"
+        )
+
+
+def _run_job(module: str, argv: list[str], cwd: str, quiet: bool) -> None:
+    """
+    Runs the compiler ``module`` within a forked process.
+    """
+    os.chdir(cwd)
+    sys.argv = argv
+    if quiet:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 2)
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+@dataclass
+class DaemonStats:
+    """
+    Daemon statistics.
+    """
+
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def summary(self) -> dict[str, Any]:
+        """
+        The queue depth and the per job latency statistics
+        of the last 1000 jobs.
+        """
+        latencies = sorted(self.latencies)
+        summary = asdict(self)
+        summary["latencies"] = {
+            "count": len(latencies),
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "median": latencies[len(latencies) // 2] if latencies else 0.0,
+            "max": latencies[-1] if latencies else 0.0,
+        }
+        return summary
+
+
+class CompilerDaemon(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    """
+    CompilerDaemon accepts compile jobs on a Unix socket and runs up to
+    ``workers`` of them at once.
+    example usage::
+        CompilerDaemon(socket_path=DEFAULT_SOCKET, workers=8).serve_forever()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path = DEFAULT_SOCKET, workers: int = 1):
+        """
+        :param socket_path: the Unix socket path.
+        :param workers: number of compile jobs to be run in parallel.
+        """
+        self.socket_path = Path(socket_path)
+        private_directory(self.socket_path.parent)
+        self.socket_path.unlink(missing_ok=True)
+        self.stats = DaemonStats()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(PRELOAD_MODULES)
+        super().__init__(str(self.socket_path), _DaemonRequestHandler)
+
+    def server_bind(self) -> None:
+        """
+        Binds the socket, only its user can connect to it.
+        """
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+        os.chmod(self.socket_path, 0o600)
+
+    def compile(self, file: str, cmd: str) -> dict[str, Any]:
+        """
+        Runs the compile ``cmd`` for the ``file`` within its directory,
+        the commands which aren't known compile commands are rejected.
+        """
+        try:
+            module, _, _ = parse_command(cmd.format(file))
+        except (ValueError, LookupError):
+            module = None
+        if module is None:
+            logger.warning("Rejected unknown command: `%s`", cmd)
+            return {"error": f"Unknown compile command: `{cmd}`"}
+        with self._lock:
+            self.stats.queued += 1
+        with self._slots:
+            with self._lock:
+                self.stats.queued -= 1
+                self.stats.running += 1
+            started = time.perf_counter()
+            try:
+                return_code = self._run(file=Path(file), cmd=cmd)
+            finally:
+                latency = time.perf_counter() - started
+                with self._lock:
+                    self.stats.running -= 1
+                    self.stats.latencies.append(latency)
+        with self._lock:
+            if return_code == 0:
+                self.stats.completed += 1
+            else:
+                self.stats.failed += 1
+        logger.info("Compiled: `%s` in %.2fs", file, latency)
+        return {"return_code": return_code, "latency": latency}
+
+    def _run(self, file: Path, cmd: str) -> Optional[int]:
+        module, argv, quiet = parse_command(cmd.format(file))
+        if module is None:
+            return None
+        process = self._context.Process(
+            target=_run_job, args=(module, argv, str(file.parent), quiet)
+        )
+        process.start()
+        process.join()
+        return process.exitcode
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    server: CompilerDaemon
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = None
+            if not isinstance(request, dict):
+                request = {"op": None, "request": line.decode(errors="replace")}
+            match request.get("op"):
+                case "compile" if isinstance(
+                    request.get("file"), str
+                ) and isinstance(request.get("cmd"), str):
+                    response = self.server.compile(
+                        file=request["file"], cmd=request["cmd"]
+                    )
+                case "stats":
+                    response = self.server.stats.summary()
+                case "shutdown":
+                    response = {"shutdown": True}
+                    threading.Thread(target=self.server.shutdown).start()
+                case _:
+                    response = {"error": f"Invalid request: {request}"}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class DaemonClient:
+    """
+    DaemonClient submits the compile jobs to a running ``CompilerDaemon``,
+    it can be used instead of the ``run_sub_process``.
+    example usage::
+        client = DaemonClient()
+        if client.is_running():
+            client.run_sub_process(files=files, compile_cmd=compiler.cmd)
+    """
+
+    def __init__(self, socket_path: Path = DEFAULT_SOCKET):
+        self.socket_path = Path(socket_path)
+
+    def _request(self, **request: Any) -> dict[str, Any]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(str(self.socket_path))
+            connection.sendall(json.dumps(request).encode() + b"\n")
+            with connection.makefile("rb") as response:
+                return dict(json.loads(response.readline()))
+
+    def is_running(self) -> bool:
+        """
+        Checks if the daemon accepts requests.
+        """
+        try:
+            self._request(op="stats")
+        except OSError:
+            return False
+        return True
+
+    def run_sub_process(self, files: list[Path], compile_cmd: str) -> None:
+        """
+        For each file path run the corresponding compiler command
+        within the daemon.
+        """
+        for file in files:
+            response = self._request(
+                op="compile", file=str(Path(file).absolute()), cmd=compile_cmd
+            )
+            if response.get("error") or response.get("return_code"):
+                logger.error(
+                    "%sDaemon failed to compile: `%s` %s%s",
+                    Colors.FAIL,
+                    file,
+                    response.get("error", ""),
+                    Colors.RESET,
+                )
+
+    def stats(self) -> dict[str, Any]:
+        """
+        The daemon statistics.
+        """
+        return self._request(op="stats")
+
+    def shutdown(self) -> None:
+        """
+        Stops the daemon.
+        """
+        self._request(op="shutdown")
+
+    def __repr__(self) -> str:
+        return f"DaemonClient(socket_path={self.socket_path})"
+
+
+def daemon_from_options(
+    use_daemon: bool, socket_path: Optional[str] = None
+) -> Optional[DaemonClient]:
+    """
+    Creates the ``DaemonClient`` from the cli options,
+    if the daemon isn't running the files are compiled locally.
+
+    :param use_daemon: submit the compile jobs to the daemon.
+    :param socket_path: the Unix socket path of the daemon,
+                        defaults to the ``DEFAULT_SOCKET``.
+    """
+    if not use_daemon:
+        return None
+    client = DaemonClient(socket_path=Path(socket_path or DEFAULT_SOCKET))
+    if not client.is_running():
+        logger.warning(
+            "%sThere isn't any daemon at: `%s`, compiling locally..%s",
+            Colors.WARNING,
+            client.socket_path,
+            Colors.RESET,
+        )
+        return None
+    return client
@@ -0,0 +1,109 @@
+"""
+Cython compiler directives sweep, the speedup of each directives preset
+over the default directives, for each module.
+"""
+import statistics
+from pathlib import Path
+from typing import Sequence
+
+from src.engine_plan import DEFAULT_MARGIN, PYTHON, choose_engine, module_tests
+from src.results import BenchResult, render_table, speedups
+from src.wrappers import (
+    DEFAULT_PRESET,
+    DIRECTIVE_PRESETS,
+    CompilerCommands,
+    CompilerWrapper,
+    CythonWrapper,
+)
+
+
+def sweep_compilers(
+    compilers: Sequence[CompilerWrapper], sweep: bool
+) -> list[CompilerWrapper]:
+    """
+    The ``compilers`` with a ``cython`` compiler for each directives preset
+    instead of the default ``cython`` one, if ``sweep`` is set.
+    """
+    if not sweep:
+        return list(compilers)
+    default = str(CythonWrapper())
+    return [compiler for compiler in compilers if str(compiler) != default] + [
+        CythonWrapper(cmd=CompilerCommands.cython_bench, preset=preset)
+        for preset in DIRECTIVE_PRESETS
+    ]
+
+
+def sweep_table(
+    results: list[BenchResult],
+    input_path: Path,
+    prof_func_name: str = "benchmark",
+) -> str:
+    """
+    Renders the speedup of each directives preset over the default
+    directives in a human-readable table, for each module (the geometric
+    mean of the speedups of its tests) with the fastest preset of it,
+    the ``default`` one unless another one is faster by the ``auto``
+    engine margin.
+    The tests which failed with any preset are left out.
+    """
+    default = str(CythonWrapper())
+    presets = {
+        str(CythonWrapper(preset=preset)): preset
+        for preset in DIRECTIVE_PRESETS
+        if preset != DEFAULT_PRESET
+    }
+    failed = {result.test for result in results if result.outcome != "passed"}
+    preset_speedups = speedups(
+        [
+            result
+            for result in results
+            if result.engine in {default, *presets}
+            and result.test not in failed
+        ],
+        baseline=default,
+    )
+    if not preset_speedups:
+        return ""
+    tests = [
+        result.test
+        for result in results
+        if result.engine == default and result.test not in failed
+    ]
+    modules = module_tests(Path(input_path), tests, prof_func_name)
+    root = Path(input_path).resolve()
+    rows = [["", *presets.values(), "fastest"]]
+    for module, module_test_ids in sorted(modules.items()):
+        ratios = {
+            preset: statistics.geometric_mean(
+                preset_speedups[engine][test] for test in module_test_ids
+            )
+            for engine, preset in presets.items()
+            if all(
+                test in preset_speedups.get(engine, {})
+                for test in module_test_ids
+            )
+        }
+        fastest = choose_engine(ratios, DEFAULT_MARGIN)
+        rows.append(
+            [
+                module.relative_to(root).as_posix(),
+                *(
+                    f"x{ratios[preset]:.2f}" if preset in ratios else "-"
+                    for preset in presets.values()
+                ),
+                DEFAULT_PRESET if fastest == PYTHON else fastest,
+            ]
+        )
+    rows.append(
+        [
+            "geometric_mean",
+            *(
+                f"x{preset_speedups[engine]['geometric_mean']:.2f}"
+                if engine in preset_speedups
+                else "-"
+                for engine in presets
+            ),
+            "",
+        ]
+    )
+    return render_table(f"Directives speedup vs `{default}`", rows)
@@ -0,0 +1,192 @@
+"""
+Discovery index, used to skip rescanning the unchanged directories.
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from src.manifest import MANIFEST_DIR, find_executable
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+# The indexes of another version are rebuilt from scratch.
+INDEX_VERSION = 2
+# A directory modified within this many seconds of its scan isn't trusted,
+# a change within the same mtime tick wouldn't be noticed.
+RACY_SECONDS = 2.0
+
+UP_TO_DATE = "up-to-date"
+STALE = "stale"
+NEVER_COMPILED = "never-compiled"
+
+
+def module_status(file_path: Path) -> str:
+    """
+    The status of the ``file_path`` module relative to its executable,
+    ``never-compiled`` without any executable, ``stale`` when the module
+    was modified after its executable was built, otherwise ``up-to-date``.
+    """
+    executable = find_executable(Path(file_path))
+    if executable is None:
+        return NEVER_COMPILED
+    if Path(file_path).stat().st_mtime_ns > executable.stat().st_mtime_ns:
+        return STALE
+    return UP_TO_DATE
+
+
+class DiscoveryIndex:
+    """
+    DiscoveryIndex keeps the ``mtime`` and the ``inode`` of each walked
+    directory, with the names of its sub-directories and ``.py`` files
+    (and of the ones which are symlinks).
+    A directory is rescanned only when its ``mtime`` or ``inode`` changed,
+    which happens whenever an entry is created, deleted or renamed within it.
+    A ``read_only`` index is never saved.
+    example usage::
+        index = DiscoveryIndex.for_input_path(Path("./my_module"))
+        for directory, names, links in index.walk("./my_module", is_excluded_dir):
+            ...
+        index.save()
+    """
+
+    def __init__(self, path: Path, read_only: bool = False):
+        """
+        :param path: the ``index.json`` file path, it will be created
+                     on the first save.
+        :param read_only: the index isn't written to the disk.
+        """
+        self.path = path
+        self.read_only = read_only
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.rescanned = 0
+        self._dropped = False
+        if self.path.is_file():
+            try:
+                content = json.loads(self.path.read_text())
+                if content.get("version") == INDEX_VERSION:
+                    self.entries = content["directories"]
+            except (ValueError, KeyError, AttributeError):
+                logger.warning("Ignoring corrupted index: `%s`", self.path)
+
+    @classmethod
+    def for_input_path(
+        cls, input_path: Path, read_only: bool = False
+    ) -> "DiscoveryIndex":
+        """
+        The index stored within the ``.pycompile`` directory
+        next to the ``input_path``.
+        """
+        input_path = Path(input_path).resolve()
+        root = input_path if input_path.is_dir() else input_path.parent
+        return cls(path=root / MANIFEST_DIR / INDEX_FILE, read_only=read_only)
+
+    @staticmethod
+    def _scan(directory: str, dir_stat: os.stat_result) -> dict[str, Any]:
+        """
+        The index entry of a directory.
+        """
+        files: list[str] = []
+        links: list[str] = []
+        dirs: list[str] = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif entry.name.endswith(".py") and entry.is_file():
+                    files.append(entry.name)
+                    if entry.is_symlink():
+                        links.append(entry.name)
+        racy = time.time_ns() - dir_stat.st_mtime_ns < RACY_SECONDS * 1e9
+        return {
+            "mtime_ns": -1 if racy else dir_stat.st_mtime_ns,
+            "inode": dir_stat.st_ino,
+            "files": sorted(files),
+            "links": sorted(links),
+            "dirs": sorted(dirs),
+        }
+
+    def walk(
+        self, start: str, is_excluded_dir: Callable[[str], bool]
+    ) -> Iterator[tuple[str, list[str], list[str]]]:
+        """
+        Walks the ``start`` directory, rescanning only the directories
+        which changed since the last walk.
+
+        :param start: the directory to be walked, where the index is stored.
+        :param is_excluded_dir: the directory names not to be walked.
+        :return: each directory with the names of its ``.py`` files,
+                 and of the ones which are symlinks.
+        """
+        walked: set[str] = set()
+        stack = [start]
+        while stack:
+            directory = stack.pop()
+            key = directory[len(start) :].lstrip(os.sep) or "."
+            try:
+                dir_stat = os.stat(directory)
+                entry: Optional[dict[str, Any]] = self.entries.get(key)
+                if (
+                    entry is None
+                    or entry["mtime_ns"] != dir_stat.st_mtime_ns
+                    or entry["inode"] != dir_stat.st_ino
+                ):
+                    entry = self.entries[key] = self._scan(directory, dir_stat)
+                    self.rescanned += 1
+            except OSError as error:
+                logger.debug("Skipping: `%s`, %s", directory, error)
+                continue
+            walked.add(key)
+            if entry["files"]:
+                yield directory, entry["files"], entry["links"]
+            stack.extend(
+                os.path.join(directory, name)
+                for name in reversed(entry["dirs"])
+                if not is_excluded_dir(name)
+            )
+        # The deleted (or no longer walked) directories.
+        if len(walked) != len(self.entries):
+            self.entries = {key: self.entries[key] for key in walked}
+            self._dropped = True
+
+    def save(self) -> None:
+        """
+        Writes the index to the disk, if any directory changed
+        (and it isn't ``read_only``).
+        """
+        if self.read_only or (
+            not self.rescanned and not self._dropped and self.path.is_file()
+        ):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(
+            json.dumps({"version": INDEX_VERSION, "directories": self.entries})
+        )
+        os.replace(temp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return f"DiscoveryIndex(path={self.path}, directories={len(self)})"
+
+
+def index_from_options(
+    input_path: Path, use_index: bool, read_only: bool = False
+) -> Optional[DiscoveryIndex]:
+    """
+    Creates the ``DiscoveryIndex`` of the ``input_path`` from the cli options,
+    it's opt-in as it's written within the input path and the builds
+    next to the sources modify their directories anyway.
+
+    :param input_path: the file/folder input path.
+    :param use_index: rescan only the directories which changed.
+    :param read_only: the index isn't written to the disk.
+    """
+    if not use_index:
+        return None
+    return DiscoveryIndex.for_input_path(input_path, read_only=read_only)
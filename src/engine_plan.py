@@ -0,0 +1,279 @@
+"""
+Engine plan, the engine of each module chosen by benchmarking its tests.
+"""
+import json
+import logging
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from src.benchmark import BASELINE, Benchmark
+from src.file_handler import FileHandler, GlobMatcher
+from src.import_graph import ImportGraph
+from src.manifest import MANIFEST_DIR, file_hash
+from src.results import collect_results, speedups
+from src.wrappers import CompilerCommands, CythonWrapper, NuitkaWrapper
+
+logger = logging.getLogger(__name__)
+
+PLAN_FILE = "plan.json"
+# The engine of the modules which are left as `.py` files.
+PYTHON = "python"
+# The minimum speedup (in percent) an engine needs to be chosen.
+DEFAULT_MARGIN = 5.0
+
+
+def choose_engine(engine_speedups: dict[str, float], margin: float) -> str:
+    """
+    The fastest engine of a module, or ``python`` if none of them is faster
+    than the interpreted module by more than ``margin`` percent.
+
+    :param engine_speedups: the speedup of each engine over the python one.
+    """
+    if not engine_speedups:
+        return PYTHON
+    engine, ratio = max(engine_speedups.items(), key=lambda item: item[1])
+    return engine if ratio > 1 + margin / 100 else PYTHON
+
+
+def module_tests(
+    input_path: Path, tests: list[str], prof_func_name: str = "benchmark"
+) -> dict[Path, list[str]]:
+    """
+    The ``tests`` (pytest node ids relative to the ``input_path``)
+    of each module, the ones of the test files which import it
+    (directly or not). The modules excluded from the discovery (the test
+    modules and the ``__init__.py`` files) and the ``*{prof_func_name}.py``
+    modules (which aren't compiled by the benchmark) don't get any test.
+    The import graph is built from the same walk as the discovery,
+    so the ``DEFAULT_EXCLUDED_DIRS`` aren't parsed.
+    """
+    input_path = Path(input_path).resolve()
+    handler = FileHandler(input_path)
+    graph = ImportGraph(
+        files={str(input_path): sorted(handler.collect_with_pattern("*.py"))}
+    )
+    is_excluded = GlobMatcher(handler.exclude_patterns).match
+    modules: dict[Path, list[str]] = {}
+    for test in tests:
+        test_file = (input_path / test.split("::")[0]).resolve()
+        for module in sorted(graph.dependencies(test_file)):
+            if not is_excluded(module) and not module.name.endswith(
+                f"{prof_func_name}.py"
+            ):
+                modules.setdefault(module, []).append(test)
+    return modules
+
+
+class EnginePlan:
+    """
+    EnginePlan keeps the engine of each module (``cython``, ``nuitka`` or
+    ``python`` to leave it as a ``.py`` file), with the speedups it was
+    chosen from and the source hash of the module when it was benchmarked.
+    It's written once by the ``auto`` engine and then applied by the later
+    compile runs without benchmarking again.
+    example usage::
+        plan = EnginePlan.for_input_path(Path("./my_module"))
+        if not plan.modules:
+            plan = plan_engines(Path("./my_module"))
+        for engine, files in plan.split(dir_files).items():
+            ...
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        modules: Optional[dict[str, dict[str, Any]]] = None,
+        margin: float = DEFAULT_MARGIN,
+    ):
+        """
+        :param path: the ``plan.json`` file path, if it exists
+                     the modules are loaded from it.
+        :param modules: the engine of each module, with its speedups.
+        :param margin: the minimum speedup (in percent) of the engines.
+        """
+        self.path = Path(path)
+        self.modules: dict[str, dict[str, Any]] = modules or {}
+        self.margin = margin
+        if modules is None and self.path.is_file():
+            try:
+                content = json.loads(self.path.read_text(encoding="utf-8"))
+                self.modules = content["modules"]
+                self.margin = content.get("margin", margin)
+            except (ValueError, KeyError):
+                logger.warning("Ignoring corrupted plan: `%s`", self.path)
+
+    @classmethod
+    def for_input_path(cls, input_path: Path) -> "EnginePlan":
+        """
+        The plan stored within the ``.pycompile`` directory
+        next to the ``input_path``.
+        """
+        input_path = Path(input_path).resolve()
+        root = input_path if input_path.is_dir() else input_path.parent
+        return cls(path=root / MANIFEST_DIR / PLAN_FILE)
+
+    def _key(self, file_path: Path) -> str:
+        """
+        The ``file_path`` relative to the directory of the ``.pycompile`` one.
+        """
+        return Path(
+            os.path.relpath(Path(file_path).resolve(), self.path.parent.parent)
+        ).as_posix()
+
+    def engine(self, file_path: Path) -> str:
+        """
+        The engine of the ``file_path`` module, ``python`` if it isn't
+        within the plan.
+        """
+        entry = self.modules.get(self._key(file_path))
+        if entry is None:
+            return PYTHON
+        if entry.get("source_hash") != file_hash(Path(file_path)):
+            logger.warning(
+                "Module: `%s` changed since it was benchmarked, "
+                "its engine: `%s` may not be the fastest anymore",
+                file_path,
+                entry["engine"],
+            )
+        return str(entry["engine"])
+
+    def record(
+        self,
+        file_path: Path,
+        engine_speedups: dict[str, float],
+        tests: list[str],
+    ) -> str:
+        """
+        Chooses the engine of the ``file_path`` module from the speedups
+        of its ``tests``.
+
+        :return: the chosen engine.
+        """
+        engine = choose_engine(engine_speedups, self.margin)
+        self.modules[self._key(file_path)] = {
+            "engine": engine,
+            "speedups": engine_speedups,
+            "tests": tests,
+            "source_hash": file_hash(Path(file_path)),
+        }
+        return engine
+
+    def split(
+        self, files: dict[str, list[Path]]
+    ) -> dict[str, dict[str, list[Path]]]:
+        """
+        Splits the files of each directory by their engine.
+        """
+        engine_files: dict[str, dict[str, list[Path]]] = {}
+        for directory, dir_files in files.items():
+            for file in dir_files:
+                engine_files.setdefault(self.engine(file), {}).setdefault(
+                    directory, []
+                ).append(file)
+        return engine_files
+
+    def save(self) -> None:
+        """
+        Writes the plan to the disk.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(
+            json.dumps(
+                {
+                    "created": time.time(),
+                    "margin": self.margin,
+                    "modules": self.modules,
+                },
+                indent=2,
+                sort_keys=True,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(temp_path, self.path)
+        logger.info("Engine plan is written to: `%s`", self.path)
+
+    def __str__(self) -> str:
+        return "\n".join(
+            f"{module}: {entry['engine']}"
+            for module, entry in sorted(self.modules.items())
+        )
+
+    def __repr__(self) -> str:
+        return f"EnginePlan(path={self.path})"
+
+
+def plan_engines(
+    input_path: Path,
+    margin: float = DEFAULT_MARGIN,
+    path: Optional[Path] = None,
+) -> EnginePlan:
+    """
+    Benchmarks the tests of the ``input_path`` using python, ``cython`` and
+    ``nuitka``, and chooses the engine of each module from the geometric mean
+    of the speedups of its tests. An engine which fails any of its tests
+    isn't chosen, and the modules without any test are left as ``.py`` files.
+
+    :param path: the plan file path, defaults to the ``.pycompile``
+                 directory of the ``input_path``.
+    """
+    input_path = Path(input_path).resolve()
+    compilers = {
+        "cython": CythonWrapper(cmd=CompilerCommands.cython_bench),
+        "nuitka": NuitkaWrapper(cmd=CompilerCommands.nuitka_bench),
+    }
+    benchmark = Benchmark(input_path=input_path)
+    benchmark.start(bench_type="cpu", compilers=list(compilers.values()))
+    results = [
+        result
+        for result in collect_results(benchmark.runs)
+        if result.outcome == "passed"
+    ]
+    engine_speedups = speedups(results, baseline=BASELINE)
+    plan = EnginePlan(
+        path=path or EnginePlan.for_input_path(input_path).path,
+        modules={},
+        margin=margin,
+    )
+    tests = [result.test for result in results if result.engine == BASELINE]
+    for module, module_test_ids in module_tests(input_path, tests).items():
+        ratios = {}
+        for engine, compiler in compilers.items():
+            test_ratios = engine_speedups.get(str(compiler), {})
+            if all(test in test_ratios for test in module_test_ids):
+                ratios[engine] = statistics.geometric_mean(
+                    test_ratios[test] for test in module_test_ids
+                )
+        plan.record(module, ratios, module_test_ids)
+    plan.save()
+    return plan
+
+
+def plan_from_options(
+    input_path: Path,
+    plan: Optional[str],
+    replan: bool,
+    margin: float,
+) -> EnginePlan:
+    """
+    Loads the ``EnginePlan`` of the ``auto`` engine, it's benchmarked
+    (and written) only if it doesn't exist yet or ``replan`` is set.
+
+    :param input_path: the compiled folder.
+    :param plan: the plan file path, defaults to the ``.pycompile``
+                 directory of the ``input_path``.
+    :param replan: benchmark the engines again.
+    :param margin: the minimum speedup (in percent) of the engines.
+    """
+    engine_plan = (
+        EnginePlan(path=Path(plan))
+        if plan
+        else EnginePlan.for_input_path(Path(input_path))
+    )
+    if engine_plan.modules and not replan:
+        logger.info("Using the engine plan: `%s`", engine_plan.path)
+        return engine_plan
+    return plan_engines(Path(input_path), margin=margin, path=engine_plan.path)
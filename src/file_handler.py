@@ -6,15 +6,155 @@ glob patterns ::
     * :   On Unix, will match everything except slashes.
           On Windows, it will avoid matching backslashes as well as slashes.
 """
+import fnmatch
 import logging
+import os
+import re
 from collections import defaultdict
-from pathlib import Path
-from typing import Generator, Optional
+from pathlib import Path, PurePath
+from typing import Callable, Generator, Iterable, Iterator, Optional
 
+from src.discovery_index import DiscoveryIndex
 from src.helpers import Colors
 
 logger = logging.getLogger(__name__)
 
+# Directories which are never walked, (virtual) environments,
+# caches, VCS and build directories.
+DEFAULT_EXCLUDED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".venv",
+        "venv",
+        "node_modules",
+        "__pycache__",
+        ".tox",
+        ".nox",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".pycompile",
+        "*.build",
+        "*.dist",
+        "*.egg-info",
+    }
+)
+# Joins the path parts, it can't be a part of any file name.
+_SEPARATOR = "\0"
+
+
+def _translate(pattern: str) -> Optional[str]:
+    """
+    The regex of a ``fnmatch`` pattern, without its anchors.
+    """
+    translated = re.fullmatch(
+        r"\(\?s:(?P<regex>.*)\)\\Z", fnmatch.translate(pattern), re.DOTALL
+    )
+    return translated["regex"] if translated else None
+
+
+def name_matcher(patterns: Iterable[str]) -> Callable[[str], bool]:
+    """
+    A single compiled regex of the ``fnmatch`` name ``patterns``.
+    """
+    patterns = list(patterns)
+    regexes = [_translate(pattern) for pattern in patterns]
+    if None in regexes:
+        return lambda name: any(
+            fnmatch.fnmatchcase(name, pattern) for pattern in patterns
+        )
+    regex = re.compile("|".join(f"(?:{regex})" for regex in regexes), re.DOTALL)
+    return lambda name: regex.fullmatch(name) is not None
+
+
+class GlobMatcher:
+    """
+    GlobMatcher matches paths against many glob patterns at once,
+    with the ``Path.match`` semantics (matching from the right).
+
+    The relative patterns with the same number of parts are compiled
+    into a single regex, matching the last parts of a path joined
+    by a separator which can't be a part of any name.
+    example usage::
+        matcher = GlobMatcher(["**/test**", "**/__init__.py"])
+        matcher.match(Path("my_module/test_utils.py"))
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        :param patterns: the glob patterns.
+        """
+        by_length: dict[int, list[str]] = defaultdict(list)
+        self._fallback: list[str] = []
+        for pattern in patterns:
+            parts = PurePath(pattern).parts
+            if not parts:
+                raise ValueError("empty pattern")
+            regexes = [_translate(part) for part in parts]
+            if PurePath(pattern).anchor or None in regexes:
+                self._fallback.append(pattern)
+            else:
+                by_length[len(parts)].append(
+                    _SEPARATOR.join(regexes)  # type: ignore[arg-type]
+                )
+        self._regexes = [
+            (
+                length,
+                re.compile(
+                    "|".join(f"(?:{regex})" for regex in regexes), re.DOTALL
+                ),
+            )
+            for length, regexes in sorted(by_length.items())
+        ]
+
+    def match_parts(self, parts: tuple[str, ...]) -> bool:
+        """
+        Checks if the path ``parts`` match any of the patterns.
+        """
+        for length, regex in self._regexes:
+            if len(parts) >= length and regex.fullmatch(
+                _SEPARATOR.join(parts[-length:])
+            ):
+                return True
+        return bool(self._fallback) and any(
+            PurePath(*parts).match(pattern) for pattern in self._fallback
+        )
+
+    def for_directory(self, parts: tuple[str, ...]) -> Callable[[str], bool]:
+        """
+        Matches the file names within the directory of the ``parts``,
+        joining the last parts of the directory only once.
+        """
+        prefixes = [
+            (
+                "".join(
+                    f"{part}{_SEPARATOR}"
+                    for part in parts[len(parts) - length + 1 :]
+                ),
+                regex,
+            )
+            for length, regex in self._regexes
+            if len(parts) + 1 >= length
+        ]
+
+        def match(name: str) -> bool:
+            for prefix, regex in prefixes:
+                if regex.fullmatch(prefix + name):
+                    return True
+            return bool(self._fallback) and any(
+                PurePath(*parts, name).match(pattern)
+                for pattern in self._fallback
+            )
+
+        return match
+
+    def match(self, path: PurePath | str) -> bool:
+        """
+        Checks if the ``path`` matches any of the patterns.
+        """
+        return self.match_parts(PurePath(path).parts)
+
 
 class FileHandler:
     """
@@ -28,15 +168,22 @@ class FileHandler:
         self,
         input_path: Path,
         additional_exclude_patterns: Optional[list[str]] = None,
+        excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+        index: Optional[DiscoveryIndex] = None,
     ):
         """
         By default, all the ``test`` files and any ``__init__`` files are excluded.
 
         :param input_path: Should be a valid file/directory path.
         :param additional_exclude_patterns: Any optional additional glob patterns.
+        :param excluded_dirs: name patterns of the directories not to be walked.
+        :param index: when it's given, only the directories which changed
+                      since the last walk are rescanned.
         """
         self.input_path = input_path
         self.exclude_patterns = additional_exclude_patterns or []
+        self.excluded_dirs = frozenset(excluded_dirs)
+        self.index = index
 
     @property
     def input_path(self) -> Path:
@@ -79,52 +226,114 @@ class FileHandler:
         :return: a dictionary for valid files within each directory.
         """
 
-        files = defaultdict(list[Path])  # type: ignore[var-annotated]
-        excluded_files = list(self._filter_files())
-        logger.debug(
-            "%sExcluded files: %s%s",
-            Colors.CYAN,
-            Colors.RESET,
-            [
-                excluded_file.name
-                for excluded_file in excluded_files
-                if excluded_file
-            ],
-        )
-
-        for file in self._collect_files():
-            if file not in excluded_files:
-                files[str(file.resolve().parent)].append(file.resolve())
-
+        files: dict[str, list[Path]] = defaultdict(list)
+        for directory, dir_files in self.stream():
+            files[directory].extend(dir_files)
         return files
 
-    def _filter_files(self) -> Generator[Optional[Path], None, None]:
+    def stream(self) -> Iterator[tuple[str, list[Path]]]:
         """
-        Collects all files to be excluded for the given `input path`
-        using the `exclude_patterns` glob patterns.
+        Like ``start``, but yields the valid files of each directory
+        as soon as it's walked.
+
+        :return: a generator of each directory with its valid files.
         """
-        if not self.input_path.is_dir():
-            yield None
-        yield from (
-            file
-            for file in self._collect_files()
-            for exclude_pattern in self.exclude_patterns
-            if file.match(exclude_pattern)
-        )
+        matcher = GlobMatcher(self.exclude_patterns)
+        for directory, names, links in self._walk():
+            # One `resolve` per directory, and per symlinked file,
+            # which is grouped within the directory of its target.
+            is_excluded = matcher.for_directory(Path(directory).parts)
+            resolved = Path(directory).resolve()
+            dir_files: dict[Path, list[Path]] = {resolved: []}
+            for name in names:
+                if is_excluded(name):
+                    logger.debug(
+                        "%sExcluded file: %s%s", Colors.CYAN, Colors.RESET, name
+                    )
+                elif links and name in links:
+                    target = (resolved / name).resolve()
+                    dir_files.setdefault(target.parent, []).append(target)
+                else:
+                    dir_files[resolved].append(resolved / name)
+            for parent, files in dir_files.items():
+                if files:
+                    yield str(parent), files
+        if self.index is not None:
+            self.index.save()
 
-    def _collect_files(self) -> Generator[Path, None, None]:
+    def split_packages(
+        self, files: dict[str, list[Path]], include_root: bool = True
+    ) -> tuple[dict[str, list[Path]], dict[str, list[Path]]]:
         """
-        Collects all python files for the given `input path`.
+        Splits the ``files`` into the top level packages (directories with
+        an ``__init__.py``) within the ``input_path``
+        and the modules outside any package.
+
+        :param files: valid files within each directory.
+        :param include_root: the ``input_path`` itself can be a package.
+        :return: the package directories within each parent directory,
+                 and the remaining files within each directory.
         """
-        if not self.input_path.is_dir():
-            yield self.input_path
+        root = self.input_path.resolve()
+        if not root.is_dir():
+            root = root.parent
+        packages: dict[str, list[Path]] = defaultdict(list)
+        modules: dict[str, list[Path]] = defaultdict(list)
+        for directory, dir_files in files.items():
+            package = None
+            current = Path(directory)
+            while (
+                current.is_relative_to(root)
+                and (include_root or current != root)
+                and (current / "__init__.py").is_file()
+            ):
+                package = current
+                current = current.parent
+            if package is None:
+                modules[directory].extend(dir_files)
+            elif package not in packages[str(package.parent)]:
+                packages[str(package.parent)].append(package)
+        return dict(packages), dict(modules)
 
-        else:
-            for sub_dir in self.input_path.iterdir():
-                if sub_dir.is_dir():
-                    yield from sub_dir.rglob(pattern="**/*.py")
+    def _walk(self) -> Iterator[tuple[str, list[str], list[str]]]:
+        """
+        Walks the ``input_path`` once using ``os.scandir`` (or the ``index``),
+        without descending into the ``excluded_dirs``
+        or following any directory symlinks.
 
-            yield from self.input_path.glob(pattern="*.py")
+        :return: each directory with the names of its ``.py`` files,
+                 and of the ones which are symlinks.
+        """
+        if not self.input_path.is_dir():
+            name = self.input_path.name
+            yield str(self.input_path.parent), [name], (
+                [name] if self.input_path.is_symlink() else []
+            )
+            return
+        is_excluded_dir = name_matcher(self.excluded_dirs)
+        if self.index is not None:
+            yield from self.index.walk(str(self.input_path), is_excluded_dir)
+            return
+        stack = [str(self.input_path)]
+        while stack:
+            directory = stack.pop()
+            names, links, sub_dirs = [], [], []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not is_excluded_dir(entry.name):
+                                sub_dirs.append(entry.path)
+                        elif entry.name.endswith(".py") and entry.is_file():
+                            names.append(entry.name)
+                            if entry.is_symlink():
+                                links.append(entry.name)
+            except OSError as error:
+                logger.debug("Skipping: `%s`, %s", directory, error)
+                continue
+            if names:
+                yield directory, sorted(names), links
+            stack.extend(sorted(sub_dirs, reverse=True))
 
     def collect_with_pattern(self, pattern: str) -> Generator[Path, None, None]:
         """
@@ -138,9 +347,12 @@ class FileHandler:
         if not self.input_path.is_dir():
             yield self.input_path
         else:
-            yield from (
-                file for file in self._collect_files() if file.match(pattern)
-            )
+            matcher = GlobMatcher([pattern])
+            for directory, names, _ in self._walk():
+                matches = matcher.for_directory(Path(directory).parts)
+                yield from (
+                    Path(directory, name) for name in names if matches(name)
+                )
 
     def __str__(self) -> str:
         return (
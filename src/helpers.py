@@ -12,8 +12,6 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Generator, Iterable
 
-import pytest
-
 
 @dataclass(frozen=True)
 class Colors:
@@ -47,16 +45,6 @@ def change_dir(file_path: Path) -> Generator[None, None, None]:
         os.chdir(current_path)
 
 
-@contextmanager
-def copy_files(from_dir: Path) -> Generator[Path, None, None]:
-    """
-    Copies all files at a temp directory.
-    """
-    with tempfile.TemporaryDirectory() as temp_dir:
-        shutil.copytree(from_dir, temp_dir, dirs_exist_ok=True)
-        yield Path(temp_dir)
-
-
 def decorate_functions(
     dec_import: str,
     dec_name: str,
@@ -67,6 +55,9 @@ def decorate_functions(
     For each file:
     add the `decorator import` at the top level of the file and
     decorate all the functions with the `decorate name`
+
+    Each file is replaced atomically (never written in place),
+    so a hardlinked file doesn't change its original.
     """
     for file in files:
         with open(
@@ -83,33 +74,24 @@ def decorate_functions(
                         0, ast.Name(id=dec_name, ctx=ast.Load())
                     )
 
-        with open(
-            file, "w", encoding="utf-8"
-        ) as f:  # pylint: disable=invalid-name
-            f.write(ast.unparse(modified_tree))
-            f.write("\n\n")
-            f.write(ast.unparse(tree))
-
-
-def run_pytest(directory: Path) -> None:
-    """
-    Invoke `pytest` at the `directory`.
-    """
-    pytest.main(
-        [
-            "-vv",
-            "--capture=sys",
-            "--durations=10",
-            "-s",
-            str(directory),
-        ]
-    )
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=Path(file).parent, delete=False
+        ) as temp_file:
+            temp_file.write(ast.unparse(modified_tree))
+            temp_file.write("\n\n")
+            temp_file.write(ast.unparse(tree))
+        shutil.copymode(file, temp_file.name)
+        os.replace(temp_file.name, file)
 
 
 def run_sub_process(files: list[Path], compile_cmd: str) -> None:
     """
     For each file path run in a subprocess the corresponding compiler command.
+    Each command runs within the file's parent directory, so the compiled
+    files are placed next to the source files without changing the
+    current active directory of the process (safe to call from threads).
     """
     for file in files:
-        cmd_str = compile_cmd.format(file.absolute())
-        subprocess.run(cmd_str, shell=True, check=False)
+        file_path = Path(file).absolute()
+        cmd_str = compile_cmd.format(file_path)
+        subprocess.run(cmd_str, shell=True, check=False, cwd=file_path.parent)
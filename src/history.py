@@ -0,0 +1,277 @@
+"""
+Benchmark history, a local SQLite database of the benchmark runs.
+"""
+import hashlib
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.helpers import Colors
+from src.manifest import MANIFEST_DIR
+from src.results import BenchResult
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = "history.sqlite"
+# The number of previous runs the rolling baseline is computed from.
+BASELINE_WINDOW = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    host TEXT NOT NULL,
+    git_commit TEXT,
+    versions TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    engine TEXT NOT NULL,
+    test TEXT NOT NULL,
+    outcome TEXT,
+    min REAL,
+    max REAL,
+    mean REAL,
+    median REAL,
+    stddev REAL,
+    rounds INTEGER,
+    peak_rss_mib REAL
+);
+CREATE INDEX IF NOT EXISTS results_engine_test ON results (engine, test);
+"""
+RESULT_COLUMNS = (
+    "engine",
+    "test",
+    "outcome",
+    "min",
+    "max",
+    "mean",
+    "median",
+    "stddev",
+    "rounds",
+    "peak_rss_mib",
+)
+
+
+def host_fingerprint() -> str:
+    """
+    Identifies the host, runs are only compared to the runs of the same host.
+    """
+    cpu_model = platform.processor()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    cpu_model = line.partition(":")[2].strip()
+                    break
+    except OSError:
+        pass
+    host = [
+        platform.node(),
+        platform.system(),
+        platform.machine(),
+        cpu_model,
+        os.cpu_count(),
+    ]
+    return hashlib.sha256(json.dumps(host).encode()).hexdigest()[:16]
+
+
+def git_commit(path: Path) -> Optional[str]:
+    """
+    The current ``git`` commit of the ``path``, if it's within a repository.
+    """
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            check=True,
+            cwd=path,
+            capture_output=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return process.stdout.strip()
+
+
+@dataclass
+class Regression:
+    """
+    A test which got slower than its rolling baseline.
+    """
+
+    engine: str
+    test: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        """
+        The slowdown in percent.
+        """
+        return (self.current / self.baseline - 1) * 100
+
+    def __str__(self) -> str:
+        return (
+            f"`{self.engine}` {self.test}: {self.baseline:.6f}s -> "
+            f"{self.current:.6f}s (+{self.change:.1f}%)"
+        )
+
+
+class History:
+    """
+    History appends the results of each benchmark run to a SQLite database,
+    with the engine versions, the ``git`` commit and the host fingerprint.
+
+    A run is compared to its rolling baseline, the median of the mean
+    time of each test and engine within the last ``BASELINE_WINDOW``
+    runs of the same host.
+    example usage::
+        history = History(Path(".pycompile/history.sqlite"))
+        regressions = history.regressions(results, threshold=10)
+        history.append(results, versions={"Cython": "3.0.10"})
+    """
+
+    def __init__(self, path: Path, host: Optional[str] = None):
+        """
+        :param path: the database file path, it will be created if needed.
+        :param host: the host fingerprint, defaults to ``host_fingerprint``.
+        """
+        self.path = Path(path)
+        self.host = host or host_fingerprint()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path)) as connection:
+            with connection:
+                connection.executescript(SCHEMA)
+
+    def append(
+        self,
+        results: list[BenchResult],
+        versions: dict[str, str],
+        commit: Optional[str] = None,
+    ) -> int:
+        """
+        Appends the ``results`` of a run.
+
+        :param versions: the version of each engine.
+        :param commit: the ``git`` commit of the benchmarked code.
+        :return: the id of the run.
+        """
+        with closing(sqlite3.connect(self.path)) as connection:
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO runs (created, host, git_commit, versions) "
+                    "VALUES (?, ?, ?, ?)",
+                    (time.time(), self.host, commit, json.dumps(versions)),
+                )
+                run_id = cursor.lastrowid
+                connection.executemany(
+                    f"INSERT INTO results (run_id, {', '.join(RESULT_COLUMNS)}) "
+                    f"VALUES (?{', ?' * len(RESULT_COLUMNS)})",
+                    [
+                        (
+                            run_id,
+                            *(getattr(result, name) for name in RESULT_COLUMNS),
+                        )
+                        for result in results
+                    ],
+                )
+        logger.info("Benchmark run #%s is stored at: `%s`", run_id, self.path)
+        return int(run_id or 0)
+
+    def baseline(self, engine: str, test: str) -> Optional[float]:
+        """
+        The rolling baseline of the ``test`` using the ``engine``,
+        ``None`` if there isn't any previous (passed) run.
+        """
+        with closing(sqlite3.connect(self.path)) as connection:
+            rows = connection.execute(
+                "SELECT results.mean FROM results "
+                "JOIN runs ON runs.id = results.run_id "
+                "WHERE runs.host = ? AND results.engine = ? "
+                "AND results.test = ? AND results.outcome = 'passed' "
+                "AND results.mean IS NOT NULL "
+                "ORDER BY runs.id DESC LIMIT ?",
+                (self.host, engine, test, BASELINE_WINDOW),
+            ).fetchall()
+        means: list[float] = [row[0] for row in rows]
+        return statistics.median(means) if means else None
+
+    def regressions(
+        self, results: list[BenchResult], threshold: float
+    ) -> list[Regression]:
+        """
+        The ``results`` which are slower than their rolling baseline
+        by more than ``threshold`` percent.
+        """
+        regressions = []
+        for result in results:
+            if result.mean is None or result.outcome != "passed":
+                continue
+            baseline = self.baseline(result.engine, result.test)
+            if baseline and result.mean > baseline * (1 + threshold / 100):
+                regressions.append(
+                    Regression(
+                        engine=result.engine,
+                        test=result.test,
+                        baseline=baseline,
+                        current=result.mean,
+                    )
+                )
+        return regressions
+
+    def record(
+        self,
+        results: list[BenchResult],
+        versions: dict[str, str],
+        input_path: Path,
+        threshold: Optional[float] = None,
+    ) -> list[Regression]:
+        """
+        Compares the ``results`` to their rolling baseline (if there is
+        a ``threshold``) and then appends them to the history.
+
+        :return: the regressions, which are reported as well.
+        """
+        regressions = (
+            self.regressions(results, threshold)
+            if threshold is not None
+            else []
+        )
+        self.append(results, versions=versions, commit=git_commit(input_path))
+        for regression in regressions:
+            print(f"{Colors.FAIL} Regression: {regression} {Colors.RESET}")
+        return regressions
+
+    def __repr__(self) -> str:
+        return f"History(path={self.path}, host={self.host})"
+
+
+def history_from_options(
+    history: Optional[str],
+    input_path: Path,
+    fail_on_regression: Optional[float],
+) -> Optional[History]:
+    """
+    Creates the ``History`` from the cli options, it's stored within the
+    ``.pycompile`` directory of the ``input_path`` if only the
+    ``fail_on_regression`` threshold is set.
+
+    :param history: the database file path.
+    :param input_path: the benchmarked folder.
+    :param fail_on_regression: the slowdown threshold in percent.
+    """
+    if history:
+        return History(path=Path(history))
+    if fail_on_regression is not None:
+        return History(path=Path(input_path) / MANIFEST_DIR / HISTORY_FILE)
+    return None
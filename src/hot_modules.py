@@ -0,0 +1,262 @@
+"""
+Hot modules, the modules which take most of the CPU time of a profiled run.
+"""
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.helpers import Colors
+from src.isolated import MAIN_BOOTSTRAP, isolated_cmd
+from src.manifest import MANIFEST_DIR, file_hash
+from src.results import render_table
+
+logger = logging.getLogger(__name__)
+
+PROFILER_PATH = Path(__file__).parent / "isolated" / "profiler.py"
+# The self time of the lines of the profiled modules, kept for `--annotate`.
+PROFILE_FILE = "profile.json"
+# The share (in percent) of the CPU time the compiled modules have to cover.
+DEFAULT_SHARE = 90.0
+# The seconds between the samples of the profiler.
+PROFILE_INTERVAL = 0.005
+
+
+@dataclass
+class HotModule:
+    """
+    The CPU (self) time of a module within the profiled run, its share of
+    the time of all the modules to be compiled, the cumulative share of the
+    modules ranked up to it and whether it's compiled.
+    """
+
+    path: Path
+    seconds: float
+    share: float
+    cumulative: float
+    hot: bool
+
+
+def profile_run(
+    input_path: Path,
+    entrypoint: Optional[Path] = None,
+    interval: float = PROFILE_INTERVAL,
+) -> dict[Path, float]:
+    """
+    Runs the tests of the ``input_path`` (or the ``entrypoint`` script)
+    within a fresh interpreter, under a sampling profiler.
+    The self time of the lines of the modules within the ``input_path`` is
+    saved to its ``.pycompile`` directory.
+
+    :return: the CPU (self) time of each file in seconds.
+    """
+    input_path = Path(input_path).resolve()
+    root = input_path if input_path.is_dir() else input_path.parent
+    with tempfile.TemporaryDirectory() as report_dir:
+        report = Path(report_dir) / "profile.json"
+        cmd = isolated_cmd(
+            MAIN_BOOTSTRAP,
+            PROFILER_PATH,
+            f"--report={report}",
+            f"--interval={interval}",
+        )
+        if entrypoint is not None:
+            cmd += [f"--entrypoint={Path(entrypoint).resolve()}"]
+        else:
+            cmd += ["--", "-q", "-p", "no:cacheprovider", str(root)]
+        logger.info(
+            "%s Profiling: `%s` %s",
+            Colors.CYAN,
+            entrypoint or root,
+            Colors.RESET,
+        )
+        process = subprocess.run(cmd, cwd=root, check=False)
+        if process.returncode:
+            logger.warning(
+                "%sProfiled run of: `%s` exited with: %s%s",
+                Colors.WARNING,
+                entrypoint or root,
+                process.returncode,
+                Colors.RESET,
+            )
+        if not report.is_file():
+            return {}
+        content = json.loads(report.read_text(encoding="utf-8"))
+    save_line_profile(root, content.get("lines", {}))
+    return {Path(file): seconds for file, seconds in content["seconds"].items()}
+
+
+def save_line_profile(root: Path, lines: dict[str, dict[str, float]]) -> None:
+    """
+    Writes the self time of the ``lines`` of the modules within the ``root``
+    to its ``.pycompile`` directory, with the source hash of each module.
+    """
+    modules = {
+        Path(os.path.relpath(file, root)).as_posix(): {
+            "source_hash": file_hash(Path(file)),
+            "lines": file_lines,
+        }
+        for file, file_lines in lines.items()
+        if Path(file).is_file() and Path(file).is_relative_to(root)
+    }
+    path = root / MANIFEST_DIR / PROFILE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_text(
+        json.dumps({"modules": modules}, indent=2, sort_keys=True),
+        encoding="utf-8",
+    )
+    os.replace(temp_path, path)
+
+
+def load_line_profile(input_path: Path) -> dict[Path, dict[int, float]]:
+    """
+    The self time of the lines of each profiled module of the ``input_path``,
+    from its last ``--hot-only`` run. The modules which changed since
+    then are skipped, their lines may have moved.
+    """
+    input_path = Path(input_path).resolve()
+    root = input_path if input_path.is_dir() else input_path.parent
+    path = root / MANIFEST_DIR / PROFILE_FILE
+    if not path.is_file():
+        return {}
+    try:
+        modules = json.loads(path.read_text(encoding="utf-8"))["modules"]
+    except (ValueError, KeyError):
+        logger.warning("Ignoring corrupted profile: `%s`", path)
+        return {}
+    profile = {}
+    for module, entry in modules.items():
+        file = root / module
+        if not file.is_file() or entry["source_hash"] != file_hash(file):
+            logger.info("Module: `%s` changed since it was profiled", module)
+            continue
+        profile[file] = {
+            int(line): seconds for line, seconds in entry["lines"].items()
+        }
+    return profile
+
+
+def rank_modules(
+    seconds: dict[Path, float], files: dict[str, list[Path]], share: float
+) -> list[HotModule]:
+    """
+    Ranks the ``files`` to be compiled by their CPU (self) time, the top ones
+    which cover ``share`` percent of their total time are ``hot``.
+    The modules which weren't sampled at all are never hot.
+    """
+    modules = {
+        Path(file).resolve(): seconds.get(Path(file).resolve(), 0.0)
+        for dir_files in files.values()
+        for file in dir_files
+    }
+    total = sum(modules.values())
+    ranking = []
+    cumulative = 0.0
+    for path, module_seconds in sorted(
+        modules.items(), key=lambda item: item[1], reverse=True
+    ):
+        hot = module_seconds > 0 and cumulative < share
+        module_share = module_seconds / total * 100 if total else 0.0
+        cumulative += module_share
+        ranking.append(
+            HotModule(
+                path=path,
+                seconds=module_seconds,
+                share=module_share,
+                cumulative=cumulative,
+                hot=hot,
+            )
+        )
+    return ranking
+
+
+def hot_files(
+    files: dict[str, list[Path]], ranking: list[HotModule]
+) -> dict[str, list[Path]]:
+    """
+    The hot ``files`` of each directory.
+    """
+    hot = {module.path for module in ranking if module.hot}
+    hot_dir_files = {
+        directory: [file for file in dir_files if Path(file).resolve() in hot]
+        for directory, dir_files in files.items()
+    }
+    return {
+        directory: dir_files
+        for directory, dir_files in hot_dir_files.items()
+        if dir_files
+    }
+
+
+def ranking_table(
+    ranking: list[HotModule], total_seconds: float, root: Path
+) -> str:
+    """
+    Renders the ``ranking`` in a human-readable table, with the expected
+    coverage of the hot modules, of the modules to be compiled and of the
+    whole run (``total_seconds``).
+    """
+    rows = [["", "CPU (s)", "share", "cumulative", "compile"]]
+    for module in ranking:
+        try:
+            name = module.path.relative_to(root).as_posix()
+        except ValueError:
+            name = module.path.as_posix()
+        rows.append(
+            [
+                name,
+                f"{module.seconds:.3f}",
+                f"{module.share:.1f}%",
+                f"{module.cumulative:.1f}%",
+                "yes" if module.hot else "-",
+            ]
+        )
+    hot = [module for module in ranking if module.hot]
+    hot_seconds = sum(module.seconds for module in hot)
+    coverage = sum(module.share for module in hot)
+    run_coverage = hot_seconds / total_seconds * 100 if total_seconds else 0.0
+    return (
+        render_table("Hot modules", rows)
+        + f"\nCompiling #{len(hot)}/{len(ranking)} modules, covering "
+        f"{coverage:.1f}% of the CPU time of the modules "
+        f"({run_coverage:.1f}% of the profiled run)"
+    )
+
+
+def hot_files_from_options(
+    input_path: Path,
+    files: dict[str, list[Path]],
+    hot_only: bool,
+    hot_share: float,
+    entrypoint: Optional[str] = None,
+) -> dict[str, list[Path]]:
+    """
+    Profiles the run and keeps only the hot ``files``
+    (printing their ranking), if ``hot_only`` is set.
+
+    :param input_path: the compiled folder.
+    :param files: the files to be compiled within each directory.
+    :param hot_only: compile only the hot modules.
+    :param hot_share: the share (in percent) of the CPU time
+                      the hot modules have to cover.
+    :param entrypoint: the script to be profiled instead of the tests.
+    """
+    if not hot_only:
+        return files
+    seconds = profile_run(
+        Path(input_path), entrypoint=Path(entrypoint) if entrypoint else None
+    )
+    ranking = rank_modules(seconds, files, share=hot_share)
+    root = Path(input_path).resolve()
+    table = ranking_table(
+        ranking,
+        total_seconds=sum(seconds.values()),
+        root=root if root.is_dir() else root.parent,
+    )
+    print(f"{Colors.CYAN}{table}{Colors.RESET}")
+    return hot_files(files, ranking)
@@ -0,0 +1,339 @@
+"""
+Import graph of the modules to be compiled.
+"""
+import ast
+import hashlib
+import logging
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from src.manifest import file_hash
+
+logger = logging.getLogger(__name__)
+
+# `cimport` statements of the `.pxd`/`.pyx` files, which aren't valid python.
+CIMPORT_PATTERN = re.compile(
+    r"^[ \t]*(?:from[ \t]+(?P<module>\.*[\w.]*)[ \t]+cimport[ \t]+(?P<names>[^#\n]+)"
+    r"|cimport[ \t]+(?P<modules>[^#\n]+))",
+    re.MULTILINE,
+)
+
+
+def module_name(file_path: Path) -> str:
+    """
+    The dotted module name of the ``file_path``,
+    including all of its parent packages.
+    """
+    parts = [file_path.stem]
+    directory = file_path.parent
+    while (directory / "__init__.py").is_file() and directory.name:
+        parts.insert(0, directory.name)
+        directory = directory.parent
+    return ".".join(parts)
+
+
+def _absolute(name: str, level: int, current: str) -> str:
+    """
+    Resolves a relative import of the ``current`` module.
+    """
+    if not level:
+        return name
+    base = current.split(".")[:-level]
+    return ".".join([*base, name] if name else base)
+
+
+def _imported_names(file_path: Path, current: str) -> Iterator[str]:
+    """
+    All the module names (and the names imported from them)
+    of the ``file_path`` imports.
+    """
+    try:
+        tree = ast.parse(file_path.read_bytes(), filename=str(file_path))
+    except (SyntaxError, ValueError) as error:
+        logger.debug("Skipping the imports of: `%s`, %s", file_path, error)
+        return
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            yield from (alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = _absolute(node.module or "", node.level, current)
+            yield base
+            yield from (f"{base}.{alias.name}" for alias in node.names)
+
+
+def _cimported_names(pxd_path: Path, current: str) -> Iterator[str]:
+    """
+    All the module names of the ``pxd_path`` ``cimport`` statements.
+    """
+    for match in CIMPORT_PATTERN.finditer(pxd_path.read_text(errors="replace")):
+        if match["module"] is not None:
+            module = match["module"]
+            level = len(module) - len(module.lstrip("."))
+            base = _absolute(module.lstrip("."), level, current)
+            yield base
+            for name in match["names"].strip("() \t").split(","):
+                if name.strip():
+                    yield f"{base}.{name.split()[0]}"
+        else:
+            for name in match["modules"].split(","):
+                if name.strip():
+                    yield name.split()[0]
+
+
+class ImportGraph:
+    """
+    ImportGraph is the module DAG of the files to be compiled, built from their
+    ``import`` statements and the ``cimport`` statements of their ``.pxd`` files.
+
+    It's used to invalidate the dependents of a changed module and to schedule
+    the modules on the longest (critical) path of the graph first.
+    example usage::
+        graph = ImportGraph(files=dir_files)
+        graph.dependents(Path("my_module/utils.py"))
+        sorted(files, key=graph.critical_path, reverse=True)
+    """
+
+    def __init__(self, files: dict[str, list[Path]]):
+        """
+        :param files: valid files within each directory,
+                      package directories are skipped.
+        """
+        modules = [
+            Path(file).resolve()
+            for dir_files in files.values()
+            for file in dir_files
+            if Path(file).suffix == ".py" and Path(file).is_file()
+        ]
+        self.names = {file: module_name(file) for file in modules}
+        self._index: dict[str, list[Path]] = defaultdict(list)
+        for file, name in self.names.items():
+            self._index[name].append(file)
+        self.imports: dict[Path, set[Path]] = {file: set() for file in modules}
+        self.imported_by: dict[Path, set[Path]] = {
+            file: set() for file in modules
+        }
+        self._hashes: dict[Path, str] = {}
+        self._critical_paths: dict[Path, int] = {}
+        for file in modules:
+            for dependency in self._dependencies(file):
+                self.imports[file].add(dependency)
+                self.imported_by[dependency].add(file)
+
+    @staticmethod
+    def pxd(file_path: Path) -> Path:
+        """
+        The augmenting ``.pxd`` file of the ``file_path`` module.
+        """
+        return file_path.with_suffix(".pxd")
+
+    def _resolve(self, name: str, importer: Path) -> Iterator[Path]:
+        """
+        Finds the module of an imported ``name``, which can be
+        a module or any name within it.
+        """
+        parts = name.split(".")
+        while parts:
+            candidates = self._index.get(".".join(parts))
+            if candidates:
+                # Prefer a module next to the importer for the same names.
+                yield next(
+                    (
+                        file
+                        for file in candidates
+                        if file.parent == importer.parent
+                    ),
+                    candidates[0],
+                )
+                return
+            parts.pop()
+
+    def _dependencies(self, file_path: Path) -> set[Path]:
+        current = self.names[file_path]
+        names = set(_imported_names(file_path, current))
+        if self.pxd(file_path).is_file():
+            names.update(_cimported_names(self.pxd(file_path), current))
+        return {
+            dependency
+            for name in names
+            for dependency in self._resolve(name, importer=file_path)
+            if dependency != file_path
+        }
+
+    def update(self, changed: Iterable[Path]) -> None:
+        """
+        Reparses the imports of the ``changed`` modules (their ``.pxd`` files
+        included), the set of modules has to be the same one, otherwise
+        a new graph has to be built.
+        """
+        for file in changed:
+            file = Path(file).resolve()
+            if file not in self.imports:
+                continue
+            for dependency in self.imports[file]:
+                self.imported_by[dependency].discard(file)
+            self.imports[file] = self._dependencies(file)
+            for dependency in self.imports[file]:
+                self.imported_by[dependency].add(file)
+            self._hashes.pop(file, None)
+            self._hashes.pop(self.pxd(file), None)
+        self._critical_paths = {}
+
+    def _closure(
+        self, file_path: Path, edges: dict[Path, set[Path]]
+    ) -> set[Path]:
+        closure: set[Path] = set()
+        stack = list(edges.get(Path(file_path).resolve(), ()))
+        while stack:
+            file = stack.pop()
+            if file not in closure:
+                closure.add(file)
+                stack.extend(edges[file])
+        closure.discard(Path(file_path).resolve())
+        return closure
+
+    def dependencies(self, file_path: Path) -> set[Path]:
+        """
+        All the modules which ``file_path`` imports, directly or not.
+        """
+        return self._closure(file_path, self.imports)
+
+    def dependents(self, file_path: Path) -> set[Path]:
+        """
+        All the modules which import ``file_path``, directly or not,
+        they have to be rebuilt once it changes.
+        """
+        return self._closure(file_path, self.imported_by)
+
+    def affected(self, changed: Iterable[Path]) -> set[Path]:
+        """
+        The ``changed`` modules and all of their dependents.
+        """
+        affected: set[Path] = set()
+        for file in changed:
+            affected.add(Path(file).resolve())
+            affected.update(self.dependents(file))
+        return affected
+
+    def dependencies_hash(self, file_path: Path) -> str:
+        """
+        The hash of the ``.pxd`` file of ``file_path`` and the sources
+        of all its dependencies (and their ``.pxd`` files), it changes
+        whenever any module that ``file_path`` depends on changes.
+        """
+        file_path = Path(file_path).resolve()
+        if file_path not in self.imports:
+            return ""
+        dependencies = self.dependencies(file_path)
+        pxd_files = [
+            self.pxd(file)
+            for file in sorted({file_path, *dependencies})
+            if self.pxd(file).is_file()
+        ]
+        if not dependencies and not pxd_files:
+            return ""
+        digest = hashlib.sha256()
+        for file in sorted(dependencies):
+            digest.update(self.names[file].encode())
+            digest.update(self._source_hash(file).encode())
+        for pxd_file in pxd_files:
+            digest.update(self._source_hash(pxd_file).encode())
+        return digest.hexdigest()
+
+    def _source_hash(self, file_path: Path) -> str:
+        if file_path not in self._hashes:
+            self._hashes[file_path] = file_hash(file_path)
+        return self._hashes[file_path]
+
+    def _components(self) -> list[frozenset[Path]]:
+        """
+        The strongly connected components (import cycles) of the graph,
+        using an iterative Tarjan's algorithm, each component comes after
+        the components of its dependencies.
+        """
+        components: list[frozenset[Path]] = []
+        indexes: dict[Path, int] = {}
+        low_links: dict[Path, int] = {}
+        stack: list[Path] = []
+        on_stack: set[Path] = set()
+        for root in self.imports:
+            if root in indexes:
+                continue
+            indexes[root] = low_links[root] = len(indexes)
+            stack.append(root)
+            on_stack.add(root)
+            visits = [(root, iter(self.imports[root]))]
+            while visits:
+                file, dependencies = visits[-1]
+                for dependency in dependencies:
+                    if dependency not in indexes:
+                        indexes[dependency] = low_links[dependency] = len(
+                            indexes
+                        )
+                        stack.append(dependency)
+                        on_stack.add(dependency)
+                        visits.append(
+                            (dependency, iter(self.imports[dependency]))
+                        )
+                        break
+                    if dependency in on_stack:
+                        low_links[file] = min(
+                            low_links[file], indexes[dependency]
+                        )
+                else:
+                    visits.pop()
+                    if visits:
+                        importer = visits[-1][0]
+                        low_links[importer] = min(
+                            low_links[importer], low_links[file]
+                        )
+                    if low_links[file] == indexes[file]:
+                        component: list[Path] = []
+                        while not component or component[-1] != file:
+                            component.append(stack.pop())
+                            on_stack.discard(component[-1])
+                        components.append(frozenset(component))
+        return components
+
+    def critical_path(self, file_path: Path) -> int:
+        """
+        The length (in source bytes, a proxy of the compile time)
+        of the longest path from ``file_path`` through its dependents,
+        the modules of an import cycle share the same path.
+        """
+        file_path = Path(file_path).resolve()
+        if file_path not in self.imported_by:
+            return 0
+        if not self._critical_paths:
+            components = self._components()
+            component_of = {
+                file: component
+                for component in components
+                for file in component
+            }
+            lengths: dict[frozenset[Path], int] = {}
+            # The dependents of a component come after it.
+            for component in reversed(components):
+                lengths[component] = sum(
+                    file.stat().st_size for file in component
+                ) + max(
+                    (
+                        lengths[component_of[dependent]]
+                        for file in component
+                        for dependent in self.imported_by[file]
+                        if dependent not in component
+                    ),
+                    default=0,
+                )
+            self._critical_paths = {
+                file: lengths[component]
+                for file, component in component_of.items()
+            }
+        return self._critical_paths[file_path]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self) -> str:
+        return f"ImportGraph(modules={len(self)})"
@@ -0,0 +1,203 @@
+"""
+Isolated benchmark runs, each one within a fresh interpreter.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from src.file_handler import DEFAULT_EXCLUDED_DIRS, FileHandler, name_matcher
+from src.helpers import Colors
+from src.import_graph import module_name
+from src.isolated.plugin import EXTENSION, SOURCE
+from src.memory_sampler import (
+    MemorySample,
+    MemorySampler,
+    attribute_samples,
+    timeline,
+)
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_PATH = Path(__file__).with_name("plugin.py")
+# The `pytest-benchmark` statistics which are kept for each test.
+BENCHMARK_STATS = ("min", "max", "mean", "median", "stddev", "rounds")
+# Loads a `module` by its path (the first argument),
+# so nothing is added to the `sys.path`.
+LOADER = (
+    "import importlib.util, sys\n"
+    "spec = importlib.util.spec_from_file_location("
+    "'pycompile_isolated', sys.argv.pop(1))\n"
+    "module = importlib.util.module_from_spec(spec)\n"
+    "spec.loader.exec_module(module)\n"
+)
+# Runs the `main` of the loaded module with the rest of the arguments.
+MAIN_BOOTSTRAP = LOADER + "raise SystemExit(module.main(sys.argv[1:]))\n"
+BOOTSTRAP = LOADER + (
+    "import pytest\n"
+    "raise SystemExit(pytest.main(sys.argv[1:], plugins=[module]))\n"
+)
+
+
+@dataclass
+class IsolatedRun:
+    """
+    The result of an isolated benchmark run, with the file each target
+    module was loaded from and the outcome, duration, process peak RSS
+    (and the ``pytest-benchmark`` statistics of the cpu runs) of each test.
+    """
+
+    engine: str
+    bench_type: str
+    returncode: int
+    modules: dict[str, Optional[str]] = field(default_factory=dict)
+    tests: dict[str, dict[str, Any]] = field(default_factory=dict)
+    timeline: list[list[Optional[float]]] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        modules = ", ".join(
+            f"{name}: {Path(file).name if file else None}"
+            for name, file in sorted(self.modules.items())
+        )
+        return (
+            f"`{self.engine}` {self.bench_type} benchmark "
+            f"(exit code: {self.returncode}), loaded: {modules}"
+        )
+
+
+def isolated_cmd(bootstrap: str, path: Path, *args: str) -> list[str]:
+    """
+    The command which runs the ``bootstrap`` code within a fresh (isolated)
+    interpreter, once the module of the ``path`` is loaded.
+    """
+    return [sys.executable, "-I", "-c", bootstrap, str(path), *args]
+
+
+def target_modules(directory: Path) -> dict[str, str]:
+    """
+    The modules of the ``directory`` (without the tests) with the kind of
+    the file they have to be loaded from, ``extension`` if they are compiled.
+    """
+    targets = {
+        module_name(file): SOURCE
+        for dir_files in FileHandler(input_path=directory).start().values()
+        for file in dir_files
+    }
+    is_excluded_dir = name_matcher(DEFAULT_EXCLUDED_DIRS | {"build"})
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if not is_excluded_dir(name)]
+        for name in files:
+            if name.endswith(".so"):
+                source = Path(root) / f"{name.split('.')[0]}.py"
+                targets[module_name(source)] = EXTENSION
+    return targets
+
+
+def read_report(
+    report: Path, benchmark_json: Path, samples: list[MemorySample]
+) -> tuple[dict[str, Optional[str]], dict[str, dict[str, Any]]]:
+    """
+    The loaded modules and the tests of a run, from the plugin ``report``
+    and the ``benchmark_json`` of ``pytest-benchmark``, if they exist,
+    along with the memory of each test from the ``samples``.
+    """
+    if not report.is_file():
+        return {}, {}
+    content = json.loads(report.read_text())
+    modules = {
+        name: module["file"] for name, module in content["modules"].items()
+    }
+    tests = content["tests"]
+    if benchmark_json.is_file():
+        for bench in json.loads(benchmark_json.read_text())["benchmarks"]:
+            tests.setdefault(bench["fullname"], {}).update(
+                {key: bench["stats"][key] for key in BENCHMARK_STATS},
+                data=bench["stats"].get("data", []),
+            )
+    for test, memory in attribute_samples(samples, tests).items():
+        tests[test].update(memory)
+    return modules, tests
+
+
+def _sampled_run(
+    cmd: list[str], directory: Path, sample_interval: Optional[float]
+) -> tuple[int, list[MemorySample]]:
+    """
+    Runs the ``cmd`` sampling its memory every ``sample_interval`` seconds,
+    if it's given.
+    """
+    with subprocess.Popen(cmd, cwd=directory) as process:
+        if not sample_interval:
+            return process.wait(), []
+        with MemorySampler(process.pid, interval=sample_interval) as sampler:
+            process.wait()
+    return process.returncode, sampler.samples
+
+
+def run_isolated(  # pylint: disable=R0913 R0917
+    directory: Path,
+    engine: str,
+    bench_type: str,
+    args: Optional[list[str]] = None,
+    targets: Optional[dict[str, str]] = None,
+    sample_interval: Optional[float] = None,
+) -> IsolatedRun:
+    """
+    Runs ``pytest`` at the ``directory`` within a fresh interpreter,
+    isolated from the ``PYTHONPATH``, the user site-packages and
+    the current directory, so no module is shared between the runs.
+
+    The plugin verifies the file each of the ``targets`` modules
+    (by default: ``target_modules``) was loaded from, the run fails if
+    a compiled module was loaded from its source or the other way around.
+    The ``cpu`` runs keep the ``pytest-benchmark`` statistics
+    (and the timings of each round) of each test.
+    With a ``sample_interval`` the RSS and PSS of the interpreter are sampled
+    (``MemorySampler``), keeping the memory of each test and the timeline.
+
+    :param directory: the workspace with the tests.
+    :param engine: the engine being benchmarked.
+    :param bench_type: the benchmark type, ``memory`` or ``cpu``.
+    :param args: the ``pytest`` arguments, by default the whole ``directory``.
+    :param targets: the modules with the kind of their expected file.
+    :param sample_interval: the seconds between the memory samples.
+    """
+    targets = target_modules(directory) if targets is None else targets
+    with tempfile.TemporaryDirectory() as temp_dir:
+        report = Path(temp_dir) / "report.json"
+        benchmark_json = Path(temp_dir) / "benchmark.json"
+        cmd = isolated_cmd(
+            BOOTSTRAP,
+            PLUGIN_PATH,
+            "-p",
+            "no:cacheprovider",
+            f"--rootdir={directory}",
+            f"--pycompile-report={report}",
+            *(
+                f"--pycompile-module={name}={kind}"
+                for name, kind in targets.items()
+            ),
+            *(
+                [f"--benchmark-json={benchmark_json}"]
+                if bench_type == "cpu"
+                else []
+            ),
+            *(args if args is not None else [str(directory)]),
+        )
+        returncode, samples = _sampled_run(cmd, directory, sample_interval)
+        modules, tests = read_report(report, benchmark_json, samples)
+    run = IsolatedRun(
+        engine=engine,
+        bench_type=bench_type,
+        returncode=returncode,
+        modules=modules,
+        tests=tests,
+        timeline=timeline(samples),
+    )
+    logger.info("%s%s%s", Colors.CYAN, run, Colors.RESET)
+    return run
@@ -0,0 +1,287 @@
+"""
+pytest plugin of the isolated benchmark runs.
+It's loaded by its file path within the fresh interpreter, so nothing is
+added to the ``sys.path`` and the target modules can't be shadowed by this
+package: it may import the standard library and ``pytest``, never ``src``.
+"""
+import gc
+import importlib.machinery
+import importlib.util
+import json
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from typing import Any, Generator, Optional
+
+import pytest
+
+EXTENSION = "extension"
+SOURCE = "source"
+REPORT_KEY = pytest.StashKey[dict[str, dict[str, str]]]()
+TESTS_KEY = pytest.StashKey[dict[str, dict[str, Any]]]()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """
+    The target modules and the report options.
+    """
+    group = parser.getgroup("pycompile")
+    group.addoption(
+        "--pycompile-module",
+        action="append",
+        default=[],
+        help="A target module with the kind of its expected file, "
+        "for example: fib=extension",
+    )
+    group.addoption(
+        "--pycompile-report",
+        default=None,
+        help="Path of the JSON report with the file of each target module "
+        "and the outcome, duration and process peak RSS of each test",
+    )
+    group.addoption(
+        "--pycompile-tracemalloc",
+        default=0,
+        type=int,
+        help="Trace the allocations of each test with `tracemalloc`, "
+        "reporting this many of its top allocation sites",
+    )
+
+
+def module_kind(file_path: Optional[str]) -> Optional[str]:
+    """
+    ``extension`` for the compiled modules, otherwise ``source``.
+    """
+    if file_path is None:
+        return None
+    if file_path.endswith(tuple(importlib.machinery.EXTENSION_SUFFIXES)):
+        return EXTENSION
+    return SOURCE
+
+
+def loaded_file(name: str) -> Optional[str]:
+    """
+    The file which the ``name`` module was (or would be) loaded from.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return getattr(module, "__file__", None)
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec else None
+
+
+def pytest_collection_finish(session: pytest.Session) -> None:
+    """
+    Once the test modules (and their targets) are imported, checks
+    that each target module was loaded from the expected file.
+    """
+    config = session.config
+    modules = {}
+    mismatches = []
+    for option in config.getoption("pycompile_module"):
+        name, _, expected = option.partition("=")
+        file_path = loaded_file(name)
+        modules[name] = {
+            "file": file_path,
+            "kind": module_kind(file_path),
+            "expected": expected,
+        }
+        if module_kind(file_path) != expected:
+            mismatches.append(
+                f"`{name}` from: `{file_path}`, expected {expected}"
+            )
+    config.stash[REPORT_KEY] = modules
+    write_report(config)
+    if mismatches:
+        pytest.exit(
+            "Modules loaded from unexpected files: " + ", ".join(mismatches),
+            returncode=pytest.ExitCode.USAGE_ERROR,
+        )
+
+
+def write_report(config: pytest.Config) -> None:
+    """
+    Writes the JSON report, if it was requested.
+    """
+    report = config.getoption("pycompile_report")
+    if report:
+        with open(report, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "modules": config.stash.get(REPORT_KEY, {}),
+                    "tests": config.stash.get(TESTS_KEY, {}),
+                    "sys_path": sys.path,
+                },
+                file,
+            )
+
+
+def process_peak_rss_mib() -> float:
+    """
+    The peak RSS (high-water mark) of the interpreter so far in MiB,
+    it's cumulative: it includes the tests (and the collection) before.
+    ``ru_maxrss`` is in bytes on macOS and in KiB elsewhere.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return peak / 1024
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo[None]
+) -> Generator[None, Any, None]:
+    """
+    Records the outcome, the duration and the start and stop (epoch) times
+    of each test call,
+    with the peak RSS of the whole interpreter once it finished.
+    """
+    outcome = yield
+    if call.when == "call":
+        report = outcome.get_result()
+        item.config.stash.setdefault(TESTS_KEY, {}).setdefault(
+            item.nodeid, {}
+        ).update(
+            outcome=report.outcome,
+            duration=call.duration,
+            start=call.start,
+            stop=call.stop,
+            process_peak_rss_mib=process_peak_rss_mib(),
+        )
+
+
+def allocation_site(frame: tracemalloc.Frame, rootdir: str) -> str:
+    """
+    The ``file:line`` of an allocation, relative to the ``rootdir``
+    so the sites of the engines (in different workspaces) can be compared.
+    """
+    filename = frame.filename
+    if filename.startswith(rootdir + os.sep):
+        filename = os.path.relpath(filename, rootdir)
+    return f"{filename}:{frame.lineno}"
+
+
+def top_sites(
+    snapshot: tracemalloc.Snapshot, rootdir: str, top: int
+) -> list[dict[str, Any]]:
+    """
+    The ``top`` allocation sites of the ``snapshot`` within the ``rootdir``,
+    with their size and blocks.
+    """
+    # Grouped before they're filtered, `Snapshot.filter_traces` matches the
+    # filename of each of the (millions of) traces instead of each site.
+    statistics = [
+        statistic
+        for statistic in snapshot.statistics("lineno")
+        if statistic.traceback[0].filename.startswith(rootdir + os.sep)
+    ]
+    return [
+        {
+            "site": allocation_site(statistic.traceback[0], rootdir),
+            "size": statistic.size,
+            "blocks": statistic.count,
+        }
+        for statistic in statistics[:top]
+    ]
+
+
+class PeakSnapshots(threading.Thread):
+    """
+    Takes a ``tracemalloc`` snapshot whenever the traced memory doubles
+    since the last snapshot, so the allocation sites are known
+    close to the peak, even if they're freed by the end of the test.
+    It's best effort, compiled code which holds the GIL isn't interrupted.
+    example usage::
+        snapshots = PeakSnapshots()
+        snapshots.start()
+        run_test()
+        snapshots.stopped.set()
+        snapshots.join()
+        peak_snapshot = snapshots.snapshot
+    """
+
+    def __init__(self, interval: float = 0.01):
+        """
+        :param interval: the seconds between the checks of the traced memory.
+        """
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        size = 1024 * 1024
+        while not self.stopped.wait(self.interval):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > size:
+                self.snapshot = None
+                self.snapshot = tracemalloc.take_snapshot()
+                size = current * 2
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item: pytest.Item) -> Generator[None, Any, None]:
+    """
+    Traces the allocations of each test call with ``tracemalloc``,
+    recording the peak of the traced memory, the blocks and bytes which
+    were still allocated once it finished and its top allocation sites
+    (close to the peak) within the ``rootdir``.
+    """
+    top = item.config.getoption("pycompile_tracemalloc")
+    if not top:
+        yield
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    gc.collect()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    snapshots = PeakSnapshots()
+    snapshots.start()
+    yield
+    _, peak = tracemalloc.get_traced_memory()
+    snapshots.stopped.set()
+    snapshots.join()
+    after = tracemalloc.take_snapshot()
+    retained = after.compare_to(before, "lineno")
+    item.config.stash.setdefault(TESTS_KEY, {}).setdefault(
+        item.nodeid, {}
+    ).update(
+        peak_traced_mib=(peak - start) / 1024 / 1024,
+        retained_mib=sum(stat.size_diff for stat in retained) / 1024 / 1024,
+        retained_blocks=sum(stat.count_diff for stat in retained),
+        allocation_sites=top_sites(
+            snapshots.snapshot or after, str(item.config.rootpath), top
+        ),
+    )
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    """
+    Updates the report with the tests.
+    """
+    if REPORT_KEY in session.config.stash:
+        write_report(session.config)
+
+
+def pytest_terminal_summary(
+    terminalreporter: pytest.TerminalReporter, config: pytest.Config
+) -> None:
+    """
+    Reports the file each target module was loaded from.
+    """
+    modules = config.stash.get(REPORT_KEY, {})
+    if not modules:
+        return
+    terminalreporter.section("pycompile loaded modules")
+    for name, module in sorted(modules.items()):
+        terminalreporter.write_line(
+            f"{name}: {module['file']} ({module['kind']})"
+        )
@@ -0,0 +1,135 @@
+"""
+Sampling profiler of the hot modules runs.
+Like the benchmark plugin it's loaded by its file path, without adding this
+package to the ``sys.path``, so it doesn't import ``src``. ``pytest`` is
+imported only to run the tests, an entrypoint script gets its own directory
+on the ``sys.path``, as ``python script.py`` does.
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+from typing import Optional
+
+
+class SamplingProfiler(threading.Thread):
+    """
+    Samples the innermost frame of a thread every ``interval`` seconds,
+    attributing the CPU time the thread spent since the previous sample
+    (its wall time if the CPU clock isn't available) to the file of the
+    frame (and to its line), so only its self time is counted and the waits
+    are ignored.
+    example usage::
+        profiler = SamplingProfiler(threading.main_thread().ident)
+        profiler.start()
+        run()
+        profiler.stop()
+        hottest = max(profiler.seconds, key=profiler.seconds.get)
+    """
+
+    def __init__(self, thread_id: Optional[int], interval: float = 0.005):
+        """
+        :param thread_id: the profiled thread.
+        :param interval: the seconds between the samples.
+        """
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.seconds: dict[str, float] = {}
+        self.lines: dict[str, dict[int, float]] = {}
+        self.samples = 0
+        self.stopped = threading.Event()
+        self._clock_id: Optional[int] = None
+        try:
+            self._clock_id = time.pthread_getcpuclockid(thread_id or 0)
+        except (AttributeError, OSError):
+            pass
+
+    def clock(self) -> float:
+        """
+        The CPU time of the thread, or the wall time without its CPU clock.
+        """
+        if self._clock_id is None:
+            return time.perf_counter()
+        return time.clock_gettime(self._clock_id)
+
+    def run(self) -> None:
+        last = self.clock()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(  # pylint: disable=W0212
+                self.thread_id or 0
+            )
+            now = self.clock()
+            if frame is not None:
+                file = frame.f_code.co_filename
+                self.seconds[file] = self.seconds.get(file, 0.0) + now - last
+                lines = self.lines.setdefault(file, {})
+                lines[frame.f_lineno] = (
+                    lines.get(frame.f_lineno, 0.0) + now - last
+                )
+                self.samples += 1
+            last = now
+
+    def stop(self) -> None:
+        """
+        Stops sampling.
+        """
+        self.stopped.set()
+        self.join()
+
+
+def run_target(entrypoint: Optional[str], args: list[str]) -> int:
+    """
+    Runs the ``entrypoint`` script with the ``args``,
+    or ``pytest`` with them if there isn't any.
+
+    :return: the exit code.
+    """
+    if entrypoint is None:
+        import pytest  # pylint: disable=C0415
+
+        return int(pytest.main(args))
+    sys.argv = [entrypoint, *args]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(entrypoint)))
+    try:
+        runpy.run_path(entrypoint, run_name="__main__")
+    except SystemExit as error:
+        return (
+            error.code if isinstance(error.code, int) else int(bool(error.code))
+        )
+    return 0
+
+
+def main(argv: list[str]) -> int:
+    """
+    Profiles the run of the tests (or of the entrypoint)
+    and writes the self time of each file (and of its lines) to the report.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report", required=True)
+    parser.add_argument("--interval", type=float, default=0.005)
+    parser.add_argument("--entrypoint", default=None)
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    options = parser.parse_args(argv)
+    args = options.args[1:] if options.args[:1] == ["--"] else options.args
+    profiler = SamplingProfiler(threading.main_thread().ident, options.interval)
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        exit_code = run_target(options.entrypoint, args)
+    finally:
+        profiler.stop()
+        with open(options.report, "w", encoding="utf-8") as report:
+            json.dump(
+                {
+                    "seconds": dict(profiler.seconds),
+                    "lines": profiler.lines,
+                    "samples": profiler.samples,
+                    "elapsed": time.perf_counter() - start,
+                },
+                report,
+            )
+    return exit_code
@@ -0,0 +1,166 @@
+"""
+Type tracer of the typing stubs runs.
+It's loaded by its file path (nothing is added to the ``sys.path``) so it
+doesn't import ``src``, it imports ``pytest`` only to run the tests.
+"""
+import argparse
+import json
+import sys
+import threading
+from types import CodeType, FrameType
+from typing import Any, Callable, Optional
+
+# The types which are recorded by their name, any other one is an `object`.
+TRACED_TYPES = (
+    bool,
+    int,
+    float,
+    complex,
+    str,
+    bytes,
+    list,
+    dict,
+    tuple,
+    set,
+    type(None),
+)
+# The calls of each function whose types are recorded, the later ones
+# are only counted, so deep recursions don't take forever.
+MAX_TRACED_CALLS = 10_000
+# The lines of each function where the types of its locals are recorded,
+# the later ones only record them on return, so hot loops don't take forever.
+MAX_TRACED_LINES = 10_000
+
+
+def type_name(value: Any) -> str:
+    """
+    The name of the exact type of the ``value``,
+    ``object`` for the types which aren't traced.
+    """
+    value_type = type(value)
+    return value_type.__name__ if value_type in TRACED_TYPES else "object"
+
+
+class TypeTracer:
+    """
+    Records the types of the arguments, the local variables and the return
+    values of the functions of the target files, with the largest absolute
+    value of their integers, using a ``sys.settrace`` hook.
+    The locals are recorded before each line as well as on return, so every
+    type a variable takes within the function is seen, not only its last one.
+    example usage::
+        tracer = TypeTracer(targets={"/project/fib.py"})
+        with tracer:
+            run()
+        functions = tracer.functions
+    """
+
+    def __init__(self, targets: set[str]):
+        """
+        :param targets: the (absolute) file paths of the traced functions.
+        """
+        self.targets = targets
+        self.functions: dict[str, dict[str, Any]] = {}
+        self._codes: dict[CodeType, Optional[dict[str, Any]]] = {}
+
+    def _record(self, variables: dict[str, Any], name: str, value: Any) -> None:
+        variable = variables.setdefault(name, {"types": [], "max_abs": 0})
+        value_type = type_name(value)
+        if value_type not in variable["types"]:
+            variable["types"].append(value_type)
+        if value_type == "int":
+            variable["max_abs"] = max(variable["max_abs"], abs(value))
+
+    def _function(self, frame: FrameType) -> dict[str, Any]:
+        code = frame.f_code
+        key = f"{code.co_filename}:{code.co_firstlineno}:{code.co_name}"
+        if key not in self.functions:
+            self.functions[key] = {
+                "file": code.co_filename,
+                "name": code.co_name,
+                "line": code.co_firstlineno,
+                "calls": 0,
+                "lines": 0,
+                "locals": {},
+                "returns": {},
+            }
+        return self.functions[key]
+
+    def _record_locals(
+        self, function: dict[str, Any], frame: FrameType
+    ) -> None:
+        shared = set(frame.f_code.co_cellvars + frame.f_code.co_freevars)
+        for name, value in frame.f_locals.items():
+            if name not in shared:
+                self._record(function["locals"], name, value)
+
+    def trace(
+        self, frame: FrameType, event: str, _: Any
+    ) -> Optional[Callable[..., Any]]:
+        """
+        The ``sys.settrace`` hook, only the frames of the target files
+        within the first calls of their function are traced.
+        """
+        if event != "call":
+            return None
+        code = frame.f_code
+        if code not in self._codes:
+            self._codes[code] = (
+                self._function(frame)
+                if code.co_filename in self.targets
+                else None
+            )
+        function = self._codes[code]
+        if function is None:
+            return None
+        function["calls"] += 1
+        if function["calls"] > MAX_TRACED_CALLS:
+            return None
+        return self._trace_frame
+
+    def _trace_frame(
+        self, frame: FrameType, event: str, arg: Any
+    ) -> Optional[Callable[..., Any]]:
+        function = self._codes[frame.f_code]
+        assert function is not None
+        if event == "line":
+            function["lines"] += 1
+            if function["lines"] > MAX_TRACED_LINES:
+                frame.f_trace_lines = False
+            self._record_locals(function, frame)
+        elif event == "return":
+            self._record_locals(function, frame)
+            self._record(function["returns"], "return", arg)
+        return self._trace_frame
+
+    def __enter__(self) -> "TypeTracer":
+        threading.settrace(self.trace)
+        sys.settrace(self.trace)
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        sys.settrace(None)
+        threading.settrace(None)
+
+
+def main(argv: list[str]) -> int:
+    """
+    Runs ``pytest`` tracing the types of the functions of the target files
+    and writes them to the report.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report", required=True)
+    parser.add_argument("--target", action="append", default=[])
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    options = parser.parse_args(argv)
+    args = options.args[1:] if options.args[:1] == ["--"] else options.args
+    import pytest  # pylint: disable=C0415
+
+    tracer = TypeTracer(targets=set(options.target))
+    try:
+        with tracer:
+            exit_code = int(pytest.main(args))
+    finally:
+        with open(options.report, "w", encoding="utf-8") as report:
+            json.dump(list(tracer.functions.values()), report)
+    return exit_code
@@ -0,0 +1,190 @@
+"""
+Manifest implementation, used for incremental compilation.
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import sysconfig
+from pathlib import Path
+from typing import Optional
+
+from src.wrappers import CompilerWrapper
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DIR = ".pycompile"
+MANIFEST_FILE = "manifest.json"
+
+
+def python_abi() -> str:
+    """
+    The extension suffix of the running interpreter,
+    for example: ``.cpython-311-x86_64-linux-gnu.so``
+    """
+    return str(
+        sysconfig.get_config_var("EXT_SUFFIX") or sys.implementation.cache_tag
+    )
+
+
+def file_hash(file_path: Path) -> str:
+    """
+    ``sha256`` hex digest of the file contents,
+    for a package directory of all its ``.py`` files and their paths.
+    """
+    digest = hashlib.sha256()
+    file_path = Path(file_path)
+    files = (
+        sorted(file_path.rglob("*.py")) if file_path.is_dir() else [file_path]
+    )
+    for file in files:
+        if file_path.is_dir():
+            digest.update(file.relative_to(file_path).as_posix().encode())
+        with open(file, "rb") as f:  # pylint: disable=invalid-name
+            while chunk := f.read(1 << 16):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_executable(file_path: Path) -> Optional[Path]:
+    """
+    Finds the compiled executable (``.so``) of the ``file_path`` module.
+    """
+    executable = file_path.with_name(file_path.stem + python_abi())
+    if executable.is_file():
+        return executable
+    for pattern in (f"{file_path.stem}.*.so", f"{file_path.stem}.so"):
+        for executable in file_path.parent.glob(pattern):
+            return executable
+    return None
+
+
+class Manifest:
+    """
+    Manifest keeps for each compiled module the source hash, the engine,
+    the engine version, the compile flags and the python ABI which were
+    used to build its executable.
+    A module is up-to-date when all of them match the current build
+    and its executable still exists.
+    example usage::
+        manifest = Manifest.for_input_path(Path("./my_module"))
+        if not manifest.is_up_to_date(file, compiler):
+            ...
+            manifest.record(file, compiler)
+        manifest.save()
+    """
+
+    def __init__(self, path: Path):
+        """
+        :param path: the ``manifest.json`` file path, it will be created
+                     on the first save.
+        """
+        self.path = path
+        self.entries: dict[str, dict[str, str]] = {}
+        if self.path.is_file():
+            try:
+                self.entries = json.loads(self.path.read_text())["modules"]
+            except (ValueError, KeyError):
+                logger.warning("Ignoring corrupted manifest: `%s`", self.path)
+
+    @classmethod
+    def for_input_path(cls, input_path: Path) -> "Manifest":
+        """
+        The manifest stored within the ``.pycompile`` directory
+        next to the ``input_path``.
+        """
+        input_path = Path(input_path).resolve()
+        root = input_path if input_path.is_dir() else input_path.parent
+        return cls(path=root / MANIFEST_DIR / MANIFEST_FILE)
+
+    @property
+    def root(self) -> Path:
+        """
+        The directory where the module paths are relative to.
+        """
+        return self.path.parent.parent
+
+    def _key(self, file_path: Path) -> str:
+        file_path = Path(file_path).resolve()
+        try:
+            return file_path.relative_to(self.root).as_posix()
+        except ValueError:
+            return file_path.as_posix()
+
+    @staticmethod
+    def fingerprint(
+        file_path: Path, compiler: CompilerWrapper, dependencies: str = ""
+    ) -> dict[str, str]:
+        """
+        Everything that affects the executable of the ``file_path``.
+
+        :param dependencies: the hash of the modules it depends on,
+                             see ``ImportGraph.dependencies_hash``.
+        """
+        return {
+            "source_hash": file_hash(file_path),
+            "dependencies": dependencies,
+            "engine": str(compiler),
+            "engine_version": compiler.version,
+            "flags": compiler.cmd,
+            "python_abi": python_abi(),
+        }
+
+    def is_up_to_date(
+        self,
+        file_path: Path,
+        compiler: CompilerWrapper,
+        dependencies: str = "",
+    ) -> bool:
+        """
+        Checks if the executable of ``file_path`` was built from the same
+        source and dependencies, with the same engine, flags and python ABI.
+        """
+        entry = self.entries.get(self._key(file_path))
+        if not entry:
+            return False
+        executable = find_executable(Path(file_path))
+        if not executable or executable.name != entry.get("executable"):
+            return False
+        expected = self.fingerprint(file_path, compiler, dependencies)
+        return all(entry.get(key) == value for key, value in expected.items())
+
+    def record(
+        self,
+        file_path: Path,
+        compiler: CompilerWrapper,
+        built_after: float = 0.0,
+        dependencies: str = "",
+    ) -> None:
+        """
+        Records the current build of ``file_path``,
+        if the compiler failed to build an executable the entry is removed.
+
+        :param built_after: timestamp of the compile start, an older executable
+                            means that the compiler failed.
+        :param dependencies: the hash of the modules it depends on.
+        """
+        key = self._key(file_path)
+        executable = find_executable(Path(file_path))
+        if not executable or executable.stat().st_mtime < built_after:
+            self.entries.pop(key, None)
+            return
+        self.entries[key] = {
+            **self.fingerprint(file_path, compiler, dependencies),
+            "executable": executable.name,
+        }
+
+    def save(self) -> None:
+        """
+        Writes the manifest to the disk.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        temp_path.write_text(
+            json.dumps({"modules": self.entries}, indent=2, sort_keys=True)
+        )
+        os.replace(temp_path, self.path)
+
+    def __repr__(self) -> str:
+        return f"Manifest(path={self.path})"
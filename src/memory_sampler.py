@@ -0,0 +1,157 @@
+"""
+Memory sampling of a child process, using its RSS and PSS from ``/proc``.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.01
+
+
+@dataclass
+class MemorySample:
+    """
+    The memory of a process at a point in time (epoch seconds), in KiB.
+    """
+
+    time: float
+    rss: int
+    pss: Optional[int] = None
+
+
+def read_memory(pid: int) -> Optional[MemorySample]:
+    """
+    The current RSS and PSS of the ``pid`` process from its
+    ``smaps_rollup``, or only its RSS from its ``status`` if it's missing
+    (Linux < 4.14), ``None`` once the process exited.
+    """
+    now = time.time()
+    values: dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(value.split()[0])
+    except FileNotFoundError:
+        try:
+            with open(f"/proc/{pid}/status", encoding="ascii") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        values["Rss"] = int(line.split()[1])
+        except OSError:
+            return None
+    except OSError:
+        return None
+    if "Rss" not in values:
+        return None
+    return MemorySample(time=now, rss=values["Rss"], pss=values.get("Pss"))
+
+
+class MemorySampler:
+    """
+    MemorySampler samples the RSS and PSS of a (child) process
+    every ``interval`` seconds within a thread, until it's stopped or the
+    process exits. It doesn't need any change of the profiled code, so it
+    works with the compiled modules too.
+    example usage::
+        process = subprocess.Popen(cmd)
+        with MemorySampler(pid=process.pid) as sampler:
+            process.wait()
+        peak = max(sample.rss for sample in sampler.samples)
+    """
+
+    def __init__(self, pid: int, interval: float = DEFAULT_INTERVAL):
+        """
+        :param pid: the process to be sampled.
+        :param interval: the seconds between the samples.
+        """
+        self.pid = pid
+        self.interval = interval
+        self.samples: list[MemorySample] = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        """
+        Samples the process until it's stopped.
+        """
+        while True:
+            sample = read_memory(self.pid)
+            if sample is None:
+                break
+            self.samples.append(sample)
+            if self._stopped.wait(self.interval):
+                break
+
+    def start(self) -> None:
+        """
+        Starts sampling.
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops sampling.
+        """
+        self._stopped.set()
+        self._thread.join()
+        logger.debug("#%s memory samples of: %s", len(self.samples), self.pid)
+
+    def __enter__(self) -> "MemorySampler":
+        self.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.stop()
+
+
+def attribute_samples(
+    samples: list[MemorySample], tests: dict[str, dict[str, Any]]
+) -> dict[str, dict[str, Optional[float]]]:
+    """
+    The memory of each test (with its ``start`` and ``stop`` time) in MiB,
+    its ``baseline_rss_mib`` (the last sample before it started) and its
+    ``peak_rss_mib`` and ``peak_pss_mib`` while it was running.
+    A test shorter than the interval gets the first sample after it started.
+    """
+    memory: dict[str, dict[str, Optional[float]]] = {}
+    for test, values in tests.items():
+        if "start" not in values or not samples:
+            continue
+        before = [sample for sample in samples if sample.time < values["start"]]
+        after = samples[len(before) :]
+        within = [
+            sample for sample in after if sample.time <= values["stop"]
+        ] or after[:1]
+        if not within:
+            continue
+        pss = [sample.pss for sample in within if sample.pss is not None]
+        memory[test] = {
+            "baseline_rss_mib": (before or within)[-1].rss / 1024,
+            "peak_rss_mib": max(sample.rss for sample in within) / 1024,
+            "peak_pss_mib": max(pss) / 1024 if pss else None,
+        }
+    return memory
+
+
+def timeline(samples: list[MemorySample]) -> list[list[Optional[float]]]:
+    """
+    The ``[seconds, rss_mib, pss_mib]`` of each sample,
+    relative to the first one.
+    """
+    if not samples:
+        return []
+    start = samples[0].time
+    return [
+        [
+            round(sample.time - start, 6),
+            sample.rss / 1024,
+            sample.pss / 1024 if sample.pss is not None else None,
+        ]
+        for sample in samples
+    ]
@@ -0,0 +1,414 @@
+"""
+Machine-readable benchmark results, with the speedups of the engines.
+"""
+import csv
+import json
+import logging
+import statistics
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from src.helpers import Colors
+from src.isolated import BENCHMARK_STATS, IsolatedRun
+from src.stats import Comparison, compare
+
+logger = logging.getLogger(__name__)
+
+MEMORY_STATS = (
+    "process_peak_rss_mib",
+    "peak_rss_mib",
+    "baseline_rss_mib",
+    "peak_pss_mib",
+    "peak_traced_mib",
+    "retained_mib",
+    "retained_blocks",
+)
+# The number of allocation site differences printed for each engine and test.
+ALLOCATION_DIFF_SITES = 3
+# The fields which aren't written within the rows of the results.
+DETAIL_FIELDS = ("samples", "allocation_sites")
+
+
+@dataclass
+class BenchResult:  # pylint: disable=R0902
+    """
+    The results of a single test using a single engine,
+    the timings (in seconds) of the cpu benchmark, with the time of each
+    round (``samples``), and the memory (in MiB) of the memory benchmark,
+    the peak RSS of its whole interpreter once it finished (cumulative,
+    the tests before it included) and (when it's sampled) its own baseline
+    RSS, peak RSS and peak PSS,
+    or (when it's traced) the peak of its traced memory, the memory and
+    blocks it retained and its top ``allocation_sites``.
+    """
+
+    engine: str
+    test: str
+    outcome: Optional[str] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    stddev: Optional[float] = None
+    rounds: Optional[int] = None
+    process_peak_rss_mib: Optional[float] = None
+    peak_rss_mib: Optional[float] = None
+    baseline_rss_mib: Optional[float] = None
+    peak_pss_mib: Optional[float] = None
+    peak_traced_mib: Optional[float] = None
+    retained_mib: Optional[float] = None
+    retained_blocks: Optional[int] = None
+    samples: list[float] = field(default_factory=list, repr=False)
+    allocation_sites: list[dict[str, Any]] = field(
+        default_factory=list, repr=False
+    )
+
+    def as_row(self) -> dict[str, Optional[float | int | str]]:
+        """
+        The result without its ``samples`` and ``allocation_sites``.
+        """
+        row = asdict(self)
+        for name in DETAIL_FIELDS:
+            del row[name]
+        return row
+
+
+def collect_results(runs: Iterable[IsolatedRun]) -> list[BenchResult]:
+    """
+    Merges the cpu and the memory ``runs`` into the results
+    of each engine and test, in the order they were run.
+    """
+    results: dict[tuple[str, str], BenchResult] = {}
+    for run in runs:
+        for test, values in run.tests.items():
+            result = results.setdefault(
+                (run.engine, test), BenchResult(engine=run.engine, test=test)
+            )
+            if result.outcome in (None, "passed"):
+                result.outcome = values.get("outcome", result.outcome)
+            if run.bench_type == "memory":
+                for key in MEMORY_STATS:
+                    setattr(result, key, values.get(key))
+                result.allocation_sites = values.get("allocation_sites", [])
+            else:
+                for key in BENCHMARK_STATS:
+                    if key in values:
+                        setattr(result, key, values[key])
+                result.samples = values.get("data", result.samples)
+    return list(results.values())
+
+
+def speedups(
+    results: list[BenchResult], baseline: str
+) -> dict[str, dict[str, float]]:
+    """
+    The speedup of each engine (the ``baseline`` mean time divided by its
+    mean time) for each test, with their ``geometric_mean``.
+    """
+    baseline_means = {
+        result.test: result.mean
+        for result in results
+        if result.engine == baseline and result.mean
+    }
+    engine_speedups: dict[str, dict[str, float]] = {}
+    for result in results:
+        if result.engine == baseline or not result.mean:
+            continue
+        if result.test in baseline_means:
+            engine_speedups.setdefault(result.engine, {})[result.test] = (
+                baseline_means[result.test] / result.mean
+            )
+    for ratios in engine_speedups.values():
+        ratios["geometric_mean"] = statistics.geometric_mean(ratios.values())
+    return engine_speedups
+
+
+def comparisons(
+    results: list[BenchResult], baseline: str
+) -> dict[str, dict[str, Comparison]]:
+    """
+    Compares the timings of each engine to the ``baseline`` ones, for each
+    test with enough ``samples``.
+    """
+    baseline_samples = {
+        result.test: result.samples
+        for result in results
+        if result.engine == baseline
+    }
+    engine_comparisons: dict[str, dict[str, Comparison]] = {}
+    for result in results:
+        if result.engine == baseline:
+            continue
+        comparison = compare(
+            baseline_samples.get(result.test, []), result.samples
+        )
+        if comparison is not None:
+            engine_comparisons.setdefault(result.engine, {})[
+                result.test
+            ] = comparison
+    return engine_comparisons
+
+
+def speedup_table(results: list[BenchResult], baseline: str) -> str:
+    """
+    Renders the speedups of the engines in a human-readable table,
+    one row per test and one column per engine, with the confidence
+    interval of the speedup and whether it's significant.
+    """
+    engine_speedups = speedups(results, baseline)
+    if not engine_speedups:
+        return ""
+    engine_comparisons = comparisons(results, baseline)
+    tests = [
+        result.test
+        for result in results
+        if result.engine == baseline and result.mean
+    ] + ["geometric_mean"]
+    rows = [[""] + list(engine_speedups)]
+    for test in tests:
+        rows.append([test])
+        for engine, ratios in engine_speedups.items():
+            comparison = engine_comparisons.get(engine, {}).get(test)
+            if comparison is not None:
+                rows[-1].append(str(comparison))
+            else:
+                ratio = ratios.get(test)
+                rows[-1].append(f"x{ratio:.2f}" if ratio is not None else "-")
+    return render_table(f"Speedup vs `{baseline}`", rows)
+
+
+def memory_table(results: list[BenchResult]) -> str:
+    """
+    Renders the memory of each test and engine in a human-readable table,
+    the ``process peak`` is the (cumulative) peak RSS of the interpreter
+    once the test finished.
+    """
+    rows = [
+        ["", "engine", "baseline RSS", "peak RSS", "peak PSS", "process peak"]
+    ]
+    for result in results:
+        if (
+            result.peak_rss_mib is not None
+            or result.process_peak_rss_mib is not None
+        ):
+            rows.append(
+                [result.test, result.engine]
+                + [
+                    f"{value:.1f}" if value is not None else "-"
+                    for value in (
+                        result.baseline_rss_mib,
+                        result.peak_rss_mib,
+                        result.peak_pss_mib,
+                        result.process_peak_rss_mib,
+                    )
+                ]
+            )
+    if len(rows) == 1:
+        return ""
+    return render_table("Memory (MiB)", rows)
+
+
+def allocation_sites(
+    results: list[BenchResult],
+) -> dict[str, dict[str, list[dict[str, Any]]]]:
+    """
+    The top allocation sites of each engine and traced test.
+    """
+    sites: dict[str, dict[str, list[dict[str, Any]]]] = {}
+    for result in results:
+        if result.allocation_sites:
+            sites.setdefault(result.engine, {})[
+                result.test
+            ] = result.allocation_sites
+    return sites
+
+
+def allocation_diff(
+    results: list[BenchResult], baseline: str
+) -> dict[str, dict[str, list[dict[str, Any]]]]:
+    """
+    The difference of the size and blocks of each allocation site
+    of each engine from the ``baseline`` ones, for each traced test,
+    ordered by the largest absolute size difference.
+    The sites are compared by their ``file:line`` (relative to the
+    workspace), a site which isn't traced by an engine has a zero size.
+    """
+    baseline_sites = {
+        result.test: {site["site"]: site for site in result.allocation_sites}
+        for result in results
+        if result.engine == baseline and result.peak_traced_mib is not None
+    }
+    diffs: dict[str, dict[str, list[dict[str, Any]]]] = {}
+    for result in results:
+        if (
+            result.engine == baseline
+            or result.peak_traced_mib is None
+            or result.test not in baseline_sites
+        ):
+            continue
+        before = baseline_sites[result.test]
+        after = {site["site"]: site for site in result.allocation_sites}
+        sites = [
+            {
+                "site": name,
+                "size_diff": after.get(name, {}).get("size", 0)
+                - before.get(name, {}).get("size", 0),
+                "blocks_diff": after.get(name, {}).get("blocks", 0)
+                - before.get(name, {}).get("blocks", 0),
+            }
+            for name in dict.fromkeys(list(before) + list(after))
+        ]
+        diffs.setdefault(result.engine, {})[result.test] = sorted(
+            (
+                site
+                for site in sites
+                if site["size_diff"] or site["blocks_diff"]
+            ),
+            key=lambda site: abs(site["size_diff"]),
+            reverse=True,
+        )
+    return diffs
+
+
+def allocation_table(results: list[BenchResult], baseline: str) -> str:
+    """
+    Renders the traced memory of each test and engine in a human-readable
+    table, with its top allocation site, followed by the largest
+    allocation site differences of each engine from the ``baseline``.
+    """
+    rows = [["", "engine", "peak traced", "retained", "blocks", "top site"]]
+    for result in results:
+        if result.peak_traced_mib is not None:
+            top = result.allocation_sites[:1]
+            rows.append(
+                [
+                    result.test,
+                    result.engine,
+                    f"{result.peak_traced_mib:.1f}",
+                    f"{result.retained_mib or 0:.1f}",
+                    str(result.retained_blocks or 0),
+                    f"{top[0]['site']} ({top[0]['size'] / 1024 / 1024:.1f})"
+                    if top
+                    else "-",
+                ]
+            )
+    if len(rows) == 1:
+        return ""
+    lines = [render_table("Allocations (MiB)", rows)]
+    for engine, tests in allocation_diff(results, baseline).items():
+        for test, sites in tests.items():
+            for site in sites[:ALLOCATION_DIFF_SITES]:
+                lines.append(
+                    f"`{engine}` {test}: {site['site']} "
+                    f"{site['size_diff'] / 1024 / 1024:+.1f} MiB, "
+                    f"{site['blocks_diff']:+} blocks vs `{baseline}`"
+                )
+    return "\n".join(lines)
+
+
+def render_table(title: str, rows: list[list[str]]) -> str:
+    """
+    Renders the ``rows`` (the first one is the header) in aligned columns,
+    the first column aligned to the left and the others to the right.
+    """
+    widths = [
+        max(len(row[column]) for row in rows) for column in range(len(rows[0]))
+    ]
+    return "\n".join(
+        [title]
+        + [
+            " | ".join(
+                [row[0].ljust(widths[0])]
+                + [
+                    cell.rjust(width)
+                    for cell, width in zip(row[1:], widths[1:])
+                ]
+            )
+            for row in rows
+        ]
+    )
+
+
+def write_results(
+    results: list[BenchResult],
+    baseline: str,
+    output: Path,
+    timelines: Optional[dict[str, list[list[Optional[float]]]]] = None,
+) -> None:
+    """
+    Writes the ``results`` to the ``output`` file, as ``CSV`` if its suffix
+    is ``.csv``, otherwise as ``JSON`` along with the speedups,
+    the comparisons, the memory ``timelines`` and the allocation sites
+    (with their differences from the ``baseline``) of the engines.
+    """
+    output = Path(output)
+    if output.suffix.lower() == ".csv":
+        with open(output, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(
+                file,
+                fieldnames=[
+                    result_field.name
+                    for result_field in fields(BenchResult)
+                    if result_field.name not in DETAIL_FIELDS
+                ],
+            )
+            writer.writeheader()
+            writer.writerows(result.as_row() for result in results)
+    else:
+        output.write_text(
+            json.dumps(
+                {
+                    "baseline": baseline,
+                    "results": [result.as_row() for result in results],
+                    "speedups": speedups(results, baseline),
+                    "comparisons": {
+                        engine: {
+                            test: asdict(comparison)
+                            for test, comparison in tests.items()
+                        }
+                        for engine, tests in comparisons(
+                            results, baseline
+                        ).items()
+                    },
+                    "timelines": timelines or {},
+                    "allocations": {
+                        "sites": allocation_sites(results),
+                        "diffs": allocation_diff(results, baseline),
+                    },
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+    logger.info("Benchmark results are written to: `%s`", output)
+
+
+def report_results(
+    runs: Iterable[IsolatedRun], baseline: str, output: Optional[Path] = None
+) -> list[BenchResult]:
+    """
+    Prints the speedups, the memory and the allocation tables of the ``runs`` and writes
+    their results to the ``output`` file, if any.
+    """
+    runs = list(runs)
+    results = collect_results(runs)
+    for table in (
+        speedup_table(results, baseline=baseline),
+        memory_table(results),
+        allocation_table(results, baseline=baseline),
+    ):
+        if table:
+            print(f"{Colors.CYAN}{table}{Colors.RESET}")
+    if output is not None:
+        write_results(
+            results,
+            baseline=baseline,
+            output=output,
+            timelines={
+                run.engine: run.timeline
+                for run in runs
+                if run.bench_type == "memory" and run.timeline
+            },
+        )
+    return results
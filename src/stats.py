@@ -0,0 +1,255 @@
+"""
+Statistics of the cpu benchmarks, sampling options and engine comparisons.
+"""
+import math
+import random
+import statistics
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+FASTER = "faster"
+SLOWER = "slower"
+NO_DIFFERENCE = "no significant difference"
+
+# The z-score of the two-sided 95% confidence interval.
+Z_95 = 1.959964
+# The larger groups of samples are bootstrapped as the means of
+# (about) equal batches of their rounds, with fewer resamples.
+MAX_BOOTSTRAP_SAMPLES = 200
+LARGE_RESAMPLES = 1000
+
+
+@dataclass
+class SamplingOptions:
+    """
+    How the cpu benchmark of each test is sampled by ``pytest-benchmark``.
+
+    Once a run finished, the tests with a confidence interval of their mean
+    wider than ``target_ci`` percent (of the mean) are rerun within a new
+    isolated interpreter, with twice the rounds each time,
+    up to ``max_reruns`` times.
+    """
+
+    warmup_iterations: int = 100
+    min_rounds: int = 5
+    min_time: float = 0.000005
+    max_time: float = 1.0
+    target_ci: float = 5.0
+    max_reruns: int = 3
+
+    def pytest_args(self, rerun: int = 0) -> list[str]:
+        """
+        The ``pytest-benchmark`` arguments of the ``rerun``.
+        """
+        warmup = (
+            [
+                "--benchmark-warmup=on",
+                f"--benchmark-warmup-iterations={self.warmup_iterations}",
+            ]
+            if self.warmup_iterations
+            else ["--benchmark-warmup=off"]
+        )
+        return warmup + [
+            f"--benchmark-min-rounds={self.min_rounds * 2**rerun}",
+            f"--benchmark-min-time={self.min_time}",
+            f"--benchmark-max-time={self.max_time}",
+        ]
+
+
+def sampling_from_options(
+    warmup_iterations: int,
+    min_rounds: int,
+    min_time: float,
+    max_time: float,
+    target_ci: float,
+) -> SamplingOptions:
+    """
+    Creates the ``SamplingOptions`` from the cli options,
+    ``target_ci`` 0 disables the reruns.
+
+    :param warmup_iterations: the warmup iterations, 0 disables the warmup.
+    :param min_rounds: the minimum rounds of each test.
+    :param min_time: the minimum time of each round in seconds.
+    :param max_time: the maximum time of each test in seconds.
+    :param target_ci: the target width of the confidence interval in percent.
+    """
+    return SamplingOptions(
+        warmup_iterations,
+        min_rounds,
+        min_time,
+        max_time,
+        target_ci,
+        max_reruns=SamplingOptions.max_reruns if target_ci else 0,
+    )
+
+
+def summarize(samples: Sequence[float]) -> dict[str, float]:
+    """
+    The ``pytest-benchmark`` statistics of the ``samples``.
+    """
+    return {
+        "min": min(samples),
+        "max": max(samples),
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": len(samples),
+    }
+
+
+def relative_ci(samples: Sequence[float]) -> float:
+    """
+    The half width of the 95% confidence interval of the mean of
+    the ``samples``, in percent of the mean (normal approximation).
+    """
+    if len(samples) < 2:
+        return math.inf
+    mean = statistics.fmean(samples)
+    if not mean:
+        return math.inf
+    half_width = Z_95 * statistics.stdev(samples) / math.sqrt(len(samples))
+    return half_width / mean * 100
+
+
+def batch_means(
+    samples: Sequence[float], batches: int = MAX_BOOTSTRAP_SAMPLES
+) -> Sequence[float]:
+    """
+    The means of the ``batches`` consecutive (and about equal) batches
+    of the ``samples``, the ``samples`` themselves if there are fewer.
+    """
+    if len(samples) <= batches:
+        return samples
+    bounds = [index * len(samples) // batches for index in range(batches + 1)]
+    return [
+        statistics.fmean(samples[start:end])
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+
+def bootstrap_ci(  # pylint: disable=R0913 R0917
+    baseline: Sequence[float],
+    samples: Sequence[float],
+    statistic: Callable[[Sequence[float], Sequence[float]], float],
+    confidence: float = 0.95,
+    resamples: int = 2000,
+    seed: int = 0,
+) -> tuple[float, float]:
+    """
+    The bootstrap (percentile) confidence interval of the ``statistic``
+    of two independent groups of samples.
+    The groups larger than ``MAX_BOOTSTRAP_SAMPLES`` are resampled as the
+    means of their batches (which keeps the statistics of their mean),
+    with at most ``LARGE_RESAMPLES`` resamples.
+    """
+    if max(len(baseline), len(samples)) > MAX_BOOTSTRAP_SAMPLES:
+        baseline, samples = batch_means(baseline), batch_means(samples)
+        resamples = min(resamples, LARGE_RESAMPLES)
+    rand = random.Random(seed)
+    estimates = sorted(
+        statistic(
+            rand.choices(baseline, k=len(baseline)),
+            rand.choices(samples, k=len(samples)),
+        )
+        for _ in range(resamples)
+    )
+    tail = (1 - confidence) / 2
+    return (
+        estimates[int(tail * (resamples - 1))],
+        estimates[int((1 - tail) * (resamples - 1))],
+    )
+
+
+def speedup(baseline: Sequence[float], samples: Sequence[float]) -> float:
+    """
+    The ratio of the mean times, above 1 if the ``samples`` are faster.
+    """
+    return statistics.fmean(baseline) / statistics.fmean(samples)
+
+
+def _ranks(values: Sequence[float]) -> tuple[list[float], float]:
+    """
+    The ranks of the sorted ``values`` (the average rank for the ties),
+    with the tie correction term.
+    """
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    start = 0
+    while start < len(values):
+        end = start
+        while end + 1 < len(values) and values[end + 1] == values[start]:
+            end += 1
+        for index in range(start, end + 1):
+            ranks[index] = (start + end) / 2 + 1
+        size = end - start + 1
+        ties += size**3 - size
+        start = end + 1
+    return ranks, ties
+
+
+def mann_whitney_u(x: Sequence[float], y: Sequence[float]) -> float:
+    """
+    The two-sided p-value of the Mann-Whitney U test of ``x`` and ``y``,
+    using the normal approximation with the tie correction.
+    """
+    n_x, n_y = len(x), len(y)
+    ranked = sorted([(value, 0) for value in x] + [(value, 1) for value in y])
+    ranks, ties = _ranks([value for value, _ in ranked])
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, ranked) if not group)
+    u_stat = rank_sum - n_x * (n_x + 1) / 2
+    total = n_x + n_y
+    variance = n_x * n_y / 12 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z_score = (abs(u_stat - n_x * n_y / 2) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z_score, 0) / math.sqrt(2)))
+
+
+@dataclass
+class Comparison:
+    """
+    The comparison of an engine to the baseline,
+    the ``speedup`` with its confidence interval and the p-value.
+    """
+
+    speedup: float
+    low: float
+    high: float
+    p_value: float
+    verdict: str
+
+    def __str__(self) -> str:
+        return (
+            f"x{self.speedup:.2f} [{self.low:.2f}, {self.high:.2f}] "
+            f"{self.verdict}"
+        )
+
+
+def compare(
+    baseline: Sequence[float],
+    samples: Sequence[float],
+    confidence: float = 0.95,
+) -> Optional[Comparison]:
+    """
+    Compares the ``samples`` of an engine to the ``baseline`` ones,
+    the engine is ``faster`` (or ``slower``) only if the difference is
+    significant and the confidence interval of the speedup excludes 1,
+    ``None`` without enough samples.
+    """
+    if len(baseline) < 2 or len(samples) < 2:
+        return None
+    low, high = bootstrap_ci(baseline, samples, speedup, confidence=confidence)
+    p_value = mann_whitney_u(baseline, samples)
+    verdict = NO_DIFFERENCE
+    if p_value < 1 - confidence:
+        if low > 1:
+            verdict = FASTER
+        elif high < 1:
+            verdict = SLOWER
+    return Comparison(
+        speedup=speedup(baseline, samples),
+        low=low,
+        high=high,
+        p_value=p_value,
+        verdict=verdict,
+    )
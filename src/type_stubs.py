@@ -0,0 +1,418 @@
+"""
+Cython typing stubs, augmenting ``.pxd`` files generated from the types
+observed while running the tests.
+"""
+import ast
+import json
+import logging
+import subprocess
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from src.helpers import Colors
+from src.isolated import MAIN_BOOTSTRAP, isolated_cmd
+from src.results import render_table
+from src.wrappers import CompilerCommands, CythonWrapper
+
+logger = logging.getLogger(__name__)
+
+TRACER_PATH = Path(__file__).parent / "isolated" / "tracer.py"
+# The first line of the generated `.pxd` files, the other ones aren't replaced.
+GENERATED_HEADER = (
+    "# Generated by pycompile from the types traced by the tests."
+)
+# The observed integers are typed as C `long long` only below this magnitude,
+# leaving some room before they would silently overflow.
+MAX_TYPED_INT = 2**53
+# The `cython` type of each scalar type, with its C name for the return types.
+SCALAR_TYPES = {
+    "int": ("cython.longlong", "long long"),
+    "float": ("cython.double", "double"),
+    "bool": ("cython.bint", "bint"),
+}
+SCALAR_CYTHON_TYPES = {cython_name for cython_name, _ in SCALAR_TYPES.values()}
+# The builtin types which are typed as themselves, they may be `None` as well.
+BUILTIN_TYPES = ("list", "dict", "tuple", "set", "str", "bytes")
+
+
+def cython_type(variable: dict[str, Any]) -> Optional[str]:
+    """
+    The ``cython`` type of a traced variable, if it always had the same
+    (supported) type, ``None`` otherwise.
+    """
+    types: set[str] = set(variable["types"])
+    if len(types) == 1 and types <= SCALAR_TYPES.keys():
+        value_type = types.pop()
+        if value_type == "int" and variable["max_abs"] >= MAX_TYPED_INT:
+            return None
+        return SCALAR_TYPES[value_type][0]
+    types.discard("NoneType")
+    if len(types) == 1 and types <= set(BUILTIN_TYPES):
+        return types.pop()
+    return None
+
+
+def eligible_functions(source: str) -> dict[str, Optional[str]]:
+    """
+    The top level functions of the ``source``, with the reason they can't
+    become ``cpdef`` functions (``None`` if they can).
+    """
+    reasons: dict[str, Optional[str]] = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.AsyncFunctionDef):
+            reasons[node.name] = "async"
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        reason = None
+        nested = (
+            ast.FunctionDef,
+            ast.AsyncFunctionDef,
+            ast.ClassDef,
+            ast.Lambda,
+            ast.GeneratorExp,
+        )
+        if node.decorator_list:
+            reason = "decorated"
+        elif node.args.vararg or node.args.kwarg or node.args.kwonlyargs:
+            reason = "variable or keyword-only arguments"
+        elif any(
+            isinstance(child, (ast.Yield, ast.YieldFrom))
+            for child in ast.walk(node)
+        ):
+            reason = "generator"
+        elif any(
+            isinstance(child, nested)
+            for statement in node.body
+            for child in ast.walk(statement)
+        ):
+            reason = "closure"
+        reasons[node.name] = reason
+    return reasons
+
+
+def none_assigned(node: ast.FunctionDef) -> set[str]:
+    """
+    The arguments and the local variables of the function ``node`` which are
+    assigned (or default to) ``None``, they can't be C scalars even if
+    the tests never observed them as ``None``.
+    """
+    arguments = node.args.posonlyargs + node.args.args
+    names = {
+        arg.arg
+        for arg, default in zip(
+            arguments[len(arguments) - len(node.args.defaults) :],
+            node.args.defaults,
+        )
+        if isinstance(default, ast.Constant) and default.value is None
+    }
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Assign, ast.AnnAssign)) and (
+            isinstance(child.value, ast.Constant) and child.value.value is None
+        ):
+            targets = (
+                child.targets
+                if isinstance(child, ast.Assign)
+                else [child.target]
+            )
+            names |= {
+                target.id for target in targets if isinstance(target, ast.Name)
+            }
+    return names
+
+
+@dataclass
+class FunctionStub:
+    """
+    The observed types of a function, by ``cython`` type,
+    or the reason it isn't typed (``skipped``).
+    """
+
+    name: str
+    args: list[str]
+    defaults: int = 0
+    types: dict[str, str] = field(default_factory=dict)
+    return_type: Optional[str] = None
+    skipped: Optional[str] = None
+
+    def render(self) -> str:
+        """
+        The ``.pxd`` declaration of the function.
+        """
+        args = ", ".join(
+            arg + ("=*" if index >= len(self.args) - self.defaults else "")
+            for index, arg in enumerate(self.args)
+        )
+        declaration = (
+            f"cpdef {self.return_type} {self.name}({args})"
+            if self.return_type
+            else f"cpdef {self.name}({args})"
+        )
+        if not self.types:
+            return declaration
+        types = ", ".join(f"{name}={kind}" for name, kind in self.types.items())
+        return f"@cython.locals({types})\n{declaration}"
+
+
+def function_stubs(
+    file_path: Path, functions: list[dict[str, Any]]
+) -> list[FunctionStub]:
+    """
+    The stubs of the top level functions of the ``file_path`` module
+    from their traced ``functions``.
+    """
+    source = Path(file_path).read_text(encoding="utf-8")
+    tree = {
+        node.name: node
+        for node in ast.parse(source).body
+        if isinstance(node, ast.FunctionDef)
+    }
+    reasons = eligible_functions(source)
+    stubs = []
+    for function in sorted(functions, key=lambda function: function["line"]):
+        node = tree.get(function["name"])
+        if node is None or node.lineno != function["line"]:
+            continue
+        stub = FunctionStub(
+            name=node.name,
+            args=[arg.arg for arg in node.args.posonlyargs + node.args.args],
+            defaults=len(node.args.defaults),
+            skipped=reasons.get(node.name),
+        )
+        if stub.skipped is None:
+            nullable = none_assigned(node)
+            stub.types = {
+                name: kind
+                for name, variable in function["locals"].items()
+                if (kind := cython_type(variable)) is not None
+                and not (name in nullable and kind in SCALAR_CYTHON_TYPES)
+            }
+            if any(
+                variable["types"] == ["int"]
+                and variable["max_abs"] >= MAX_TYPED_INT
+                for variable in function["locals"].values()
+            ):
+                # Mixing C and python integers boxes them on each operation,
+                # which is slower than keeping all of them python integers.
+                stub.types = {
+                    name: kind
+                    for name, kind in stub.types.items()
+                    if kind != SCALAR_TYPES["int"][0]
+                }
+            return_type = cython_type(
+                function["returns"].get("return", {"types": []})
+            )
+            if any(
+                isinstance(child, ast.Return)
+                and (
+                    child.value is None
+                    or (
+                        isinstance(child.value, ast.Constant)
+                        and child.value.value is None
+                    )
+                    or (
+                        isinstance(child.value, ast.Name)
+                        and child.value.id in nullable
+                    )
+                )
+                for child in ast.walk(node)
+            ):
+                return_type = None
+            stub.return_type = next(
+                (
+                    c_name
+                    for cython_name, c_name in SCALAR_TYPES.values()
+                    if cython_name == return_type
+                ),
+                None,
+            )
+            if not stub.types and not stub.return_type:
+                stub.skipped = "no stable types"
+        stubs.append(stub)
+    return stubs
+
+
+def render_pxd(stubs: list[FunctionStub]) -> str:
+    """
+    The augmenting ``.pxd`` file of the typed ``stubs``.
+    """
+    declarations = [stub.render() for stub in stubs if stub.skipped is None]
+    return (
+        "\n\n".join([f"{GENERATED_HEADER}\ncimport cython", *declarations])
+        + "\n"
+    )
+
+
+def trace_types(
+    input_path: Path, files: list[Path]
+) -> dict[Path, list[FunctionStub]]:
+    """
+    Runs the tests of the ``input_path`` within a fresh interpreter,
+    tracing the types of the functions of the ``files``.
+
+    :return: the stubs of the functions of each file which were called.
+    """
+    input_path = Path(input_path).resolve()
+    root = input_path if input_path.is_dir() else input_path.parent
+    targets = [Path(file).resolve() for file in files]
+    with tempfile.TemporaryDirectory() as report_dir:
+        report = Path(report_dir) / "types.json"
+        cmd = isolated_cmd(
+            MAIN_BOOTSTRAP,
+            TRACER_PATH,
+            f"--report={report}",
+            *(f"--target={file}" for file in targets),
+            "--",
+            "-q",
+            "-p",
+            "no:cacheprovider",
+            str(root),
+        )
+        logger.info(
+            "%s Tracing the types of: #%s modules %s",
+            Colors.CYAN,
+            len(targets),
+            Colors.RESET,
+        )
+        process = subprocess.run(cmd, cwd=root, check=False)
+        if process.returncode:
+            logger.warning(
+                "%sTraced run of: `%s` exited with: %s%s",
+                Colors.WARNING,
+                root,
+                process.returncode,
+                Colors.RESET,
+            )
+        functions = (
+            json.loads(report.read_text(encoding="utf-8"))
+            if report.is_file()
+            else []
+        )
+    stubs = {}
+    for file in targets:
+        file_functions = [
+            function for function in functions if function["file"] == str(file)
+        ]
+        if file_functions:
+            stubs[file] = function_stubs(file, file_functions)
+    return stubs
+
+
+def write_stubs(stubs: dict[Path, list[FunctionStub]]) -> list[Path]:
+    """
+    Writes the ``.pxd`` file next to each module with any typed function,
+    the existing ones which weren't generated are kept as they are.
+
+    :return: the written files.
+    """
+    written = []
+    for file, file_stubs in stubs.items():
+        pxd_file = Path(file).with_suffix(".pxd")
+        if all(stub.skipped for stub in file_stubs):
+            continue
+        if pxd_file.is_file() and not pxd_file.read_text(
+            encoding="utf-8"
+        ).startswith(GENERATED_HEADER):
+            logger.warning(
+                "%sKeeping the existing: `%s`%s",
+                Colors.WARNING,
+                pxd_file,
+                Colors.RESET,
+            )
+            continue
+        pxd_file.write_text(render_pxd(file_stubs), encoding="utf-8")
+        written.append(pxd_file)
+    return written
+
+
+def stubs_table(stubs: dict[Path, list[FunctionStub]], root: Path) -> str:
+    """
+    Renders the typed (and skipped) functions of each module
+    in a human-readable table.
+    """
+    rows = [["", "function", "typed"]]
+    for file, file_stubs in stubs.items():
+        for stub in file_stubs:
+            if stub.skipped:
+                typed = f"skipped: {stub.skipped}"
+            else:
+                typed = ", ".join(
+                    [f"{name}: {kind}" for name, kind in stub.types.items()]
+                    + (
+                        [f"return: {stub.return_type}"]
+                        if stub.return_type
+                        else []
+                    )
+                )
+            rows.append(
+                [Path(file).relative_to(root).as_posix(), stub.name, typed]
+            )
+    if len(rows) == 1:
+        return ""
+    return render_table("Typed functions", rows)
+
+
+def stubs_from_options(
+    input_path: Path, files: dict[str, list[Path]], trace: bool
+) -> dict[Path, list[FunctionStub]]:
+    """
+    Traces the types of the ``files`` (printing the typed functions),
+    if ``trace`` is set.
+
+    :param input_path: the folder with the tests.
+    :param files: the files to be compiled within each directory.
+    :param trace: trace the types of the functions.
+    """
+    if not trace:
+        return {}
+    stubs = trace_types(
+        Path(input_path),
+        [file for dir_files in files.values() for file in dir_files],
+    )
+    root = Path(input_path).resolve()
+    table = stubs_table(stubs, root=root if root.is_dir() else root.parent)
+    if table:
+        print(f"{Colors.CYAN}{table}{Colors.RESET}")
+    return stubs
+
+
+class TypedCythonWrapper(CythonWrapper):
+    """
+    TypedCythonWrapper compiles the modules with ``cython`` after writing
+    their augmenting ``.pxd`` files, from the types traced by the tests.
+    example usage::
+        stubs = trace_types(Path("./my_module"), files)
+        compiler = TypedCythonWrapper(stubs=stubs, root=Path("./my_module"))
+        compiler.write_stubs(workspace_dir)
+    """
+
+    def __init__(
+        self,
+        stubs: dict[Path, list[FunctionStub]],
+        root: Path,
+        cmd: str = CompilerCommands.cython,
+    ):
+        """
+        :param stubs: the stubs of the functions of each module.
+        :param root: the directory where the modules are relative to.
+        :param cmd: the ``cython`` command.
+        """
+        super().__init__(cmd=cmd)
+        self.stubs = stubs
+        self.root = Path(root).resolve()
+
+    def write_stubs(self, directory: Path) -> list[Path]:
+        """
+        Writes the ``.pxd`` files of the modules within the ``directory``,
+        a copy of the ``root``.
+        """
+        return write_stubs(
+            {
+                Path(directory) / Path(file).relative_to(self.root): file_stubs
+                for file, file_stubs in self.stubs.items()
+            }
+        )
+
+    def __str__(self) -> str:
+        return "Cython (typed)"
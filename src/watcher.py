@@ -0,0 +1,467 @@
+"""
+Watch mode, recompiles the modules once they change.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional, Protocol
+
+from src.benchmark import Benchmark
+from src.compiler_handler import CompilerHandler
+from src.discovery_index import DiscoveryIndex
+from src.file_handler import DEFAULT_EXCLUDED_DIRS, FileHandler, name_matcher
+from src.helpers import Colors
+from src.import_graph import ImportGraph
+from src.manifest import Manifest
+from src.wrappers import CompilerWrapper
+
+logger = logging.getLogger(__name__)
+
+# Directories with build files or tools state, never watched.
+IGNORED_DIRS = DEFAULT_EXCLUDED_DIRS | {"build"}
+_is_ignored_name = name_matcher(IGNORED_DIRS)
+# The modules and their augmenting `.pxd` files.
+WATCHED_SUFFIXES = (".py", ".pxd")
+
+# inotify(7) events
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_ignored_dir(directory: Path) -> bool:
+    """
+    Checks if the ``directory`` holds build files or tools state.
+    """
+    return _is_ignored_name(directory.name)
+
+
+def _watched_files(directory: Path, recursive: bool = False) -> list[Path]:
+    """
+    The ``.py`` and ``.pxd`` files of the ``directory``.
+    """
+    glob = directory.rglob if recursive else directory.glob
+    return [file for suffix in WATCHED_SUFFIXES for file in glob(f"*{suffix}")]
+
+
+def _walk_dirs(root: Path) -> list[Path]:
+    """
+    All the directories within the ``root`` which are watched.
+    """
+    directories = []
+    for directory, sub_dirs, _ in os.walk(root):
+        sub_dirs[:] = [
+            sub_dir
+            for sub_dir in sub_dirs
+            if not is_ignored_dir(Path(directory) / sub_dir)
+        ]
+        directories.append(Path(directory))
+    return directories
+
+
+class Watcher(Protocol):
+    """
+    Reports the changed ``.py`` and ``.pxd`` files of a directory.
+    """
+
+    def changes(self, timeout: Optional[float]) -> set[Path]:
+        """
+        Waits up to ``timeout`` seconds (forever for None) for any changes.
+
+        :return: the created, modified or deleted ``.py`` and ``.pxd`` files.
+        """
+
+    def close(self) -> None:
+        """
+        Stops watching.
+        """
+
+
+class PollingWatcher:
+    """
+    PollingWatcher compares the modification time and the size
+    of the ``.py`` and ``.pxd`` files every ``interval`` seconds.
+    example usage::
+        watcher = PollingWatcher(Path("./my_module"))
+        changed = watcher.changes(timeout=1.0)
+    """
+
+    def __init__(self, root: Path, interval: float = 0.5):
+        """
+        :param root: the directory to be watched.
+        :param interval: the seconds between two snapshots.
+        """
+        self.root = Path(root).resolve()
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        snapshot = {}
+        for directory in _walk_dirs(self.root):
+            for file in _watched_files(directory):
+                try:
+                    file_stat = file.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[file] = (file_stat.st_mtime_ns, file_stat.st_size)
+        return snapshot
+
+    def changes(self, timeout: Optional[float]) -> set[Path]:
+        """
+        Waits up to ``timeout`` seconds (forever for None) for any changes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = (
+                self.interval
+                if deadline is None
+                else min(self.interval, deadline - time.monotonic())
+            )
+            time.sleep(max(0.0, remaining))
+            snapshot = self._scan()
+            changed = {
+                file
+                for file in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(file) != self._snapshot.get(file)
+            }
+            self._snapshot = snapshot
+            if changed or (
+                deadline is not None and time.monotonic() >= deadline
+            ):
+                return changed
+
+    def close(self) -> None:
+        """
+        Nothing to release.
+        """
+
+
+class InotifyWatcher:
+    """
+    InotifyWatcher uses the Linux ``inotify`` API, watching each
+    directory of the ``root`` and any new one.
+    example usage::
+        watcher = InotifyWatcher(Path("./my_module"))
+        changed = watcher.changes(timeout=1.0)
+        watcher.close()
+    """
+
+    def __init__(self, root: Path):
+        """
+        :param root: the directory to be watched.
+        :raises OSError: when ``inotify`` isn't available.
+        """
+        self.root = Path(root).resolve()
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify isn't available")
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, Path] = {}
+        for directory in _walk_dirs(self.root):
+            self._add_watch(directory)
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(  # pylint: disable=invalid-name
+            self._fd, os.fsencode(directory), IN_MASK
+        )
+        if wd < 0:
+            logger.debug("Can't watch: `%s`", directory)
+            return
+        self._dirs[wd] = directory
+
+    def _read_events(self) -> set[Path]:
+        changed: set[Path] = set()
+        buffer = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, all the files are considered changed.
+                changed.update(_watched_files(self.root, recursive=True))
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not is_ignored_dir(
+                    path
+                ):
+                    for sub_dir in _walk_dirs(path):
+                        self._add_watch(sub_dir)
+                    changed.update(_watched_files(path, recursive=True))
+            elif path.suffix in WATCHED_SUFFIXES:
+                changed.add(path)
+        return changed
+
+    def changes(self, timeout: Optional[float]) -> set[Path]:
+        """
+        Waits up to ``timeout`` seconds (forever for None) for any changes.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed: set[Path] = set()
+        while not changed:
+            remaining = (
+                None
+                if deadline is None
+                else max(0.0, deadline - time.monotonic())
+            )
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                break
+            changed = self._read_events()
+        return changed
+
+    def close(self) -> None:
+        """
+        Releases the ``inotify`` instance.
+        """
+        os.close(self._fd)
+
+
+def create_watcher(root: Path, polling: bool = False) -> Watcher:
+    """
+    ``inotify`` on Linux, otherwise polling.
+    """
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root)
+        except OSError as error:
+            logger.warning(
+                "%sFalling back to polling: %s%s",
+                Colors.WARNING,
+                error,
+                Colors.RESET,
+            )
+    return PollingWatcher(root)
+
+
+def debounce(watcher: Watcher, delay: float) -> set[Path]:
+    """
+    Waits for a change and collects the following ones,
+    until there isn't any change for ``delay`` seconds.
+    """
+    changed = watcher.changes(timeout=None)
+    while more := watcher.changes(timeout=delay):
+        changed |= more
+    return changed
+
+
+class WatchHandler:  # pylint: disable=R0902
+    """
+    WatchHandler watches the ``input_path`` and recompiles the changed modules
+    and their dependents, using the ``manifest`` of the ``input_path``.
+    example usage::
+        WatchHandler(input_path=Path("./my_module"), compiler=CythonWrapper(),
+                     bench=True).start()
+    """
+
+    def __init__(  # pylint: disable=R0913 R0917
+        self,
+        input_path: Path,
+        compiler: CompilerWrapper,
+        exclude_patterns: Optional[list[str]] = None,
+        delay: float = 0.3,
+        bench: bool = False,
+        polling: bool = False,
+        jobs: Optional[int] = None,
+        keep_builds: bool = False,
+    ):
+        """
+        :param input_path: the directory to be watched.
+        :param compiler: the compiler to be used.
+        :param exclude_patterns: the ``FileHandler`` additional glob patterns.
+        :param delay: the seconds without any change before a rebuild.
+        :param bench: rerun the ``test_<module>.py`` benchmarks after a rebuild.
+        :param polling: poll for changes instead of using ``inotify``.
+        :param jobs: number of files to be compiled in parallel.
+        :param keep_builds: keep the temporary build files.
+        """
+        self.input_path = Path(input_path).resolve()
+        self.compiler = compiler
+        self.exclude_patterns = exclude_patterns
+        self.delay = delay
+        self.bench = bench
+        self.polling = polling
+        self.jobs = jobs
+        self.keep_builds = keep_builds
+        self.manifest = Manifest.for_input_path(self.input_path)
+        self.index = DiscoveryIndex.for_input_path(self.input_path)
+        self.files: dict[str, list[Path]] = {}
+        self.graph: Optional[ImportGraph] = None
+
+    def _discover(self) -> dict[str, list[Path]]:
+        """
+        The valid files within each directory, only the directories which
+        changed since the last discovery are rescanned.
+        """
+        return FileHandler(
+            input_path=self.input_path,
+            additional_exclude_patterns=self.exclude_patterns,
+            index=self.index,
+        ).start()
+
+    def _compile(self, files: dict[str, list[Path]]) -> None:
+        """
+        Compiles the outdated ``files``, using the import graph of all of them.
+        """
+        if files:
+            CompilerHandler(
+                files=files,
+                compiler=self.compiler,
+                keep_builds=self.keep_builds,
+                jobs=self.jobs,
+                manifest=self.manifest,
+                graph=self.graph,
+            ).start()
+
+    def build(self) -> dict[str, list[Path]]:
+        """
+        Compiles the outdated modules.
+
+        :return: the valid files within each directory.
+        """
+        self.files = self._discover()
+        self.graph = ImportGraph(files=self.files)
+        self._compile(self.files)
+        return self.files
+
+    def _update_graph(self, modules: set[Path]) -> ImportGraph:
+        """
+        Updates the import graph with the changed ``modules``, the files are
+        rediscovered (and the graph rebuilt) only when a module was created
+        or deleted.
+        """
+        if self.graph is not None and all(
+            (module in self.graph.names) == module.is_file()
+            for module in modules
+            if module.suffix == ".py"
+        ):
+            self.graph.update(modules)
+            return self.graph
+        files = self._discover()
+        valid_files = {
+            Path(file).resolve()
+            for dir_files in files.values()
+            for file in dir_files
+        }
+        if self.graph is None or valid_files != set(self.graph.names):
+            self.files, self.graph = files, ImportGraph(files=files)
+        else:
+            self.graph.update(modules)
+        return self.graph
+
+    def rebuild(self, changed: set[Path]) -> set[Path]:
+        """
+        Recompiles the ``changed`` modules (or the modules of the changed
+        ``.pxd`` files) and their dependents.
+
+        :return: the changed modules, their dependents and the changed tests.
+        """
+        changed = {Path(file).resolve() for file in changed}
+        modules = {
+            file.with_suffix(".py") if file.suffix == ".pxd" else file
+            for file in changed
+        }
+        graph = self._update_graph(modules)
+        affected = graph.affected(modules & graph.names.keys())
+        affected_files = {
+            directory: [
+                file for file in dir_files if Path(file).resolve() in affected
+            ]
+            for directory, dir_files in self.files.items()
+        }
+        self._compile(
+            {
+                directory: dir_files
+                for directory, dir_files in affected_files.items()
+                if dir_files
+            }
+        )
+        return affected | {
+            file for file in changed if file.name.startswith("test_")
+        }
+
+    @staticmethod
+    def test_files(modules: set[Path]) -> dict[Path, list[str]]:
+        """
+        The existing ``test_<module>.py`` files of the ``modules``,
+        or the ``modules`` which are tests, within each directory.
+        """
+        test_files: dict[Path, set[str]] = defaultdict(set)
+        for module in modules:
+            name = (
+                module.name
+                if module.name.startswith("test_")
+                else (f"test_{module.name}")
+            )
+            if (module.parent / name).is_file():
+                test_files[module.parent].add(name)
+        return {
+            directory: sorted(names) for directory, names in test_files.items()
+        }
+
+    def start(self, rebuilds: Optional[int] = None) -> None:
+        """
+        Compiles the outdated modules and then watches for changes.
+
+        :param rebuilds: stop after a number of rebuilds, None to watch forever.
+        """
+        self.build()
+        watcher = create_watcher(self.input_path, polling=self.polling)
+        logger.warning(
+            "%sWatching: `%s` using: `%s`%s",
+            Colors.CYAN,
+            self.input_path,
+            type(watcher).__name__,
+            Colors.RESET,
+        )
+        try:
+            while rebuilds is None or rebuilds > 0:
+                changed = debounce(watcher, delay=self.delay)
+                logger.warning(
+                    "%sChanged: %s%s",
+                    Colors.CYAN,
+                    sorted(file.name for file in changed),
+                    Colors.RESET,
+                )
+                rebuilt = self.rebuild(changed)
+                if self.bench:
+                    for directory, names in self.test_files(rebuilt).items():
+                        Benchmark.test_bench(
+                            input_path=directory, test_files=names
+                        )
+                if rebuilds is not None:
+                    rebuilds -= 1
+        finally:
+            watcher.close()
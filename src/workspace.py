@@ -0,0 +1,154 @@
+"""
+Benchmark workspaces, cheap copies of the input directory.
+"""
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generator, Iterable
+
+from src.file_handler import DEFAULT_EXCLUDED_DIRS, name_matcher
+
+logger = logging.getLogger(__name__)
+
+# ioctl(2) request of Linux, clones the extents of a file (copy-on-write).
+FICLONE = 0x40049409
+
+
+@dataclass
+class WorkspaceStats:
+    """
+    How the files of a workspace were materialised.
+    """
+
+    reflinked: int = 0
+    hardlinked: int = 0
+    copied: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"reflinked: {self.reflinked}, hardlinked: {self.hardlinked}, "
+            f"copied: {self.copied}"
+        )
+
+
+class Workspace:
+    """
+    Workspace materialises the ``from_dir`` into a temp directory,
+    without copying the data of the files whenever it's possible:
+
+    * the files matching the ``copy_patterns`` (which are rewritten or deleted
+      within the workspace) are reflinked (copy-on-write) if the filesystem
+      supports it, otherwise copied.
+    * any other file is hardlinked if the temp directory is on the same
+      filesystem, otherwise reflinked or copied.
+
+    The ``excluded_dirs`` (``.git``, ``.venv``, ``__pycache__``, ...)
+    are skipped.
+
+    **NOTE** a hardlinked file shares its data with the original file,
+    any file which is written in place has to match the ``copy_patterns``.
+    ``decorate_functions`` replaces the files, it never writes in place.
+    example usage::
+        with Workspace(Path("./my_module")) as temp_dir:
+            ...
+    """
+
+    def __init__(
+        self,
+        from_dir: Path,
+        copy_patterns: Iterable[str] = ("*.py",),
+        excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+    ):
+        """
+        :param from_dir: the directory to be materialised.
+        :param copy_patterns: name patterns of the files which are modified.
+        :param excluded_dirs: name patterns of the directories to be skipped.
+        """
+        self.from_dir = Path(from_dir)
+        self.copy_patterns = list(copy_patterns)
+        self.excluded_dirs = frozenset(excluded_dirs)
+        self.stats = WorkspaceStats()
+        self._can_reflink = hasattr(fcntl, "ioctl")
+        self._can_hardlink = True
+        self._temp_dir: tempfile.TemporaryDirectory[str] | None = None
+
+    def _clone(self, source: str, target: str) -> None:
+        """
+        Reflinks the ``source`` file, or copies it.
+        """
+        if self._can_reflink:
+            try:
+                with open(source, "rb") as src, open(target, "wb") as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                shutil.copystat(source, target)
+                self.stats.reflinked += 1
+                return
+            except OSError as error:
+                logger.debug("Reflinks aren't supported: %s", error)
+                self._can_reflink = False
+        shutil.copy2(source, target)
+        self.stats.copied += 1
+
+    def _link(self, source: str, target: str) -> None:
+        """
+        Hardlinks the ``source`` file, or clones it.
+        """
+        if self._can_hardlink:
+            try:
+                os.link(source, target)
+                self.stats.hardlinked += 1
+                return
+            except OSError as error:
+                logger.debug("Hardlinks aren't supported: %s", error)
+                self._can_hardlink = False
+        self._clone(source, target)
+
+    def materialize(self, to_dir: Path) -> WorkspaceStats:
+        """
+        Materialises the ``from_dir`` files into the (existing) ``to_dir``.
+        """
+        is_excluded_dir = name_matcher(self.excluded_dirs)
+        is_copied = name_matcher(self.copy_patterns)
+        stack = [(str(self.from_dir), str(to_dir))]
+        while stack:
+            source_dir, target_dir = stack.pop()
+            with os.scandir(source_dir) as entries:
+                for entry in entries:
+                    target = os.path.join(target_dir, entry.name)
+                    if entry.is_dir():
+                        if not is_excluded_dir(entry.name):
+                            os.mkdir(target)
+                            stack.append((entry.path, target))
+                    elif not entry.is_file():
+                        continue
+                    elif is_copied(entry.name):
+                        self._clone(entry.path, target)
+                    else:
+                        self._link(entry.path, target)
+        logger.debug("Workspace of: `%s`, %s", self.from_dir, self.stats)
+        return self.stats
+
+    def __enter__(self) -> Path:
+        self._temp_dir = tempfile.TemporaryDirectory()
+        to_dir = Path(self._temp_dir.name)
+        self.materialize(to_dir)
+        return to_dir
+
+    def __exit__(self, *_: object) -> None:
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+
+
+@contextmanager
+def workspace(from_dir: Path) -> Generator[Path, None, None]:
+    """
+    Materialises all files at a temp directory.
+    """
+    with Workspace(from_dir=from_dir) as temp_dir:
+        yield temp_dir
@@ -1,21 +1,86 @@
 """
 Wrappers for  `Cython` and `Nuitka` compilers.
 """
+import logging
+import os
 import shutil
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from fnmatch import fnmatch
+from importlib import metadata
 from pathlib import Path
+from typing import Optional
+
+from src.helpers import run_sub_process
+
+logger = logging.getLogger(__name__)
+
+
+def package_version(name: str) -> str:
+    """
+    Installed version of the ``name`` distribution or ``unknown``.
+    """
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
 
 
 @dataclass(frozen=True)
 class CompilerCommands:  # pylint: disable=missing-class-docstring
     cython = "cythonize {} -3 --inplace"
     cython_bench = "cythonize {} -3 --inplace --quiet 2>/dev/null"
+    cython_in_process = "Cython.Build.cythonize({}, language_level=3) build_ext"
     nuitka = "python -m nuitka --module {}"
     nuitka_bench = "python -m nuitka --quiet --module {} 2>/dev/null"
+    nuitka_package = (
+        "python -m nuitka --module {0} --include-package={0.name} "
+        "--nofollow-import-to=*.test*"
+    )
+    nuitka_package_bench = (
+        "python -m nuitka --quiet --module {0} --include-package={0.name} "
+        "--nofollow-import-to=*.test* 2>/dev/null"
+    )
+
+
+# The named presets of the `cython` compiler directives, `default` keeps
+# the ones of `cython`, `fast` trades its runtime checks for speed.
+DIRECTIVE_PRESETS: dict[str, dict[str, bool]] = {
+    "default": {},
+    "safe": {
+        "boundscheck": True,
+        "wraparound": True,
+        "cdivision": False,
+        "initializedcheck": True,
+    },
+    "fast": {
+        "boundscheck": False,
+        "wraparound": False,
+        "cdivision": True,
+        "initializedcheck": False,
+        "infer_types": True,
+    },
+}
+DEFAULT_PRESET = "default"
+
+
+def directives_cmd(cmd: str, directives: dict[str, bool]) -> str:
+    """
+    The ``cython`` compile ``cmd`` with the ``directives``
+    after its file placeholder.
+    """
+    if not directives:
+        return cmd
+    values = ",".join(f"{name}={value}" for name, value in directives.items())
+    return cmd.replace("{}", f"{{}} -X {values}", 1)
 
 
 class CompilerWrapper(ABC):  # pylint: disable=missing-class-docstring
+    # Batch compilers build all the files of a directory at once using `build`,
+    # instead of running the `cmd` for each file.
+    batch = False
+
     @property
     @abstractmethod
     def cmd(self) -> str:  # pylint: disable=missing-function-docstring
@@ -35,6 +100,28 @@ class CompilerWrapper(ABC):  # pylint: disable=missing-class-docstring
     ) -> None:
         raise NotImplementedError("Each compiler should clean it's mess!")
 
+    @property
+    def version(self) -> str:
+        """
+        Version of the underlying compiler, any change of it
+        invalidates the previous builds.
+        """
+        return "unknown"
+
+    def build(self, files: list[Path]) -> None:
+        """
+        Builds all the ``files`` of a directory, the ``batch`` compilers
+        override it to build them at once.
+        """
+        run_sub_process(files=files, compile_cmd=self.cmd)
+
+    def sources(self, file_path: Path) -> list[Path]:
+        """
+        The source files which are compiled into the executable
+        of the ``file_path``, the ones deleted by ``--clean-source``.
+        """
+        return [file_path]
+
 
 class CythonWrapper(CompilerWrapper):
     """
@@ -45,8 +132,16 @@ class CythonWrapper(CompilerWrapper):
     https://cython.org/
     """
 
-    def __init__(self, cmd: str = CompilerCommands.cython):
-        self.cmd = cmd
+    def __init__(
+        self, cmd: str = CompilerCommands.cython, preset: str = DEFAULT_PRESET
+    ):
+        """
+        :param cmd: the ``cython`` command.
+        :param preset: the name of the compiler directives preset.
+        """
+        self.preset = preset
+        self.directives = DIRECTIVE_PRESETS[preset]
+        self.cmd = directives_cmd(cmd, self.directives)
 
     @property
     def cmd(self) -> str:
@@ -69,8 +164,14 @@ class CythonWrapper(CompilerWrapper):
         c_extension = file_path.with_suffix(".c")
         c_extension.unlink(missing_ok=True)
 
+    @property
+    def version(self) -> str:
+        return package_version("Cython")
+
     def __str__(self) -> str:
-        return "Cython"
+        if self.preset == DEFAULT_PRESET:
+            return "Cython"
+        return f"Cython ({self.preset})"
 
 
 class NuitkaWrapper(CompilerWrapper):
@@ -103,5 +204,135 @@ class NuitkaWrapper(CompilerWrapper):
         pyi_extension = file_path.with_suffix(".pyi")
         pyi_extension.unlink(missing_ok=True)
 
+    @property
+    def version(self) -> str:
+        return package_version("Nuitka")
+
     def __str__(self) -> str:
         return "Nuitka"
+
+
+class NuitkaPackageWrapper(NuitkaWrapper):
+    """
+    Compiles a whole package directory into a single extension module next to it,
+    following all of its modules except the tests, so ``Nuitka`` can optimize
+    the calls across them and only one extension is linked.
+    Once compiled, the modules of the package directory (see ``sources``) have
+    to be removed, otherwise it shadows the extension module with the same
+    import name.
+    The modules outside any package are compiled with the ``module_cmd``.
+    """
+
+    # The modules which aren't followed into the extension module,
+    # as the `--nofollow-import-to` of the command.
+    exclude_pattern = "*.test*"
+
+    def __init__(
+        self,
+        cmd: str = CompilerCommands.nuitka_package,
+        module_cmd: str = CompilerCommands.nuitka,
+    ):
+        super().__init__(cmd=cmd)
+        self.module_cmd = module_cmd
+
+    def sources(self, file_path: Path) -> list[Path]:
+        """
+        The ``.py`` files of the package directory which are followed into
+        its extension module, the tests and any other file are left.
+        """
+        file_path = Path(file_path)
+        if not file_path.is_dir():
+            return [file_path]
+        return [
+            file
+            for file in sorted(file_path.rglob("*.py"))
+            if not fnmatch(
+                ".".join(
+                    file.relative_to(file_path.parent).with_suffix("").parts
+                ),
+                self.exclude_pattern,
+            )
+        ]
+
+    def module_compiler(self) -> NuitkaWrapper:
+        """
+        The compiler for the modules outside any package.
+        """
+        return NuitkaWrapper(cmd=self.module_cmd)
+
+    def __str__(self) -> str:
+        return "Nuitka (package)"
+
+
+class CythonBuildWrapper(CythonWrapper):
+    """
+    Runs ``Cython`` within the pycompile process instead of a ``cythonize``
+    shell command per file, so the interpreter start up, the ``Cython`` import
+    and the ``setuptools`` bootstrap are paid once.
+    All the files of a directory are cythonized in a batch using the
+    ``nthreads`` of ``Cython``, and their C extensions are compiled in parallel
+    by ``build_ext``.
+    """
+
+    batch = True
+    # `setuptools` isn't thread safe, the parallelism comes from `nthreads`.
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        cmd: str = CompilerCommands.cython_in_process,
+        nthreads: Optional[int] = None,
+        quiet: bool = False,
+        preset: str = DEFAULT_PRESET,
+    ):
+        """
+        :param cmd: the description of the build, any change of it
+                    invalidates the previous builds.
+        :param nthreads: number of parallel jobs, defaults to the number of CPUs.
+        :param quiet: hide the ``Cython`` and the C compiler output.
+        :param preset: the name of the compiler directives preset.
+        """
+        super().__init__(cmd=cmd, preset=preset)
+        self.nthreads = nthreads or os.cpu_count() or 1
+        self.quiet = quiet
+
+    def build(self, files: list[Path]) -> None:
+        """
+        Cythonizes the ``files`` and builds their C extensions next to them.
+        """
+        # pylint: disable=import-outside-toplevel
+        from Cython.Build import cythonize
+        from setuptools import (  # type: ignore[import-untyped]
+            Distribution,
+            Extension,
+        )
+
+        files = [Path(file).absolute() for file in files]
+        directory = files[0].parent
+        nthreads = min(self.nthreads, len(files))
+        with self._lock:
+            try:
+                ext_modules = cythonize(  # type: ignore[no-untyped-call]
+                    [
+                        Extension(name=file.stem, sources=[str(file)])
+                        for file in files
+                    ],
+                    nthreads=nthreads if nthreads > 1 else 0,
+                    quiet=self.quiet,
+                    compiler_directives={
+                        "language_level": 3,
+                        **self.directives,
+                    },
+                )
+                distribution = Distribution({"ext_modules": ext_modules})
+                build_ext = distribution.get_command_obj("build_ext")
+                build_ext.build_lib = str(directory)
+                build_ext.build_temp = str(directory / "build")
+                build_ext.parallel = nthreads
+                build_ext.ensure_finalized()
+                build_ext.run()
+            except Exception as error:  # pylint: disable=broad-except
+                logger.error("Failed to build: `%s`, %s", directory, error)
+
+    def __str__(self) -> str:
+        return "Cython (in-process)"
@@ -2,9 +2,12 @@
 Common pytest fixtures.
 """
 from pathlib import Path
+from typing import Callable
 
 import pytest
 
+from src.isolated import IsolatedRun
+
 
 @pytest.fixture
 def sample_python_file_fixture(tmp_path: Path) -> Path:
@@ -107,3 +110,76 @@ def sample_nuitka_build_fixture(sample_python_file_fixture: Path) -> Path:
     build_dir_path.mkdir(parents=True, exist_ok=False)
     assert len(list(sample_folder_path.iterdir())) == 4
     return sample_folder_path
+
+
+@pytest.fixture
+def sample_package_fixture(tmp_path: Path) -> Path:
+    """
+    Pytest fixture to create a sample project with a package,
+    a sub-package and a module outside any package,
+    and return's the project folder path.
+    """
+    project_folder = tmp_path / "project"
+    sub_package = project_folder / "sample_pkg" / "sub"
+    sub_package.mkdir(parents=True)
+    (project_folder / "sample_pkg" / "__init__.py").touch()
+    (sub_package / "__init__.py").touch()
+    (project_folder / "sample_pkg" / "first.py").write_text(
+        "def first():\n    return 1\n"
+    )
+    (sub_package / "second.py").write_text(
+        "from sample_pkg.first import first\n\n\n"
+        "def second():\n    return first() + 1\n"
+    )
+    (project_folder / "loose.py").write_text("def loose():\n    return 3\n")
+    return project_folder
+
+
+@pytest.fixture
+def sample_project_fixture(tmp_path: Path) -> Callable[[dict[str, str]], Path]:
+    """
+    Pytest fixture to create a sample project folder with the given files
+    (the content of each file name) and return's the project folder path.
+    """
+
+    def create(files: dict[str, str]) -> Path:
+        project_folder = tmp_path / "project"
+        project_folder.mkdir()
+        for name, content in files.items():
+            (project_folder / name).write_text(content)
+        return project_folder
+
+    return create
+
+
+@pytest.fixture
+def sample_cpu_run_fixture() -> Callable[[str, dict[str, float]], IsolatedRun]:
+    """
+    Pytest fixture to create the passed cpu run of an engine with the mean
+    time of each test, and the rest of its statistics around the mean.
+    """
+
+    def create(engine: str, means: dict[str, float]) -> IsolatedRun:
+        return IsolatedRun(
+            engine=engine,
+            bench_type="cpu",
+            returncode=0,
+            tests={
+                test: {
+                    "outcome": "passed",
+                    "duration": mean * 10,
+                    "min": mean / 2,
+                    "max": mean * 2,
+                    "mean": mean,
+                    "median": mean,
+                    "stddev": 0.0,
+                    "rounds": 10,
+                    "data": [
+                        mean * (0.91 + 0.02 * index) for index in range(10)
+                    ],
+                }
+                for test, mean in means.items()
+            },
+        )
+
+    return create
@@ -5,7 +5,14 @@ using `Cython` and `Nuitka`.
 
 import logging
 
-from src import CompilerHandler, CythonWrapper, NuitkaWrapper
+from src import (
+    CompilerHandler,
+    CythonBuildWrapper,
+    CythonWrapper,
+    FileHandler,
+    NuitkaPackageWrapper,
+    NuitkaWrapper,
+)
 
 
 def test_compiler_handler_compiles_using_cython_without_clean_source_and_keep_builds(
@@ -284,3 +291,86 @@ def test_compiler_handler_compiles_using_nuitka_with_keep_builds_and_without_cle
     assert build_folder.is_dir()
     temp_build_file = sample_folder / "hello.pyi"
     assert temp_build_file.is_file()
+
+
+def test_compiler_handler_compiles_using_cython_in_parallel(
+    sample_python_file_fixture,
+):
+    """
+    Given some `.py` files within a directory
+    When we invoke the `start` from `CompilerHandler`
+         using `Cython` as a compiler with multiple jobs
+    Then we expect an executable for each file and the builds to be cleaned.
+    """
+    # Given
+    sample_folder = sample_python_file_fixture
+    (sample_folder / "world.py").write_text("print('Im another module')")
+    (sample_folder / "again.py").write_text("print('Im yet another module')")
+    # When
+    compiler_handler = CompilerHandler(
+        files={str(sample_folder): list(sample_folder.iterdir())},
+        compiler=CythonWrapper(),
+        clean_source=True,
+        keep_builds=False,
+        jobs=3,
+    )
+    compiler_handler.start()
+    # Then
+    assert len(list(sample_folder.glob("*.so"))) == 3
+    assert len(list(sample_folder.iterdir())) == 3
+
+
+def test_compiler_handler_compiles_using_cython_in_process(
+    sample_python_file_fixture,
+):
+    """
+    Given some `.py` files within a directory
+    When we invoke the `start` from `CompilerHandler`
+         using the in-process `Cython` as a compiler
+    Then we expect an executable for each file and the builds to be cleaned.
+    """
+    # Given
+    sample_folder = sample_python_file_fixture
+    (sample_folder / "world.py").write_text("print('Im another module')")
+    # When
+    compiler_handler = CompilerHandler(
+        files={str(sample_folder): list(sample_folder.iterdir())},
+        compiler=CythonBuildWrapper(nthreads=2, quiet=True),
+        clean_source=False,
+        keep_builds=False,
+    )
+    compiler_handler.start()
+    # Then
+    assert len(list(sample_folder.glob("*.so"))) == 2
+    assert len(list(sample_folder.iterdir())) == 4
+    assert not (sample_folder / "build").is_dir()
+
+
+def test_compiler_handler_compiles_a_whole_package_using_nuitka(
+    sample_package_fixture,
+):
+    """
+    Given a project with a package
+    When we invoke the `start_compiling`  from `CompilerHandler`
+         using the `NuitkaPackageWrapper` for its packages
+         and clean_source=True  and keep_builds=False
+    Then we expect a single executable for the whole package
+         instead of the package directory.
+    """
+    # Given
+    project_folder = sample_package_fixture.resolve()
+    file_handler = FileHandler(input_path=project_folder)
+    packages, _ = file_handler.split_packages(file_handler.start())
+    # When
+    compiler_handler = CompilerHandler(
+        files=packages,
+        compiler=NuitkaPackageWrapper(),
+        clean_source=True,
+        keep_builds=False,
+    )
+    compiler_handler.start()
+    # Then
+    assert not (project_folder / "sample_pkg").exists()
+    assert not (project_folder / "sample_pkg.build").exists()
+    assert len(list(project_folder.glob("sample_pkg*.so"))) == 1
+    assert (project_folder / "loose.py").is_file()
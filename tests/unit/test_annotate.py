@@ -0,0 +1,115 @@
+"""
+Test cases for the Cython annotation reports
+"""
+import json
+from pathlib import Path
+
+from src.annotate import (
+    LineScore,
+    annotate_from_options,
+    enclosing_functions,
+    parse_annotation,
+    rank_functions,
+    rank_lines,
+)
+from src.hot_modules import PROFILE_FILE
+from src.manifest import MANIFEST_DIR, file_hash
+
+MODULE = "src.annotate"
+
+
+# A module with a python-heavy function and a class.
+PROJECT_FILES = {
+    "shapes.py": (
+        "def total(values):\n"
+        "    return sum([value * 2 for value in values])\n\n\n"
+        "class Square:\n"
+        "    def area(self, side):\n"
+        "        return side * side\n"
+    ),
+}
+
+
+def test_parse_annotation():
+    """
+    Given the lines of a `cython -a` report
+    When we parse it
+    Then we expect the score and the code of each line.
+    """
+    report = (
+        '<pre class="cython line score-12" onclick="f()">+<span class="">01'
+        '</span>: <span class="k">def</span> <span class="nf">f</span>(a):'
+        "</pre>\n"
+        '<pre class="cython line score-0">&#xA0;<span class="">02</span>: '
+        '<span class="s">&quot;x&quot;</span></pre>\n'
+    )
+    assert parse_annotation(report) == {1: (12, "def f(a):"), 2: (0, '"x"')}
+
+
+def test_enclosing_functions(sample_project_fixture):
+    """
+    Given a module with a function and a method
+    When we map its lines to their functions
+    Then we expect the qualified names, the class body left out.
+    """
+    project = sample_project_fixture(PROJECT_FILES)
+    functions = enclosing_functions((project / "shapes.py").read_text())
+    assert functions[2] == "total"
+    assert functions[7] == "Square.area"
+    assert 5 not in functions
+
+
+def test_rank_by_weighted_score():
+    """
+    Given a heavy line which never runs and a lighter hot one
+    When we rank them with a profile
+    Then we expect the hot one first, and the heavy one first without it.
+    """
+    cold = LineScore(Path("a.py"), 1, score=40, code="", function="f")
+    hot = LineScore(Path("a.py"), 5, score=5, code="", function="g")
+    hot.seconds = 1.0
+    assert rank_lines([cold, hot], weighted=True) == [hot, cold]
+    assert rank_lines([cold, hot], weighted=False) == [cold, hot]
+    assert rank_functions([cold, hot], weighted=True) == [
+        ("a.g", 5, 1.0, 5.0),
+        ("a.f", 40, 0.0, 0.0),
+    ]
+
+
+def test_annotate_from_options(sample_project_fixture):
+    """
+    Given a module and a saved profile of its lines
+    When we annotate it
+    Then we expect its HTML report to be kept,
+    and its lines to be scored and weighted by the profile.
+    """
+    # Given
+    project = sample_project_fixture(PROJECT_FILES)
+    profile = project / MANIFEST_DIR / PROFILE_FILE
+    profile.parent.mkdir()
+    profile.write_text(
+        json.dumps(
+            {
+                "modules": {
+                    "shapes.py": {
+                        "source_hash": file_hash(project / "shapes.py"),
+                        "lines": {"2": 0.5},
+                    }
+                }
+            }
+        )
+    )
+    # When
+    scores = annotate_from_options(
+        project, {str(project): [project / "shapes.py"]}, annotate=True
+    )
+    # Then
+    assert (project / MANIFEST_DIR / "annotate" / "shapes.html").is_file()
+    by_line = {score.line: score for score in scores}
+    assert by_line[2].function == "total"
+    assert by_line[2].score > 0
+    assert by_line[2].seconds == 0.5
+    assert by_line[7].function == "Square.area"
+    assert not annotate_from_options(
+        project, {str(project): [project / "shapes.py"]}, annotate=False
+    )
@@ -2,21 +2,24 @@
 Test cases for the `Benchmark`
 """
 import logging
+import os
 from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 
 from src import CythonWrapper, NuitkaWrapper
-from src.benchmark import Benchmark
+from src.benchmark import Benchmark, isolated_core_sets
+from src.isolated import IsolatedRun
+from src.stats import SamplingOptions
 
 MODULE = "src.benchmark"
 
 
-@patch(MODULE + ".run_pytest")
+@patch(MODULE + ".run_isolated")
 @patch(MODULE + ".decorate_functions")
 def test_benchmark_run_cpu_bench(
     mocked_decorate_functions,
-    mocked_run_pytest,
+    mocked_run_isolated,
     sample_python_file_with_test_fixture,
     caplog,
 ):
@@ -24,7 +27,7 @@ def test_benchmark_run_cpu_bench(
     Given one `.py` file with a  test file within a directory
     When we invoke the `cpu_bench` from `Benchmark`
     Then we expect to see the `cpu_bench` in the logs,
-    the `decorate_functions` and the run_pytest to be called once.
+    the `decorate_functions` and the run_isolated to be called once.
     """
     # Given
     caplog.clear()
@@ -36,14 +39,14 @@ def test_benchmark_run_cpu_bench(
     # Then
     assert "CPU benchmark using:`python`" in caplog.text
     mocked_decorate_functions.assert_called_once()
-    mocked_run_pytest.assert_called_once()
+    mocked_run_isolated.assert_called_once()
 
 
-@patch(MODULE + ".run_pytest")
+@patch(MODULE + ".run_isolated")
 @patch(MODULE + ".decorate_functions")
 def test_benchmark_run_memory_bench(
     mocked_decorate_functions,
-    mocked_run_pytest,
+    mocked_run_isolated,
     sample_python_file_with_test_fixture,
     caplog,
 ):
@@ -51,7 +54,7 @@ def test_benchmark_run_memory_bench(
     Given one `.py` file with a  test file within a directory
     When we invoke the `mem_bench` from `Benchmark`
     Then we expect to see the `mem_bench` in the logs,
-    the `decore_functions` and the `run_pytest` be called once
+    the `decore_functions` and the `run_isolated` be called once
     """
     # Given
     caplog.clear()
@@ -65,7 +68,7 @@ def test_benchmark_run_memory_bench(
     # Then
     assert "Memory benchmark using:`python`" in caplog.text
     mocked_decorate_functions.assert_called_once()
-    mocked_run_pytest.assert_called_once()
+    mocked_run_isolated.assert_called_once()
 
 
 def test_benchmark_start_with_bench_type_both_and_without_compiling(
@@ -214,3 +217,158 @@ def test_benchmark_start_with_bench_type_cpu_only(
         expected_cpu_bench_calls, any_order=True
     )
     benchmark.mem_bench.assert_not_called()
+
+
+@patch(MODULE + "._physical_cores", return_value=[[0, 2], [1, 3]])
+@patch(MODULE + ".os.sched_getaffinity", return_value={0, 1, 2, 3})
+def test_isolated_core_sets(*_):
+    """
+    Given two physical cores with two logical cpus each
+    Then we expect a cpu of a distinct core for up to two engines.
+    """
+    assert isolated_core_sets(engines=2) == [{0}, {1}]
+    assert isolated_core_sets(engines=3) is None
+
+
+@patch(MODULE + ".isolated_core_sets", return_value=None)
+def test_benchmark_start_concurrent_without_enough_cores(
+    _, sample_python_file_with_test_fixture, caplog
+):
+    """
+    Given not enough isolated cores
+    When we invoke the `start` method with `concurrent`
+    Then we expect the benchmarks to run one by one.
+    """
+    benchmark = Benchmark(input_path=sample_python_file_with_test_fixture)
+    benchmark._bench = MagicMock()
+    benchmark._compile = MagicMock()
+    benchmark.start(
+        bench_type="cpu", compilers=[CythonWrapper()], concurrent=True
+    )
+    assert "Not enough isolated cores" in caplog.text
+    assert benchmark._bench.call_count == 2
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "sched_setaffinity"), reason="requires cpu affinity"
+)
+@patch(MODULE + ".isolated_core_sets")
+def test_benchmark_start_concurrent(
+    mocked_core_sets, sample_python_file_with_test_fixture, capsys
+):
+    """
+    Given an isolated core for each engine
+    When we invoke the `start` method with `concurrent`
+    Then we expect each engine to be compiled and benchmarked
+         within its own pinned process, reporting their output in order.
+    """
+    # Given
+    cpu = min(os.sched_getaffinity(0))
+    mocked_core_sets.return_value = [{cpu}, {cpu}, {cpu}]
+    benchmark = Benchmark(input_path=sample_python_file_with_test_fixture)
+    benchmark._compile = MagicMock()
+
+    def bench(bench_type, input_path, prof_func_name, engine):
+        print(f"{engine}: {bench_type} on {sorted(os.sched_getaffinity(0))}")
+        return []
+
+    benchmark._bench = bench
+    # When
+    benchmark.start(
+        bench_type="cpu",
+        compilers=[CythonWrapper(), NuitkaWrapper()],
+        concurrent=True,
+    )
+    # Then
+    assert benchmark._compile.call_count == 2
+    output = capsys.readouterr().out
+    assert f"Cython: cpu on [{cpu}]" in output
+    assert output.index("Cython: cpu") < output.index("Nuitka: cpu")
+
+
+@patch(MODULE + ".run_isolated")
+def test_benchmark_resample_the_noisy_tests(mocked_run_isolated, tmp_path):
+    """
+    Given a cpu run with a noisy and a stable test
+    When we resample it
+    Then we expect only the noisy test to be rerun, with twice the rounds,
+    until its confidence interval is within the target.
+    """
+    # Given
+    run = IsolatedRun(
+        engine="Cython",
+        bench_type="cpu",
+        returncode=0,
+        tests={
+            "test_a.py::test_a": {"outcome": "passed", "data": [1.0, 2.0, 3.0]},
+            "test_b.py::test_b": {"outcome": "passed", "data": [1.0, 1.0, 1.0]},
+        },
+    )
+    mocked_run_isolated.return_value = IsolatedRun(
+        engine="Cython",
+        bench_type="cpu",
+        returncode=0,
+        tests={"test_a.py::test_a": {"outcome": "passed", "data": [2.0] * 200}},
+    )
+    # When
+    resampled = Benchmark._resample(
+        run, tmp_path, SamplingOptions(min_rounds=5, target_ci=5)
+    )
+    # Then
+    mocked_run_isolated.assert_called_once()
+    args = mocked_run_isolated.call_args.kwargs["args"]
+    assert "--benchmark-min-rounds=10" in args
+    assert args[-1] == "test_a.py::test_a"
+    assert resampled.tests["test_a.py::test_a"]["rounds"] == 203
+    assert resampled.tests["test_b.py::test_b"]["data"] == [1.0, 1.0, 1.0]
+
+
+@patch(MODULE + ".run_isolated")
+def test_benchmark_start_with_the_rss_memory_backend(
+    mocked_run_isolated, sample_python_file_with_test_fixture
+):
+    """
+    Given a `Benchmark` with the `rss` memory backend
+    When we invoke the `start` method for the memory benchmark
+    Then we expect the unmodified tests to be run while sampling their memory.
+    """
+    # Given
+    benchmark = Benchmark(
+        input_path=sample_python_file_with_test_fixture,
+        memory_backend="rss",
+        sample_interval=0.05,
+    )
+    # When
+    with patch(MODULE + ".decorate_functions") as mocked_decorate_functions:
+        benchmark.start(bench_type="memory", compilers=[])
+    # Then
+    mocked_decorate_functions.assert_not_called()
+    assert mocked_run_isolated.call_args.kwargs["sample_interval"] == 0.05
+    assert mocked_run_isolated.call_args.kwargs["bench_type"] == "memory"
+    assert len(benchmark.runs) == 1
+
+
+@patch(MODULE + ".run_isolated")
+def test_benchmark_start_with_the_tracemalloc_memory_backend(
+    mocked_run_isolated, sample_python_file_with_test_fixture
+):
+    """
+    Given a `Benchmark` with the `tracemalloc` memory backend
+    When we invoke the `start` method for the memory benchmark
+    Then we expect the unmodified tests to be run while tracing
+    their allocations.
+    """
+    # Given
+    benchmark = Benchmark(
+        input_path=sample_python_file_with_test_fixture,
+        memory_backend="tracemalloc",
+    )
+    # When
+    with patch(MODULE + ".decorate_functions") as mocked_decorate_functions:
+        benchmark.start(bench_type="memory", compilers=[])
+    # Then
+    mocked_decorate_functions.assert_not_called()
+    assert "--pycompile-tracemalloc=10" in (
+        mocked_run_isolated.call_args.kwargs["args"]
+    )
+    assert mocked_run_isolated.call_args.kwargs["bench_type"] == "memory"
@@ -0,0 +1,166 @@
+"""
+Test cases for the `ArtifactCache`
+"""
+import os
+from unittest.mock import patch
+
+from src.cache import ArtifactCache, cache_from_options
+from src.ccache import launcher_from_options
+from src.manifest import python_abi
+from tests.fakes import FakeCompilerWrapper
+
+
+def _build(python_file, content=b"binary"):
+    """
+    Fakes a successful compile of the `python_file`.
+    """
+    executable = python_file.with_name(python_file.stem + python_abi())
+    executable.write_bytes(content)
+    return executable
+
+
+def test_cache_restores_stored_executables(
+    sample_python_file_fixture, tmp_path
+):
+    """
+    Given an executable stored within the cache
+    When we restore it for a module with the same source in another directory
+    Then we expect a cache hit and the same executable.
+    """
+    # Given
+    cache = ArtifactCache(cache_dir=tmp_path / "cache")
+    compiler = FakeCompilerWrapper()
+    python_file = sample_python_file_fixture / "hello.py"
+    assert not cache.restore(python_file, compiler)
+    _build(python_file)
+    cache.store(python_file, compiler)
+    other_dir = tmp_path / "other"
+    other_dir.mkdir()
+    other_file = other_dir / "hello.py"
+    other_file.write_text(python_file.read_text())
+    # When
+    restored = cache.restore(other_file, compiler)
+    # Then
+    assert restored
+    assert (other_dir / f"hello{python_abi()}").read_bytes() == b"binary"
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_cache_misses_on_different_inputs(sample_python_file_fixture, tmp_path):
+    """
+    Given a stored executable
+    When the source, the module name or the compiler command changes
+    Then we expect a cache miss.
+    """
+    # Given
+    cache = ArtifactCache(cache_dir=tmp_path / "cache")
+    compiler = FakeCompilerWrapper()
+    python_file = sample_python_file_fixture / "hello.py"
+    _build(python_file)
+    cache.store(python_file, compiler)
+    renamed_file = python_file.with_name("renamed.py")
+    renamed_file.write_text(python_file.read_text())
+    # When/Then
+    assert not cache.restore(renamed_file, compiler)
+    compiler.cmd = "stat -L {}"
+    assert not cache.restore(python_file, compiler)
+    compiler.cmd = "stat {}"
+    python_file.write_text("print('changed')")
+    assert not cache.restore(python_file, compiler)
+    assert cache.stats.misses == 3
+
+
+def test_cache_evicts_least_recently_used(sample_python_file_fixture, tmp_path):
+    """
+    Given two stored executables, where the oldest was used recently
+    When the cache grows over its maximum size
+    Then we expect the least recently used executable to be evicted.
+    """
+    # Given
+    cache = ArtifactCache(cache_dir=tmp_path / "cache", max_size=10)
+    compiler = FakeCompilerWrapper()
+    first_file = sample_python_file_fixture / "hello.py"
+    second_file = sample_python_file_fixture / "world.py"
+    second_file.write_text("print('world')")
+    _build(first_file, content=b"0" * 8)
+    cache.store(first_file, compiler)
+    _build(second_file, content=b"1" * 8)
+    cache.store(second_file, compiler)
+    first_entry = cache._entry(cache.key(first_file, compiler))
+    second_entry = cache._entry(cache.key(second_file, compiler))
+    os.utime(first_entry, (1, 1))
+    os.utime(second_entry, (0, 0))
+    # When
+    cache.evict()
+    # Then
+    assert first_entry.is_dir()
+    assert not second_entry.is_dir()
+    assert cache.stats.evictions == 1
+
+
+def test_cache_evicts_only_its_own_entries(
+    sample_python_file_fixture, tmp_path
+):
+    """
+    Given a stored executable and the built-in C compiler launcher
+    (its objects and its compiler shim) within the cache directory
+    When the cache grows over its maximum size
+    Then we expect only the executable to be evicted.
+    """
+    # Given
+    cache = ArtifactCache(cache_dir=tmp_path / "cache", max_size=1)
+    compiler = FakeCompilerWrapper()
+    python_file = sample_python_file_fixture / "hello.py"
+    _build(python_file)
+    cache.store(python_file, compiler)
+    with patch("src.ccache.shutil.which", return_value=None):
+        launcher = launcher_from_options(
+            cc_cache=True, cache_dir=str(cache.cache_dir)
+        )
+    shim = launcher.cache_dir / "bin" / "gcc"
+    shim.parent.mkdir(parents=True)
+    shim.write_text("#!/bin/sh\n")
+    cached_object = launcher.cache_dir / "ab" / "abcdef"
+    cached_object.parent.mkdir()
+    cached_object.write_bytes(b"object")
+    # When
+    cache.evict()
+    # Then
+    assert not cache._entry(cache.key(python_file, compiler)).is_dir()
+    assert shim.is_file()
+    assert cached_object.is_file()
+    assert cache.stats.evictions == 1
+
+
+def test_cache_detach_removes_hard_linked_executables(
+    sample_python_file_fixture, tmp_path
+):
+    """
+    Given an executable restored from the cache
+    When we detach it before recompiling
+    Then we expect it to be removed and the cached executable to be intact.
+    """
+    # Given
+    cache = ArtifactCache(cache_dir=tmp_path / "cache")
+    compiler = FakeCompilerWrapper()
+    python_file = sample_python_file_fixture / "hello.py"
+    executable = _build(python_file)
+    cache.store(python_file, compiler)
+    # When
+    cache.detach(python_file)
+    # Then
+    assert not executable.exists()
+    assert cache.restore(python_file, compiler)
+    assert executable.read_bytes() == b"binary"
+
+
+def test_cache_from_options(tmp_path):
+    """
+    Given the cli options
+    Then we expect the cache to be enabled only with a `cache_dir`.
+    """
+    assert cache_from_options(cache_dir=None, cache_size=1) is None
+    cache = cache_from_options(cache_dir=str(tmp_path), cache_size=2)
+    assert cache.cache_dir == tmp_path
+    assert cache.max_size == 2 * 1024 * 1024
@@ -0,0 +1,148 @@
+"""
+Test cases for the `CompilerLauncher` and the built-in launcher
+"""
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from src.ccache import (
+    CACHE_DIR_ENV,
+    CC_CACHE_SUBDIR,
+    HIT,
+    MISS,
+    STATS_ENV,
+    CompilerLauncher,
+    LauncherStats,
+    launcher_from_options,
+    main,
+)
+
+MODULE = "src.ccache"
+
+
+@pytest.fixture(name="c_source")
+def c_source_fixture(tmp_path, monkeypatch):
+    """
+    A `C` source file and the built-in launcher environment.
+    """
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.setenv(STATS_ENV, str(tmp_path / "stats.log"))
+    source = tmp_path / "hello.c"
+    source.write_text("int hello(void) { return 42; }\n")
+    return source
+
+
+@pytest.mark.skipif(not shutil.which("cc"), reason="requires a C compiler")
+def test_launcher_restores_identical_objects(c_source, tmp_path):
+    """
+    Given a compiled `C` source
+    When we compile the same source again
+    Then we expect a cache hit with the same object file.
+    """
+    # Given
+    output = tmp_path / "hello.o"
+    args = ["cc", "-O2", "-c", str(c_source), "-o", str(output)]
+    assert main(args) == 0
+    first_object = output.read_bytes()
+    output.unlink()
+    # When
+    return_code = main(args)
+    # Then
+    assert return_code == 0
+    assert output.read_bytes() == first_object
+    stats = LauncherStats.from_stats_log(tmp_path / "stats.log")
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+@pytest.mark.skipif(not shutil.which("cc"), reason="requires a C compiler")
+def test_launcher_misses_on_different_flags(c_source, tmp_path):
+    """
+    Given a compiled `C` source
+    When we compile it with different flags
+    Then we expect a cache miss.
+    """
+    output = tmp_path / "hello.o"
+    assert main(["cc", "-O2", "-c", str(c_source), "-o", str(output)]) == 0
+    assert main(["cc", "-O0", "-c", str(c_source), "-o", str(output)]) == 0
+    stats = LauncherStats.from_stats_log(tmp_path / "stats.log")
+    assert (stats.hits, stats.misses) == (0, 2)
+
+
+@pytest.mark.skipif(not shutil.which("cc"), reason="requires a C compiler")
+def test_launcher_misses_on_a_moved_source(c_source, tmp_path):
+    """
+    Given a `C` source compiled with debug info
+    When we compile an identical copy of it from another path
+    Then we expect a cache miss, its debug info refers to the new path.
+    """
+    output = tmp_path / "hello.o"
+    moved = tmp_path / "moved" / "hello.c"
+    moved.parent.mkdir()
+    shutil.copy(c_source, moved)
+    assert main(["cc", "-g", "-c", str(c_source), "-o", str(output)]) == 0
+    assert main(["cc", "-g", "-c", str(moved), "-o", str(output)]) == 0
+    assert str(moved).encode() in output.read_bytes()
+    stats = LauncherStats.from_stats_log(tmp_path / "stats.log")
+    assert (stats.hits, stats.misses) == (0, 2)
+
+
+@patch(MODULE + ".subprocess.run")
+def test_launcher_runs_the_link_jobs(mock_run, tmp_path):
+    """
+    Given a link job
+    When we run it through the launcher
+    Then we expect the compiler to be run as is, without any cache lookup.
+    """
+    mock_run.return_value.returncode = 0
+    args = ["cc", "-shared", "hello.o", "-o", str(tmp_path / "hello.so")]
+    assert main(args) == 0
+    mock_run.assert_called_once_with(args, check=False)
+
+
+def test_launcher_stats_from_stats_log(tmp_path):
+    """
+    Given a `ccache` stats log
+    Then we expect only the hits and the misses to be counted.
+    """
+    stats_log = tmp_path / "stats.log"
+    stats_log.write_text(
+        "\n".join(
+            ["# 2026-01-01", HIT, "direct_cache_hit", "direct_cache_miss", MISS]
+        )
+    )
+    stats = LauncherStats.from_stats_log(stats_log)
+    assert (stats.hits, stats.misses) == (2, 1)
+    assert str(stats) == "hits: 2, misses: 1 (66.7% hit rate)"
+
+
+def test_builtin_launcher_activate(tmp_path, monkeypatch):
+    """
+    Given the built-in launcher
+    When we activate it
+    Then we expect `CC` to be an executable named after the compiler,
+         which is restored afterwards.
+    """
+    monkeypatch.setenv("CC", "gcc")
+    launcher = CompilerLauncher(cache_dir=tmp_path)
+    with launcher.activate():
+        shim = tmp_path / "bin" / "gcc"
+        assert os.environ["CC"] == str(shim)
+        assert os.access(shim, os.X_OK)
+        assert os.environ[CACHE_DIR_ENV] == str(tmp_path)
+    assert os.environ["CC"] == "gcc"
+    assert CACHE_DIR_ENV not in os.environ
+    assert launcher.stats.hits == launcher.stats.misses == 0
+
+
+@patch(MODULE + ".shutil.which", return_value=None)
+def test_launcher_from_options(_, tmp_path):
+    """
+    Given the cli options without any `ccache` installed
+    Then we expect the built-in launcher within the cache directory.
+    """
+    assert launcher_from_options(cc_cache=False) is None
+    launcher = launcher_from_options(cc_cache=True, cache_dir=str(tmp_path))
+    assert launcher.binary is None
+    assert launcher.cache_dir == tmp_path / CC_CACHE_SUBDIR
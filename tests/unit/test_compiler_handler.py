@@ -2,11 +2,13 @@
 Test cases for the `CompilerHandler`
 """
 import logging
+import os
+import threading
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from src import CompilerHandler
+from src import CompilerHandler, NuitkaPackageWrapper
 from tests.fakes import FakeCompilerWrapper
 
 MODULE = "src.compiler_handler"
@@ -192,6 +194,33 @@ def test_clean_source_files(sample_files_fixture, caplog):
     assert "Flag `--clean-source` is on" in caplog.text
 
 
+def test_clean_source_files_of_a_package(sample_package_fixture):
+    """
+    Given a package with its tests and a data file
+    When we clean its sources after compiling it with `--package-mode`
+    Then we expect only its compiled modules to be deleted.
+    """
+    # Given
+    package = sample_package_fixture / "sample_pkg"
+    (package / "tests").mkdir()
+    (package / "tests" / "__init__.py").touch()
+    (package / "tests" / "test_first.py").write_text(
+        "def test_first():\n    pass\n"
+    )
+    (package / "data.json").write_text("{}")
+    compiler_handler = CompilerHandler(
+        files={str(sample_package_fixture): [package]},
+        compiler=NuitkaPackageWrapper(),
+        clean_source=True,
+    )
+    # When
+    compiler_handler._clean_source_files(files=[package])
+    # Then
+    assert sorted(
+        file.relative_to(package).as_posix() for file in package.rglob("*")
+    ) == ["data.json", "tests", "tests/__init__.py", "tests/test_first.py"]
+
+
 def test_clean_build_files(sample_files_fixture, caplog):
     """
     Given a list of file paths
@@ -222,3 +251,327 @@ def test_clean_build_files(sample_files_fixture, caplog):
         file_path=dir_files["fake_path"][0]
     )
     assert "-keep-builds` is off" in caplog.text
+
+
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_runs_each_file_in_parallel(
+    mocked_run_sub_process, tmp_path
+):
+    """
+    Given a `CompilerHandler` instance with `jobs=4` and files within
+    two directories,
+    When we call the `start` method
+    Then we expect the `run_sub_process` to be called once per file and
+    the `_clean_build_files` once per directory with all of its files.
+    """
+    # Given
+    dir_files = {
+        str(tmp_path / "first"): [
+            tmp_path / "first" / f"{i}.py" for i in range(3)
+        ],
+        str(tmp_path / "second"): [tmp_path / "second" / "0.py"],
+    }
+    fake_compiler = FakeCompilerWrapper()
+    compiler_handler = CompilerHandler(
+        files=dir_files,
+        compiler=fake_compiler,
+        clean_source=False,
+        keep_builds=False,
+        jobs=4,
+    )
+    compiler_handler._clean_build_files = MagicMock()
+    # When
+    compiler_handler.start()
+    # Then
+    assert mocked_run_sub_process.call_count == 4
+    for dir_name, files in dir_files.items():
+        for file in files:
+            mocked_run_sub_process.assert_any_call(
+                files=[file], compile_cmd=fake_compiler.cmd
+            )
+        compiler_handler._clean_build_files.assert_any_call(files=files)
+    assert compiler_handler._clean_build_files.call_count == 2
+
+
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_cleans_directory_even_if_a_file_fails(
+    mocked_run_sub_process, sample_python_file_fixture
+):
+    """
+    Given a `CompilerHandler` instance where the compiler fails for a file
+    When we call the `start` method
+    Then we expect the directory cleanup to run and the error to be raised.
+    """
+    # Given
+    mocked_run_sub_process.side_effect = [None, RuntimeError("boom")]
+    sample_folder = sample_python_file_fixture
+    dir_files = {sample_folder: ["first_file", "second_file"]}
+    compiler_handler = CompilerHandler(
+        files=dir_files,
+        compiler=FakeCompilerWrapper(),
+        clean_source=True,
+        keep_builds=True,
+        jobs=1,
+    )
+    compiler_handler._clean_source_files = MagicMock()
+    # When/Then
+    with pytest.raises(RuntimeError):
+        compiler_handler.start()
+    compiler_handler._clean_source_files.assert_called_once_with(
+        files=dir_files[sample_folder]
+    )
+
+
+def test_compiler_handler_defaults_jobs_to_cpu_count():
+    """
+    Given a `CompilerHandler` instance without `jobs`
+    Then we expect `jobs` to be the number of CPUs.
+    """
+    compiler_handler = CompilerHandler(files={}, compiler=FakeCompilerWrapper())
+    assert compiler_handler.jobs == (os.cpu_count() or 1)
+
+
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_skips_up_to_date_files(
+    mocked_run_sub_process, sample_python_file_fixture
+):
+    """
+    Given a `CompilerHandler` instance with a `manifest`
+    When we call the `start` method
+    Then we expect only the outdated files to be compiled and recorded.
+    """
+    # Given
+    sample_folder = sample_python_file_fixture
+    up_to_date, outdated = sample_folder / "hello.py", sample_folder / "new.py"
+    dir_files = {str(sample_folder): [up_to_date, outdated]}
+    manifest = MagicMock()
+    manifest.is_up_to_date.side_effect = lambda file, *_: file == up_to_date
+    compiler_handler = CompilerHandler(
+        files=dir_files,
+        compiler=FakeCompilerWrapper(),
+        keep_builds=False,
+        manifest=manifest,
+    )
+    compiler_handler._clean_build_files = MagicMock()
+    # When
+    compiler_handler.start()
+    # Then
+    mocked_run_sub_process.assert_called_once_with(
+        files=[outdated], compile_cmd=compiler_handler.compiler.cmd
+    )
+    compiler_handler._clean_build_files.assert_called_once_with(
+        files=[outdated]
+    )
+    manifest.record.assert_called_once()
+    manifest.save.assert_called_once()
+
+
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_restores_cached_files(
+    mocked_run_sub_process, sample_python_file_fixture
+):
+    """
+    Given a `CompilerHandler` instance with a `cache`
+    When we call the `start` method
+    Then we expect only the cache misses to be compiled and stored,
+    and the cleanup to run for all the files.
+    """
+    # Given
+    sample_folder = sample_python_file_fixture
+    cached, missing = sample_folder / "hello.py", sample_folder / "new.py"
+    dir_files = {str(sample_folder): [cached, missing]}
+    cache = MagicMock()
+    cache.restore.side_effect = lambda file, *_: file == cached
+    compiler_handler = CompilerHandler(
+        files=dir_files,
+        compiler=FakeCompilerWrapper(),
+        clean_source=True,
+        cache=cache,
+    )
+    compiler_handler._clean_source_files = MagicMock()
+    # When
+    compiler_handler.start()
+    # Then
+    mocked_run_sub_process.assert_called_once_with(
+        files=[missing], compile_cmd=compiler_handler.compiler.cmd
+    )
+    cache.store.assert_called_once()
+    cache.evict.assert_called_once()
+    compiler_handler._clean_source_files.assert_called_once_with(
+        files=[cached, missing]
+    )
+
+
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_builds_each_directory_with_batch_compilers(
+    mocked_run_sub_process, tmp_path
+):
+    """
+    Given a `CompilerHandler` instance with a `batch` compiler
+    When we call the `start` method
+    Then we expect one `build` per directory instead of a `run_sub_process`
+    per file.
+    """
+    # Given
+    dir_files = {
+        str(tmp_path / "first"): [tmp_path / "first" / "0.py"],
+        str(tmp_path / "second"): [
+            tmp_path / "second" / "0.py",
+            tmp_path / "second" / "1.py",
+        ],
+    }
+    fake_compiler = FakeCompilerWrapper()
+    fake_compiler.batch = True
+    fake_compiler.build = MagicMock()
+    compiler_handler = CompilerHandler(
+        files=dir_files, compiler=fake_compiler, jobs=2
+    )
+    # When
+    compiler_handler.start()
+    # Then
+    mocked_run_sub_process.assert_not_called()
+    assert fake_compiler.build.call_count == 2
+    for files in dir_files.values():
+        fake_compiler.build.assert_any_call(files=files)
+
+
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_submits_to_the_daemon(
+    mocked_run_sub_process, sample_python_file_fixture
+):
+    """
+    Given a `CompilerHandler` instance with a `daemon`
+    When we call the `start` method
+    Then we expect the compile jobs to be submitted to the daemon.
+    """
+    # Given
+    sample_folder = sample_python_file_fixture
+    dir_files = {str(sample_folder): [sample_folder / "hello.py"]}
+    daemon = MagicMock()
+    compiler_handler = CompilerHandler(
+        files=dir_files, compiler=FakeCompilerWrapper(), daemon=daemon
+    )
+    # When
+    compiler_handler.start()
+    # Then
+    mocked_run_sub_process.assert_not_called()
+    daemon.run_sub_process.assert_called_once_with(
+        files=dir_files[str(sample_folder)],
+        compile_cmd=compiler_handler.compiler.cmd,
+    )
+
+
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_starts_from_the_critical_path(
+    mocked_run_sub_process, tmp_path
+):
+    """
+    Given modules where one of them is imported by the others,
+    without a manifest or a cache
+    When we call the `start` method with a single job
+    Then we expect the imported module to be compiled first.
+    """
+    # Given
+    (tmp_path / "a_app.py").write_text("import b_utils\n")
+    (tmp_path / "b_utils.py").write_text("import c_base\n")
+    (tmp_path / "c_base.py").write_text("BASE = 1\n")
+    files = {str(tmp_path.resolve()): sorted(tmp_path.resolve().glob("*.py"))}
+    compiler_handler = CompilerHandler(
+        files=files,
+        compiler=FakeCompilerWrapper(),
+        jobs=1,
+    )
+    # When
+    compiler_handler.start()
+    # Then
+    compiled = [
+        call.kwargs["files"][0].name
+        for call in mocked_run_sub_process.call_args_list
+    ]
+    assert compiled == ["c_base.py", "b_utils.py", "a_app.py"]
+
+
+@patch(MODULE + ".ImportGraph")
+@patch(MODULE + ".run_sub_process")
+def test_start_compiling_with_the_given_import_graph(
+    mocked_run_sub_process, mocked_import_graph, tmp_path
+):
+    """
+    Given modules with their import graph
+    When we call the `start` method
+    Then we expect the given import graph to order the compile jobs,
+    without building it again.
+    """
+    # Given
+    (tmp_path / "a_app.py").write_text("A = 1\n")
+    (tmp_path / "b_base.py").write_text("B = 1\n")
+    files = {str(tmp_path): sorted(tmp_path.glob("*.py"))}
+    graph = MagicMock()
+    graph.critical_path.side_effect = (
+        lambda file: 2 if file.stem == "b_base" else 1
+    )
+    compiler_handler = CompilerHandler(
+        files=files, compiler=FakeCompilerWrapper(), jobs=1, graph=graph
+    )
+    # When
+    compiler_handler.start()
+    # Then
+    mocked_import_graph.assert_not_called()
+    assert [
+        call.kwargs["files"][0].name
+        for call in mocked_run_sub_process.call_args_list
+    ] == ["b_base.py", "a_app.py"]
+
+
+@patch(MODULE + ".run_sub_process")
+def test_stream_compiles_before_the_discovery_finishes(
+    mocked_run_sub_process, tmp_path
+):
+    """
+    Given a stream of directories, where the second one is discovered
+    only after the first file has been compiled
+    When we call the `stream` method
+    Then we expect the first file to be compiled during the discovery,
+    all the directories to be cleaned up once compiled,
+    and only their paths to be kept.
+    """
+    # Given
+    compiled = threading.Event()
+    mocked_run_sub_process.side_effect = lambda **_: compiled.set()
+
+    def batches():
+        yield str(tmp_path / "first"), [tmp_path / "first" / "a.py"]
+        assert compiled.wait(timeout=5)
+        yield str(tmp_path / "second"), [tmp_path / "second" / "b.py"]
+
+    compiler_handler = CompilerHandler(
+        files={}, compiler=FakeCompilerWrapper(), keep_builds=False, jobs=1
+    )
+    compiler_handler._clean_build_files = MagicMock()
+    # When
+    compiler_handler.stream(batches())
+    # Then
+    assert mocked_run_sub_process.call_count == 2
+    assert compiler_handler._clean_build_files.call_count == 2
+    assert compiler_handler.files == {
+        str(tmp_path / "first"): [],
+        str(tmp_path / "second"): [],
+    }
+    compiler_handler._clean_build_files.assert_any_call(
+        files=[tmp_path / "first" / "a.py"]
+    )
+
+
+def test_stream_with_a_manifest_raises_error(tmp_path):
+    """
+    Given a `CompilerHandler` with a manifest
+    When we call the `stream` method
+    Then we expect a `ValueError`, the import graph requires all the files.
+    """
+    compiler_handler = CompilerHandler(
+        files={},
+        compiler=FakeCompilerWrapper(),
+        manifest=MagicMock(),
+    )
+    with pytest.raises(ValueError):
+        compiler_handler.stream(iter([]))
@@ -1,9 +1,18 @@
 """
 Test cases for `CythonWrapper` and `NuitkaWrapper`.
 """
+from pathlib import Path
+
 import pytest
 
-from src import CompilerCommands, CompilerWrapper, CythonWrapper, NuitkaWrapper
+from src import (
+    CompilerCommands,
+    CompilerWrapper,
+    CythonBuildWrapper,
+    CythonWrapper,
+    NuitkaPackageWrapper,
+    NuitkaWrapper,
+)
 
 
 def test_cython_compiler_cleanup(sample_cython_build_fixture):
@@ -103,3 +112,55 @@ def test_cannot_instantiate_compiler_without_implement_abstract_methods():
     """
     with pytest.raises(TypeError):
         CompilerWrapper()
+
+
+def test_cython_build_wrapper_is_a_batch_compiler():
+    """
+    Given the in-process `CythonBuildWrapper`
+    Then we expect it to be a `batch` compiler which cleans up like `Cython`,
+    while the shell compilers aren't.
+    """
+    compiler = CythonBuildWrapper(nthreads=3)
+    assert compiler.batch
+    assert compiler.nthreads == 3
+    assert compiler.cmd == CompilerCommands.cython_in_process
+    assert isinstance(compiler, CythonWrapper)
+    assert not CythonWrapper().batch
+    assert not NuitkaWrapper().batch
+
+
+def test_nuitka_package_wrapper_commands():
+    """
+    Given the `NuitkaPackageWrapper`
+    When we format its command for a package directory
+    Then we expect the whole package to be included without its tests,
+    and a per module `Nuitka` compiler for the loose modules.
+    """
+    compiler = NuitkaPackageWrapper(module_cmd=CompilerCommands.nuitka_bench)
+    cmd = compiler.cmd.format(Path("/project/sample_pkg"))
+    assert "--module /project/sample_pkg" in cmd
+    assert "--include-package=sample_pkg" in cmd
+    assert "--nofollow-import-to=*.test*" in cmd
+    module_compiler = compiler.module_compiler()
+    assert type(module_compiler) is NuitkaWrapper
+    assert module_compiler.cmd == CompilerCommands.nuitka_bench
+
+
+def test_cython_directive_presets():
+    """
+    Given the `fast` directives preset
+    When we instantiate the `Cython` compilers with it
+    Then we expect its directives within the command,
+    and the default preset to keep the plain command.
+    """
+    compiler = CythonWrapper(cmd=CompilerCommands.cython_bench, preset="fast")
+    assert compiler.cmd.format(Path("fib.py")).startswith(
+        "cythonize fib.py -X boundscheck=False,wraparound=False,"
+        "cdivision=True,initializedcheck=False,infer_types=True -3"
+    )
+    assert str(compiler) == "Cython (fast)"
+    assert CythonWrapper().cmd == CompilerCommands.cython
+    assert str(CythonWrapper()) == "Cython"
+    build_compiler = CythonBuildWrapper(preset="fast")
+    assert build_compiler.directives["cdivision"] is True
+    assert build_compiler.cmd != CompilerCommands.cython_in_process
@@ -0,0 +1,167 @@
+"""
+Test cases for the `CompilerDaemon` and the `DaemonClient`
+"""
+import json
+import socket
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from src.daemon import (
+    CompilerDaemon,
+    DaemonClient,
+    DaemonStats,
+    daemon_from_options,
+    parse_command,
+)
+from src.wrappers import CompilerCommands
+
+MODULE = "src.daemon"
+
+
+@pytest.mark.parametrize(
+    "cmd, expected",
+    [
+        (
+            CompilerCommands.nuitka.format("/tmp/hello.py"),
+            ("nuitka", ["nuitka", "--module", "/tmp/hello.py"], False),
+        ),
+        (
+            CompilerCommands.cython_bench.format("/tmp/hello.py"),
+            (
+                "Cython.Build.Cythonize",
+                ["cythonize", "/tmp/hello.py", "-3", "--inplace", "--quiet"],
+                True,
+            ),
+        ),
+        ("stat /tmp/hello.py", (None, ["stat", "/tmp/hello.py"], False)),
+    ],
+)
+def test_parse_command(cmd, expected):
+    """
+    Given a compile command
+    When we parse it
+    Then we expect the module which implements it, its argv and
+    if it's quiet.
+    """
+    assert parse_command(cmd) == expected
+
+
+def test_daemon_stats_summary():
+    """
+    Given some job latencies
+    Then we expect their statistics within the summary.
+    """
+    stats = DaemonStats(queued=2, completed=3)
+    stats.latencies.extend([3.0, 1.0, 2.0])
+    summary = stats.summary()
+    assert summary["queued"] == 2
+    assert summary["latencies"] == {
+        "count": 3,
+        "mean": 2.0,
+        "median": 2.0,
+        "max": 3.0,
+    }
+
+
+@pytest.fixture
+def daemon_fixture(tmp_path):
+    """
+    Pytest fixture to serve a `CompilerDaemon` within a thread.
+    """
+    daemon = CompilerDaemon(socket_path=tmp_path / "daemon.sock", workers=2)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    daemon.server_close()
+    thread.join()
+
+
+def test_daemon_runs_the_compile_jobs(
+    daemon_fixture, sample_python_file_fixture
+):
+    """
+    Given a running daemon
+    When we submit a compile job for each file
+    Then we expect the command to run within the file directory
+    and the job statistics.
+    """
+    # Given
+    client = DaemonClient(socket_path=daemon_fixture.socket_path)
+    assert client.is_running()
+    python_file = sample_python_file_fixture / "hello.py"
+    # When
+    client.run_sub_process(
+        files=[python_file, python_file],
+        compile_cmd=CompilerCommands.cython_bench,
+    )
+    # Then
+    assert list(sample_python_file_fixture.glob("hello*.so"))
+    stats = client.stats()
+    assert stats["completed"] == 2
+    assert stats["failed"] == 0
+    assert stats["queued"] == 0
+    assert stats["latencies"]["count"] == 2
+
+
+def test_daemon_rejects_unknown_commands_and_requests(
+    daemon_fixture, sample_python_file_fixture
+):
+    """
+    Given a running daemon, listening on a socket only its user can access
+    When we submit an unknown command and a malformed request
+    Then we expect them to be rejected, without running the command.
+    """
+    # Given
+    assert daemon_fixture.socket_path.stat().st_mode & 0o777 == 0o600
+    client = DaemonClient(socket_path=daemon_fixture.socket_path)
+    python_file = sample_python_file_fixture / "hello.py"
+    # When
+    response = client._request(
+        op="compile", file=str(python_file), cmd="cp {} copied.py"
+    )
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(str(daemon_fixture.socket_path))
+        connection.sendall(b"not json\n")
+        with connection.makefile("rb") as reply:
+            malformed = json.loads(reply.readline())
+    # Then
+    assert "Unknown compile command" in response["error"]
+    assert not (sample_python_file_fixture / "copied.py").exists()
+    assert "Invalid request" in malformed["error"]
+    assert "Invalid request" in client._request(op="compile")["error"]
+    assert client.stats()["completed"] == 0
+
+
+def test_daemon_client_is_not_running(tmp_path):
+    """
+    Given a socket path without a daemon
+    Then we expect the client to not be running.
+    """
+    assert not DaemonClient(socket_path=tmp_path / "missing.sock").is_running()
+
+
+@patch(MODULE + ".DaemonClient.is_running", return_value=False)
+def test_daemon_from_options_falls_back_to_local_compile(_, caplog):
+    """
+    Given the `--daemon` option without a running daemon
+    Then we expect a warning and no client.
+    """
+    assert daemon_from_options(use_daemon=False) is None
+    assert daemon_from_options(use_daemon=True) is None
+    assert "compiling locally" in caplog.text
+
+
+def test_daemon_from_options_with_the_socket_path(daemon_fixture):
+    """
+    Given a daemon running on another socket than the default one
+    When we create the client with the `--socket` option
+    Then we expect it to reach the daemon.
+    """
+    client = daemon_from_options(
+        use_daemon=True, socket_path=str(daemon_fixture.socket_path)
+    )
+    assert client is not None
+    assert client.socket_path == daemon_fixture.socket_path
@@ -0,0 +1,94 @@
+"""
+Test cases for the Cython compiler directives sweep
+"""
+
+
+from src import CythonWrapper, NuitkaWrapper
+from src.directives import sweep_compilers, sweep_table
+from src.results import BenchResult
+
+MODULE = "src.directives"
+
+
+# Two modules, each one with its test file.
+PROJECT_FILES = {
+    "loops.py": "def loops():\n    return 1\n",
+    "strings.py": "def strings():\n    return 'a'\n",
+    "test_loops.py": (
+        "from loops import loops\n\n\n"
+        "def test_loops():\n"
+        "    assert loops()\n"
+    ),
+    "test_strings.py": (
+        "from strings import strings\n\n\n"
+        "def test_strings():\n"
+        "    assert strings()\n"
+    ),
+}
+
+
+def test_sweep_compilers():
+    """
+    Given the `Cython` and the `Nuitka` compilers
+    When we sweep the directives
+    Then we expect a `Cython` compiler for each preset instead of the default one.
+    """
+    compilers = sweep_compilers([CythonWrapper(), NuitkaWrapper()], sweep=True)
+    assert [str(compiler) for compiler in compilers] == [
+        "Nuitka",
+        "Cython",
+        "Cython (safe)",
+        "Cython (fast)",
+    ]
+    assert len(sweep_compilers([CythonWrapper()], sweep=False)) == 1
+
+
+def test_sweep_table(sample_project_fixture):
+    """
+    Given the timings of two modules with each directives preset
+    When we render the sweep table
+    Then we expect the speedup of each preset over the default one for
+    each module, and the `fast` preset to be the fastest only where it
+    beats the margin.
+    """
+    # Given
+    project = sample_project_fixture(PROJECT_FILES)
+    means = {
+        "Cython": {"loops": 1.0, "strings": 1.0},
+        "Cython (safe)": {"loops": 1.0, "strings": 1.0},
+        "Cython (fast)": {"loops": 0.5, "strings": 0.99},
+    }
+    results = [
+        BenchResult(
+            engine=engine,
+            test=f"test_{test}.py::test_{test}",
+            outcome="passed",
+            mean=mean,
+        )
+        for engine, tests in means.items()
+        for test, mean in tests.items()
+    ]
+    # When
+    table = sweep_table(results, project)
+    # Then
+    lines = table.splitlines()
+    assert lines[0] == "Directives speedup vs `Cython`"
+    assert lines[2].split() == [
+        "loops.py",
+        "|",
+        "x1.00",
+        "|",
+        "x2.00",
+        "|",
+        "fast",
+    ]
+    assert lines[3].split() == [
+        "strings.py",
+        "|",
+        "x1.00",
+        "|",
+        "x1.01",
+        "|",
+        "default",
+    ]
+    assert not sweep_table(results[:2], project)
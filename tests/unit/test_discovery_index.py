@@ -0,0 +1,152 @@
+"""
+Test cases for the `DiscoveryIndex`
+"""
+import os
+import time
+
+from src import FileHandler
+from src.discovery_index import (
+    NEVER_COMPILED,
+    STALE,
+    UP_TO_DATE,
+    DiscoveryIndex,
+    index_from_options,
+    module_status,
+)
+from src.file_handler import DEFAULT_EXCLUDED_DIRS, name_matcher
+from src.manifest import python_abi
+
+
+def _age(root, seconds=60):
+    """
+    Moves the `mtime` of all the directories back, so they can be trusted.
+    """
+    past = time.time() - seconds
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (past, past))
+
+
+def _walk(index, root):
+    return {
+        directory: names
+        for directory, names, _ in index.walk(
+            str(root), name_matcher(DEFAULT_EXCLUDED_DIRS)
+        )
+    }
+
+
+def test_index_rescans_only_the_changed_directories(sample_package_fixture):
+    """
+    Given an index of a project, saved and reloaded from the disk
+    When a module is created within the sub-package
+    Then we expect only the sub-package to be rescanned, finding the module.
+    """
+    # Given
+    project_folder = sample_package_fixture.resolve()
+    _age(project_folder)
+    index = DiscoveryIndex.for_input_path(project_folder)
+    first_walk = _walk(index, project_folder)
+    assert index.rescanned == 3
+    index.save()
+    _age(project_folder)
+    _walk(index, project_folder)
+    index.save()
+    index = DiscoveryIndex.for_input_path(project_folder)
+    assert _walk(index, project_folder) == first_walk
+    assert index.rescanned == 0
+    # When
+    sub_folder = project_folder / "sample_pkg" / "sub"
+    (sub_folder / "third.py").touch()
+    # Then
+    walk = _walk(index, project_folder)
+    assert index.rescanned == 1
+    assert walk[str(sub_folder)] == ["__init__.py", "second.py", "third.py"]
+
+
+def test_index_skips_racy_directories(tmp_path):
+    """
+    Given a directory modified right before its scan
+    When we walk it again
+    Then we expect it to be rescanned, its `mtime` can't be trusted.
+    """
+    (tmp_path / "module.py").touch()
+    index = DiscoveryIndex(path=tmp_path / "index.json")
+    _walk(index, tmp_path)
+    _walk(index, tmp_path)
+    assert index.rescanned == 2
+
+
+def test_index_drops_the_deleted_directories(sample_package_fixture):
+    """
+    Given an index of a project
+    When the sub-package is deleted
+    Then we expect it to be dropped from the index.
+    """
+    project_folder = sample_package_fixture.resolve()
+    index = DiscoveryIndex(path=project_folder / "index.json")
+    _walk(index, project_folder)
+    assert len(index) == 3
+    for file in (project_folder / "sample_pkg" / "sub").iterdir():
+        file.unlink()
+    (project_folder / "sample_pkg" / "sub").rmdir()
+    _walk(index, project_folder)
+    assert len(index) == 2
+
+
+def test_file_handler_with_an_index(sample_package_fixture):
+    """
+    Given a `FileHandler` with an index
+    When we collect the files twice
+    Then we expect the same files as without the index, and a saved index.
+    """
+    project_folder = sample_package_fixture.resolve()
+    index = DiscoveryIndex.for_input_path(project_folder)
+    file_handler = FileHandler(input_path=project_folder, index=index)
+    expected = FileHandler(input_path=project_folder).start()
+    assert file_handler.start() == expected
+    assert file_handler.start() == expected
+    assert index.path.is_file()
+
+
+def test_read_only_index_is_never_saved(sample_package_fixture):
+    """
+    Given a read-only index of a project
+    When we collect its files
+    Then we expect the index not to be written.
+    """
+    project_folder = sample_package_fixture.resolve()
+    index = DiscoveryIndex.for_input_path(project_folder, read_only=True)
+    file_handler = FileHandler(input_path=project_folder, index=index)
+    assert (
+        file_handler.start() == FileHandler(input_path=project_folder).start()
+    )
+    assert index.rescanned == 3
+    assert not index.path.parent.exists()
+
+
+def test_index_from_options(tmp_path):
+    """
+    Given the cli options
+    Then we expect the index to be used only with `--index`.
+    """
+    assert index_from_options(tmp_path, use_index=False) is None
+    index = index_from_options(tmp_path, use_index=True, read_only=True)
+    assert index.read_only
+    assert index.path.parent.parent == tmp_path.resolve()
+
+
+def test_module_status(sample_python_file_fixture):
+    """
+    Given a module
+    When it's compiled and then modified
+    Then we expect it to be never-compiled, up-to-date and then stale.
+    """
+    python_file = sample_python_file_fixture / "hello.py"
+    assert module_status(python_file) == NEVER_COMPILED
+    executable = python_file.with_name(python_file.stem + python_abi())
+    executable.touch()
+    past = time.time() - 60
+    os.utime(python_file, (past, past))
+    assert module_status(python_file) == UP_TO_DATE
+    os.utime(executable, (past - 60, past - 60))
+    assert module_status(python_file) == STALE
@@ -0,0 +1,143 @@
+"""
+Test cases for the `EnginePlan` of the `auto` engine
+"""
+from unittest.mock import patch
+
+from src.benchmark import BASELINE
+from src.engine_plan import (
+    PLAN_FILE,
+    PYTHON,
+    EnginePlan,
+    choose_engine,
+    module_tests,
+    plan_engines,
+    plan_from_options,
+)
+from src.manifest import MANIFEST_DIR
+
+MODULE = "src.engine_plan"
+
+
+# Two modules, each one with its test file.
+PROJECT_FILES = {
+    "fast.py": "def fast():\n    return 1\n",
+    "slow.py": "def slow():\n    return 2\n",
+    "test_fast.py": (
+        "from fast import fast\n\n\n"
+        "def test_fast():\n"
+        "    assert fast() == 1\n"
+    ),
+    "slow_benchmark.py": "import slow\n",
+    "test_slow.py": (
+        "from slow_benchmark import slow\n\n\n"
+        "def test_slow():\n"
+        "    assert slow.slow() == 2\n"
+    ),
+}
+
+
+def test_choose_engine_with_margin():
+    """
+    Given the speedups of the engines over python
+    When we choose the engine of a module
+    Then we expect the fastest one, unless it doesn't beat the margin.
+    """
+    assert choose_engine({"cython": 1.5, "nuitka": 1.2}, margin=5) == "cython"
+    assert choose_engine({"cython": 1.04, "nuitka": 0.9}, margin=5) == PYTHON
+    assert choose_engine({}, margin=5) == PYTHON
+
+
+def test_module_tests(sample_project_fixture):
+    """
+    Given two modules with their test files
+    When we collect the tests of each module
+    Then we expect each module to get the tests of the files importing it,
+    directly or through a benchmark module.
+    """
+    project = sample_project_fixture(PROJECT_FILES)
+    tests = module_tests(
+        project, ["test_fast.py::test_fast", "test_slow.py::test_slow"]
+    )
+    assert tests == {
+        (project / "fast.py").resolve(): ["test_fast.py::test_fast"],
+        (project / "slow.py").resolve(): ["test_slow.py::test_slow"],
+    }
+
+
+def test_module_tests_with_the_discovery_excludes(sample_project_fixture):
+    """
+    Given a module with `test` within its name, and one within a `.venv`
+    When we collect the tests of each module
+    Then we expect the first one to get its tests,
+    and the second one not to be parsed.
+    """
+    # Given
+    project = sample_project_fixture(
+        {
+            "latest.py": "def latest():\n    return 1\n",
+            "test_latest.py": "import latest\nimport vendored\n",
+        }
+    )
+    (project / ".venv").mkdir()
+    (project / ".venv" / "vendored.py").write_text("VALUE = 1\n")
+    # When
+    tests = module_tests(project, ["test_latest.py::test_f"])
+    # Then
+    assert tests == {
+        (project / "latest.py").resolve(): ["test_latest.py::test_f"]
+    }
+
+
+@patch(MODULE + ".Benchmark")
+def test_plan_engines(
+    mocked_benchmark, sample_project_fixture, sample_cpu_run_fixture
+):
+    """
+    Given a module which is faster compiled and one which is slower
+    When we plan the engines of the project
+    Then we expect the first one to be compiled with the fastest engine,
+    the second one to be left as python and the plan to be reusable.
+    """
+    # Given
+    project = sample_project_fixture(PROJECT_FILES)
+    mocked_benchmark.return_value.runs = [
+        sample_cpu_run_fixture(
+            BASELINE,
+            {"test_fast.py::test_fast": 2.0, "test_slow.py::test_slow": 1.0},
+        ),
+        sample_cpu_run_fixture(
+            "Cython",
+            {"test_fast.py::test_fast": 1.0, "test_slow.py::test_slow": 1.2},
+        ),
+        sample_cpu_run_fixture("Nuitka", {"test_fast.py::test_fast": 1.5}),
+    ]
+    # When
+    plan = plan_engines(project, margin=5)
+    # Then
+    assert plan.path == project.resolve() / MANIFEST_DIR / PLAN_FILE
+    assert plan.modules["fast.py"]["engine"] == "cython"
+    assert plan.modules["fast.py"]["speedups"] == {
+        "cython": 2.0,
+        "nuitka": 2.0 / 1.5,
+    }
+    assert plan.modules["slow.py"]["engine"] == PYTHON
+    assert "nuitka" not in plan.modules["slow.py"]["speedups"]
+    reloaded = plan_from_options(project, plan=None, replan=False, margin=5)
+    assert mocked_benchmark.call_count == 1
+    assert reloaded.split(
+        {str(project): [project / "fast.py", project / "slow.py"]}
+    ) == {
+        "cython": {str(project): [project / "fast.py"]},
+        PYTHON: {str(project): [project / "slow.py"]},
+    }
+
+
+def test_engine_plan_of_unknown_modules(sample_project_fixture, tmp_path):
+    """
+    Given a plan without a module
+    When we get the engine of it
+    Then we expect it to be left as python.
+    """
+    project = sample_project_fixture(PROJECT_FILES)
+    plan = EnginePlan(path=tmp_path / "plan.json", modules={})
+    assert plan.engine(project / "fast.py") == PYTHON
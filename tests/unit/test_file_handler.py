@@ -0,0 +1,178 @@
+"""
+Test cases for the `FileHandler`
+"""
+import time
+from pathlib import Path
+
+from src import FileHandler
+from src.discovery_index import DiscoveryIndex
+from src.file_handler import GlobMatcher
+
+
+def _discovery_time(root: Path) -> float:
+    """
+    The best time of a few discoveries of the ``root``.
+    """
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        FileHandler(input_path=root).start()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def _create_tree(root: Path, dirs: int, files_per_dir: int = 50) -> Path:
+    for dir_index in range(dirs):
+        directory = root / f"package_{dir_index}"
+        directory.mkdir(parents=True)
+        for file_index in range(files_per_dir):
+            (directory / f"module_{file_index}.py").touch()
+        (directory / f"test_module_{dir_index}.py").touch()
+    return root
+
+
+def test_glob_matcher_matches_like_path_match():
+    """
+    Given many glob patterns
+    When we match paths with all of them at once
+    Then we expect the same results as `Path.match` of any pattern.
+    """
+    patterns = ["**/test**", "**/__init__.py", "sub/*.py", "/abs/*.py"]
+    matcher = GlobMatcher(patterns)
+    for path in [
+        "test_a.py",
+        "module/test_a.py",
+        "module/__init__.py",
+        "module/sub/a.py",
+        "sub/a.py",
+        "/abs/a.py",
+        "/other/abs/a.py",
+        "module/a.py",
+    ]:
+        assert matcher.match(path) == any(
+            Path(path).match(pattern) for pattern in patterns
+        )
+
+
+def test_start_prunes_the_excluded_dirs(sample_package_fixture):
+    """
+    Given a project with a virtual environment and build directories
+    When we collect its files
+    Then we expect only the project files, without any tests.
+    """
+    # Given
+    project_folder = sample_package_fixture.resolve()
+    for excluded_dir in [".venv/lib", "node_modules/pkg", "loose.build"]:
+        (project_folder / excluded_dir).mkdir(parents=True)
+        (project_folder / excluded_dir / "module.py").touch()
+    (project_folder / "test_loose.py").touch()
+    # When
+    dir_files = FileHandler(input_path=project_folder).start()
+    # Then
+    assert dir_files == {
+        str(project_folder): [project_folder / "loose.py"],
+        str(project_folder / "sample_pkg"): [
+            project_folder / "sample_pkg" / "first.py"
+        ],
+        str(project_folder / "sample_pkg" / "sub"): [
+            project_folder / "sample_pkg" / "sub" / "second.py"
+        ],
+    }
+
+
+def test_start_resolves_the_symlinked_files(sample_package_fixture):
+    """
+    Given a project with a symlink to a module outside of it
+    When we collect its files, with and without an index
+    Then we expect the module the symlink points to, within its directory.
+    """
+    # Given
+    project_folder = (sample_package_fixture / "sample_pkg").resolve()
+    shared = sample_package_fixture.resolve() / "shared"
+    shared.mkdir()
+    (shared / "utils.py").touch()
+    (project_folder / "utils.py").symlink_to(shared / "utils.py")
+    index = DiscoveryIndex(path=sample_package_fixture / "index.json")
+    # When
+    dir_files = FileHandler(input_path=project_folder).start()
+    # Then
+    assert dir_files[str(shared)] == [shared / "utils.py"]
+    assert dir_files[str(project_folder)] == [project_folder / "first.py"]
+    assert FileHandler(input_path=project_folder, index=index).start() == (
+        dir_files
+    )
+    assert FileHandler(input_path=project_folder / "utils.py").start() == {
+        str(shared): [shared / "utils.py"]
+    }
+
+
+def test_start_scales_linearly(tmp_path):
+    """
+    Given a tree and a four times larger one
+    When we collect their files
+    Then we expect the discovery time to grow linearly, not quadratically.
+    """
+    # Given
+    small_tree = _create_tree(tmp_path / "small", dirs=20)
+    large_tree = _create_tree(tmp_path / "large", dirs=80)
+    # When
+    small_time = _discovery_time(small_tree)
+    large_time = _discovery_time(large_tree)
+    # Then
+    assert len(FileHandler(input_path=large_tree).start()) == 80
+    assert large_time / small_time < 8
+
+
+def test_split_packages(sample_package_fixture):
+    """
+    Given a project with a package, a sub-package and a loose module
+    When we split its files into packages
+    Then we expect only the top level package, next to the loose module.
+    """
+    # Given
+    project_folder = sample_package_fixture.resolve()
+    file_handler = FileHandler(input_path=project_folder)
+    dir_files = file_handler.start()
+    # When
+    packages, modules = file_handler.split_packages(dir_files)
+    # Then
+    assert packages == {str(project_folder): [project_folder / "sample_pkg"]}
+    assert modules == {str(project_folder): [project_folder / "loose.py"]}
+
+
+def test_split_packages_with_a_package_as_input_path(sample_package_fixture):
+    """
+    Given a package as the input path
+    When we split its files into packages with and without the input path
+    Then we expect the whole package or only its sub-packages.
+    """
+    # Given
+    package_folder = (sample_package_fixture / "sample_pkg").resolve()
+    file_handler = FileHandler(input_path=package_folder)
+    dir_files = file_handler.start()
+    # When
+    packages, modules = file_handler.split_packages(dir_files)
+    sub_packages, root_modules = file_handler.split_packages(
+        dir_files, include_root=False
+    )
+    # Then
+    assert packages == {str(package_folder.parent): [package_folder]}
+    assert not modules
+    assert sub_packages == {str(package_folder): [package_folder / "sub"]}
+    assert root_modules == {str(package_folder): [package_folder / "first.py"]}
+
+
+def test_stream_yields_each_directory(sample_package_fixture):
+    """
+    Given a project with a package, a sub-package and a loose module
+    When we stream its files
+    Then we expect the same valid files as `start`, a directory at a time.
+    """
+    # Given
+    project_folder = sample_package_fixture.resolve()
+    file_handler = FileHandler(input_path=project_folder)
+    # When
+    batches = list(file_handler.stream())
+    # Then
+    assert dict(batches) == file_handler.start()
+    assert len(batches) == 3
@@ -0,0 +1,100 @@
+"""
+Test cases for the benchmark history
+"""
+import sqlite3
+
+import pytest
+
+from src.history import History, git_commit, history_from_options
+from src.results import BenchResult
+
+
+def _results(mean, engine="Cython", outcome="passed"):
+    return [
+        BenchResult(
+            engine=engine, test="test_a.py::test_a", outcome=outcome, mean=mean
+        )
+    ]
+
+
+def test_history_append(tmp_path):
+    """
+    Given an empty history
+    When we append the results of a run
+    Then we expect the run to be stored with its versions and results.
+    """
+    # Given
+    history = History(tmp_path / "history.sqlite", host="host")
+    # When
+    run_id = history.append(
+        _results(1.0), versions={"Cython": "3.0"}, commit="abc"
+    )
+    # Then
+    assert run_id == 1
+    with sqlite3.connect(history.path) as connection:
+        assert connection.execute(
+            "SELECT host, git_commit, versions FROM runs"
+        ).fetchall() == [("host", "abc", '{"Cython": "3.0"}')]
+        assert connection.execute(
+            "SELECT engine, test, mean FROM results"
+        ).fetchall() == [("Cython", "test_a.py::test_a", 1.0)]
+
+
+def test_history_regressions_against_the_rolling_baseline(tmp_path):
+    """
+    Given the runs of a test on the same and on another host
+    When a new run is slower than the threshold
+    Then we expect it to be a regression against the median of the last runs
+    of the same host only.
+    """
+    # Given
+    path = tmp_path / "history.sqlite"
+    history = History(path, host="host")
+    for mean in (1.0, 1.2, 0.9, 1.0, 1.1):
+        history.append(_results(mean), versions={})
+    History(path, host="other").append(_results(0.1), versions={})
+    history.append(_results(0.01, outcome="failed"), versions={})
+    # When
+    regressions = history.regressions(_results(1.5), threshold=20)
+    # Then
+    assert history.baseline("Cython", "test_a.py::test_a") == 1.0
+    assert len(regressions) == 1
+    assert regressions[0].change == pytest.approx(50)
+    assert "+50.0%" in str(regressions[0])
+    assert not history.regressions(_results(1.15), threshold=20)
+    assert not history.regressions(_results(1.5, engine="Nuitka"), threshold=20)
+
+
+def test_history_record(tmp_path, capsys):
+    """
+    Given a history with a previous run
+    When we record a slower run
+    Then we expect the regression to be reported and the run to be appended.
+    """
+    # Given
+    history = History(tmp_path / "history.sqlite", host="host")
+    history.append(_results(1.0), versions={})
+    # When
+    regressions = history.record(
+        _results(2.0), versions={}, input_path=tmp_path, threshold=10
+    )
+    # Then
+    assert len(regressions) == 1
+    assert "Regression" in capsys.readouterr().out
+    assert history.baseline("Cython", "test_a.py::test_a") == 1.5
+    assert git_commit(tmp_path) is None
+
+
+def test_history_from_options(tmp_path):
+    """
+    Given the history cli options
+    Then we expect the history to be stored at the given path, or within
+    the `.pycompile` directory if only the threshold is given.
+    """
+    assert history_from_options(None, tmp_path, None) is None
+    assert history_from_options(None, tmp_path, 10).path == (
+        tmp_path / ".pycompile" / "history.sqlite"
+    )
+    assert history_from_options(
+        str(tmp_path / "h.db"), tmp_path, None
+    ).path == (tmp_path / "h.db")
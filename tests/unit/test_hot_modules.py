@@ -0,0 +1,124 @@
+"""
+Test cases for the hot modules selection
+"""
+from pathlib import Path
+
+from src.hot_modules import (
+    hot_files,
+    load_line_profile,
+    profile_run,
+    rank_modules,
+    ranking_table,
+)
+
+MODULE = "src.hot_modules"
+
+
+# A busy module and an idle one, with their test file.
+PROJECT_FILES = {
+    "busy.py": (
+        "def busy():\n"
+        "    total = 0\n"
+        "    for index in range(3_000_000):\n"
+        "        total += index % 7\n"
+        "    return total\n"
+    ),
+    "idle.py": "def idle():\n    return 1\n",
+    "test_project.py": (
+        "from busy import busy\n"
+        "from idle import idle\n\n\n"
+        "def test_project():\n"
+        "    assert busy() and idle()\n"
+    ),
+    "main.py": (
+        "from busy import busy\n\n"
+        "if __name__ == '__main__':\n"
+        "    busy()\n"
+    ),
+}
+
+
+def test_rank_modules_by_share():
+    """
+    Given the CPU time of three modules, and a module which was not sampled
+    When we rank them for a 70% share
+    Then we expect the top ones which cover it to be hot.
+    """
+    # Given
+    files = {
+        "project": [Path("a.py"), Path("b.py"), Path("c.py"), Path("d.py")]
+    }
+    seconds = {
+        Path("a.py").resolve(): 6.0,
+        Path("b.py").resolve(): 3.0,
+        Path("c.py").resolve(): 1.0,
+    }
+    # When
+    ranking = rank_modules(seconds, files, share=70)
+    # Then
+    assert [module.path.name for module in ranking] == [
+        "a.py",
+        "b.py",
+        "c.py",
+        "d.py",
+    ]
+    assert [module.hot for module in ranking] == [True, True, False, False]
+    assert [module.cumulative for module in ranking] == [
+        60.0,
+        90.0,
+        100.0,
+        100.0,
+    ]
+    assert hot_files(files, ranking) == {
+        "project": [Path("a.py"), Path("b.py")]
+    }
+    table = ranking_table(ranking, total_seconds=20.0, root=Path.cwd())
+    assert "Compiling #2/4 modules, covering 90.0%" in table
+    assert "(45.0% of the profiled run)" in table
+
+
+def test_profile_run_of_the_tests(sample_project_fixture):
+    """
+    Given a busy module and an idle one
+    When we profile the run of their tests
+    Then we expect the busy one to take most of the CPU time.
+    """
+    project = sample_project_fixture(PROJECT_FILES)
+    # When
+    seconds = profile_run(project, interval=0.001)
+    # Then
+    busy = seconds[(project / "busy.py").resolve()]
+    assert busy > seconds.get((project / "idle.py").resolve(), 0.0)
+    assert busy > 0
+
+
+def test_profile_run_of_an_entrypoint(sample_project_fixture):
+    """
+    Given a script which calls the busy module
+    When we profile the run of the script
+    Then we expect the busy module to be sampled.
+    """
+    project = sample_project_fixture(PROJECT_FILES)
+    seconds = profile_run(
+        project, entrypoint=project / "main.py", interval=0.001
+    )
+    assert seconds[(project / "busy.py").resolve()] > 0
+
+
+def test_profile_run_saves_the_lines_profile(sample_project_fixture):
+    """
+    Given a busy module
+    When we profile the run of its tests
+    Then we expect the profile of its lines to be saved,
+    and to be skipped once the module changes.
+    """
+    project = sample_project_fixture(PROJECT_FILES)
+    # When
+    profile_run(project, interval=0.001)
+    # Then
+    profile = load_line_profile(project)
+    busy = (project / "busy.py").resolve()
+    assert sum(profile[busy].values()) > 0
+    assert set(profile[busy]) <= {1, 2, 3, 4, 5}
+    (project / "busy.py").write_text("def busy():\n    return 1\n")
+    assert busy not in load_line_profile(project)
@@ -0,0 +1,143 @@
+"""
+Test cases for the `ImportGraph`
+"""
+import sys
+
+from src.import_graph import ImportGraph, module_name
+
+
+def test_module_name(sample_package_fixture):
+    """
+    Given modules within packages and outside any package
+    Then we expect their dotted names, including the parent packages.
+    """
+    package_folder = sample_package_fixture / "sample_pkg"
+    assert module_name(package_folder / "sub" / "second.py") == (
+        "sample_pkg.sub.second"
+    )
+    assert module_name(sample_package_fixture / "loose.py") == "loose"
+
+
+def test_import_graph_dependents(sample_package_fixture):
+    """
+    Given a package where a sub-package module imports another module
+    When we build its import graph
+    Then we expect the edges of absolute, relative and `cimport` imports.
+    """
+    # Given
+    package_folder = (sample_package_fixture / "sample_pkg").resolve()
+    first = package_folder / "first.py"
+    second = package_folder / "sub" / "second.py"
+    third = package_folder / "sub" / "third.py"
+    third.write_text("from . import second\n")
+    fourth = package_folder / "fourth.py"
+    fourth.write_text("def fourth():\n    return 4\n")
+    fourth.with_suffix(".pxd").write_text(
+        "from sample_pkg.first cimport first  # augmenting\n"
+    )
+    # When
+    graph = ImportGraph(
+        files={
+            str(package_folder): [first, fourth],
+            str(package_folder / "sub"): [second, third],
+        }
+    )
+    # Then
+    assert graph.dependencies(third) == {second, first}
+    assert graph.dependents(first) == {second, third, fourth}
+    assert graph.dependents(third) == set()
+    assert graph.affected([second]) == {second, third}
+
+
+def test_import_graph_dependencies_hash(sample_package_fixture):
+    """
+    Given a module which imports another module
+    When the imported module changes
+    Then we expect only the dependencies hash of its dependents to change.
+    """
+    # Given
+    package_folder = (sample_package_fixture / "sample_pkg").resolve()
+    first = package_folder / "first.py"
+    second = package_folder / "sub" / "second.py"
+    files = {str(package_folder): [first], str(second.parent): [second]}
+    graph = ImportGraph(files=files)
+    second_hash = graph.dependencies_hash(second)
+    assert graph.dependencies_hash(first) == ""
+    assert second_hash
+    # When
+    first.write_text("def first():\n    return 2\n")
+    # Then
+    changed_graph = ImportGraph(files=files)
+    assert changed_graph.dependencies_hash(first) == ""
+    assert changed_graph.dependencies_hash(second) != second_hash
+
+
+def test_import_graph_update(sample_package_fixture):
+    """
+    Given the import graph of a package
+    When a module (and the `.pxd` file of another one) drop their imports
+    Then we expect the updated graph to match a new one.
+    """
+    # Given
+    package_folder = (sample_package_fixture / "sample_pkg").resolve()
+    first = package_folder / "first.py"
+    second = package_folder / "sub" / "second.py"
+    fourth = package_folder / "fourth.py"
+    fourth.write_text("X = 4\n")
+    fourth.with_suffix(".pxd").write_text("from sample_pkg.first cimport X\n")
+    files = {str(package_folder): [first, fourth], str(second.parent): [second]}
+    graph = ImportGraph(files=files)
+    second_hash = graph.dependencies_hash(second)
+    assert graph.dependents(first) == {second, fourth}
+    # When
+    second.write_text("X = 2\n")
+    fourth.with_suffix(".pxd").write_text("cdef int X\n")
+    graph.update([second, fourth])
+    # Then
+    assert graph.dependents(first) == set()
+    assert graph.dependencies_hash(second) != second_hash
+    assert graph.imports == ImportGraph(files=files).imports
+
+
+def test_import_graph_critical_path(tmp_path):
+    """
+    Given a chain of imports with a cycle
+    Then we expect the modules which more modules depend on to come first.
+    """
+    # Given
+    (tmp_path / "base.py").write_text("import middle\n")
+    (tmp_path / "middle.py").write_text("import base\nimport top\n")
+    (tmp_path / "top.py").write_text("x = 1\n")
+    (tmp_path / "alone.py").write_text("y = 2\n")
+    files = sorted(tmp_path.glob("*.py"))
+    # When
+    graph = ImportGraph(files={str(tmp_path): files})
+    ordered = sorted(files, key=graph.critical_path, reverse=True)
+    # Then
+    assert ordered[0].name == "top.py"
+    assert {file.name for file in ordered[1:3]} == {"base.py", "middle.py"}
+    assert graph.critical_path(tmp_path / "top.py") == len(
+        "import middle\nimport base\nimport top\nx = 1\n"
+    )
+    assert graph.critical_path(tmp_path / "alone.py") == len("y = 2\n")
+    assert graph.critical_path(tmp_path / "missing.py") == 0
+
+
+def test_import_graph_critical_path_of_a_long_chain(tmp_path):
+    """
+    Given a chain of imports longer than the recursion limit
+    Then we expect the critical path of the module at its end
+    to cover all of them.
+    """
+    # Given
+    count = sys.getrecursionlimit() + 100
+    for index in range(count - 1):
+        (tmp_path / f"m{index}.py").write_text(f"import m{index + 1}\n")
+    (tmp_path / f"m{count - 1}.py").write_text("X = 1\n")
+    files = sorted(tmp_path.glob("*.py"))
+    # When
+    graph = ImportGraph(files={str(tmp_path): files})
+    # Then
+    total = sum(file.stat().st_size for file in files)
+    assert graph.critical_path(tmp_path / f"m{count - 1}.py") == total
+    assert graph.critical_path(tmp_path / "m0.py") == len("import m1\n")
@@ -0,0 +1,103 @@
+"""
+Test cases for the isolated benchmark runs
+"""
+from pathlib import Path
+
+import pytest
+
+from src.isolated import IsolatedRun, run_isolated, target_modules
+
+MODULE = "src.isolated"
+
+
+@pytest.fixture(name="fib_folder")
+def fib_folder_fixture(tmp_path: Path) -> Path:
+    """
+    A module with its test file.
+    """
+    folder = tmp_path / "fib_folder"
+    folder.mkdir()
+    (folder / "fib.py").write_text("def fib(n):\n    return n\n")
+    (folder / "test_fib.py").write_text(
+        "from fib import fib\n\n\ndef test_fib():\n    assert fib(1) == 1\n"
+    )
+    return folder
+
+
+def test_target_modules(fib_folder):
+    """
+    Given a module and a compiled module within a directory
+    When we collect the target modules
+    Then we expect the compiled one to be expected as an extension,
+    and the tests not to be targets.
+    """
+    # Given
+    (fib_folder / "other.cpython-311-x86_64-linux-gnu.so").touch()
+    # When
+    targets = target_modules(fib_folder)
+    # Then
+    assert targets == {"fib": "source", "other": "extension"}
+
+
+def test_run_isolated_records_the_loaded_modules(fib_folder):
+    """
+    Given a module with its test file
+    When we run its tests within an isolated interpreter
+    Then we expect the run to pass and the module to be loaded from its `.py`.
+    """
+    # When
+    run = run_isolated(fib_folder, engine="python", bench_type="cpu")
+    # Then
+    assert isinstance(run, IsolatedRun)
+    assert run.returncode == 0
+    assert run.modules == {"fib": str(fib_folder / "fib.py")}
+    assert "fib: fib.py" in str(run)
+    test = run.tests["test_fib.py::test_fib"]
+    assert test["outcome"] == "passed"
+    assert test["process_peak_rss_mib"] > 0
+
+
+def test_run_isolated_fails_on_an_unexpected_file(fib_folder):
+    """
+    Given a module which is expected to be compiled
+    When it is loaded from its source within an isolated run
+    Then we expect the run to fail.
+    """
+    # When
+    run = run_isolated(
+        fib_folder,
+        engine="cython",
+        bench_type="cpu",
+        targets={"fib": "extension"},
+    )
+    # Then
+    assert run.returncode != 0
+    assert run.modules == {"fib": str(fib_folder / "fib.py")}
+
+
+def test_run_isolated_traces_the_allocations(fib_folder):
+    """
+    Given a test which keeps the strings it allocates
+    When we run it within an isolated interpreter, tracing its allocations
+    Then we expect the retained blocks and their allocation site within
+    the directory (relative to it) to be recorded.
+    """
+    # Given
+    (fib_folder / "test_alloc.py").write_text(
+        "KEPT = []\n\n\ndef test_alloc():\n"
+        "    KEPT.extend(str(i) for i in range(10000))\n"
+    )
+    # When
+    run = run_isolated(
+        fib_folder,
+        engine="python",
+        bench_type="memory",
+        args=["--pycompile-tracemalloc=2", str(fib_folder / "test_alloc.py")],
+    )
+    # Then
+    assert run.returncode == 0
+    test = run.tests["test_alloc.py::test_alloc"]
+    assert test["peak_traced_mib"] > 0
+    assert test["retained_blocks"] >= 10000
+    assert test["allocation_sites"][0]["site"] == "test_alloc.py:5"
+    assert test["allocation_sites"][0]["blocks"] >= 10000
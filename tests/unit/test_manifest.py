@@ -0,0 +1,133 @@
+"""
+Test cases for the `Manifest`
+"""
+import time
+
+from src import Manifest
+from src.manifest import (
+    MANIFEST_DIR,
+    MANIFEST_FILE,
+    file_hash,
+    find_executable,
+    python_abi,
+)
+from tests.fakes import FakeCompilerWrapper
+
+
+def _build(python_file):
+    """
+    Fakes a successful compile of the `python_file`.
+    """
+    executable = python_file.with_name(python_file.stem + python_abi())
+    executable.touch()
+    return executable
+
+
+def test_manifest_for_input_path(sample_python_file_fixture):
+    """
+    Given an input directory
+    When we create a `Manifest` for it
+    Then we expect it to be stored within the `.pycompile` directory.
+    """
+    manifest = Manifest.for_input_path(sample_python_file_fixture)
+    assert manifest.path == (
+        sample_python_file_fixture.resolve() / MANIFEST_DIR / MANIFEST_FILE
+    )
+    file_manifest = Manifest.for_input_path(
+        sample_python_file_fixture / "hello.py"
+    )
+    assert file_manifest.path == manifest.path
+
+
+def test_manifest_module_is_up_to_date_after_record(sample_python_file_fixture):
+    """
+    Given a compiled module
+    When we record it within the manifest
+    Then we expect it to be up-to-date, even after a reload from the disk.
+    """
+    # Given
+    python_file = sample_python_file_fixture / "hello.py"
+    compiler = FakeCompilerWrapper()
+    manifest = Manifest.for_input_path(sample_python_file_fixture)
+    assert not manifest.is_up_to_date(python_file, compiler)
+    _build(python_file)
+    # When
+    manifest.record(python_file, compiler)
+    manifest.save()
+    # Then
+    assert manifest.is_up_to_date(python_file, compiler)
+    reloaded = Manifest.for_input_path(sample_python_file_fixture)
+    assert reloaded.is_up_to_date(python_file, compiler)
+    assert reloaded.entries["hello.py"]["engine"] == str(compiler)
+
+
+def test_manifest_module_is_outdated_on_changes(sample_python_file_fixture):
+    """
+    Given a recorded module
+    When the source, the flags, the dependencies or the executable changes
+    Then we expect it to be outdated.
+    """
+    # Given
+    python_file = sample_python_file_fixture / "hello.py"
+    compiler = FakeCompilerWrapper()
+    manifest = Manifest.for_input_path(sample_python_file_fixture)
+    executable = _build(python_file)
+    manifest.record(python_file, compiler)
+    # When/Then
+    compiler.cmd = "stat -L {}"
+    assert not manifest.is_up_to_date(python_file, compiler)
+    compiler.cmd = "stat {}"
+    assert manifest.is_up_to_date(python_file, compiler)
+    python_file.write_text("print('changed')")
+    assert not manifest.is_up_to_date(python_file, compiler)
+    manifest.record(python_file, compiler)
+    assert not manifest.is_up_to_date(
+        python_file, compiler, dependencies="changed dependency"
+    )
+    executable.unlink()
+    assert not manifest.is_up_to_date(python_file, compiler)
+
+
+def test_manifest_skips_outdated_executables(sample_python_file_fixture):
+    """
+    Given an executable older than the compile start
+    When we record the module
+    Then we expect the module to be removed from the manifest.
+    """
+    # Given
+    python_file = sample_python_file_fixture / "hello.py"
+    compiler = FakeCompilerWrapper()
+    manifest = Manifest.for_input_path(sample_python_file_fixture)
+    _build(python_file)
+    manifest.record(python_file, compiler)
+    # When
+    manifest.record(python_file, compiler, built_after=time.time() + 60)
+    # Then
+    assert "hello.py" not in manifest.entries
+
+
+def test_find_executable(sample_cython_build_fixture):
+    """
+    Given a directory with a `hello.so`
+    When we look for the executable of `hello.py`
+    Then we expect to find it.
+    """
+    python_file = sample_cython_build_fixture / "hello.py"
+    assert find_executable(python_file) == python_file.with_suffix(".so")
+    assert find_executable(python_file.with_name("other.py")) is None
+
+
+def test_file_hash_of_a_package(sample_package_fixture):
+    """
+    Given a package directory
+    When any of its modules changes
+    Then we expect a different hash.
+    """
+    # Given
+    package_folder = sample_package_fixture / "sample_pkg"
+    package_hash = file_hash(package_folder)
+    assert package_hash == file_hash(package_folder)
+    # When
+    (package_folder / "sub" / "second.py").write_text("changed = True")
+    # Then
+    assert file_hash(package_folder) != package_hash
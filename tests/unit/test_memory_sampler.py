@@ -0,0 +1,89 @@
+"""
+Test cases for the memory sampler
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.memory_sampler import (
+    MemorySample,
+    MemorySampler,
+    attribute_samples,
+    read_memory,
+    timeline,
+)
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists("/proc/self/status"), reason="requires procfs"
+)
+
+
+def test_read_memory():
+    """
+    Given the current process
+    Then we expect its RSS to be read, and nothing for a missing process.
+    """
+    sample = read_memory(os.getpid())
+    assert sample.rss > 0
+    assert read_memory(2**22 + 1) is None
+
+
+def test_memory_sampler_samples_a_child_process():
+    """
+    Given a child process which allocates 64 MiB
+    When we sample its memory until it exits
+    Then we expect its peak RSS to include the allocation.
+    """
+    # Given
+    process = subprocess.Popen(  # pylint: disable=R1732
+        [
+            sys.executable,
+            "-c",
+            "import time; data = bytearray(64 * 1024 * 1024); time.sleep(0.3)",
+        ]
+    )
+    # When
+    with MemorySampler(process.pid, interval=0.01) as sampler:
+        process.wait()
+    # Then
+    assert len(sampler.samples) > 2
+    assert max(sample.rss for sample in sampler.samples) > 64 * 1024
+
+
+def test_attribute_samples_to_the_tests():
+    """
+    Given the samples of a run and the start and stop time of its tests
+    When we attribute the samples to the tests
+    Then we expect the baseline and the peak memory of each test,
+    even if a test is shorter than the interval.
+    """
+    # Given
+    samples = [
+        MemorySample(time=0.0, rss=1024, pss=512),
+        MemorySample(time=1.0, rss=4096, pss=2048),
+        MemorySample(time=2.0, rss=2048, pss=1024),
+        MemorySample(time=3.0, rss=1024, pss=None),
+    ]
+    tests = {
+        "test_a": {"start": 0.5, "stop": 2.5},
+        "test_b": {"start": 2.6, "stop": 2.7},
+        "test_c": {"outcome": "passed"},
+    }
+    # When
+    memory = attribute_samples(samples, tests)
+    # Then
+    assert memory == {
+        "test_a": {
+            "baseline_rss_mib": 1.0,
+            "peak_rss_mib": 4.0,
+            "peak_pss_mib": 2.0,
+        },
+        "test_b": {
+            "baseline_rss_mib": 2.0,
+            "peak_rss_mib": 1.0,
+            "peak_pss_mib": None,
+        },
+    }
+    assert timeline(samples)[1] == [1.0, 4.0, 2.0]
@@ -0,0 +1,217 @@
+"""
+Test cases for the benchmark results
+"""
+import csv
+import json
+
+import pytest
+
+from src.isolated import IsolatedRun
+from src.results import (
+    allocation_diff,
+    collect_results,
+    report_results,
+    speedup_table,
+    speedups,
+    write_results,
+)
+
+BASELINE = "CPython 3.11.7"
+
+
+@pytest.fixture(name="runs")
+def runs_fixture(sample_cpu_run_fixture):
+    """
+    The cpu runs of the baseline and of two engines,
+    with the memory run of the baseline.
+    """
+    return [
+        IsolatedRun(
+            engine=BASELINE,
+            bench_type="memory",
+            returncode=0,
+            tests={
+                "test_a.py::test_a": {
+                    "outcome": "passed",
+                    "peak_rss_mib": 42.0,
+                    "baseline_rss_mib": 20.0,
+                    "process_peak_rss_mib": 60.0,
+                }
+            },
+            timeline=[[0.0, 20.0, None], [0.01, 42.0, None]],
+        ),
+        sample_cpu_run_fixture(
+            BASELINE, {"test_a.py::test_a": 4.0, "test_b.py::test_b": 1.0}
+        ),
+        sample_cpu_run_fixture(
+            "Cython", {"test_a.py::test_a": 1.0, "test_b.py::test_b": 1.0}
+        ),
+        sample_cpu_run_fixture("Nuitka", {"test_a.py::test_a": 2.0}),
+    ]
+
+
+def test_collect_results_merges_the_cpu_and_memory_runs(runs):
+    """
+    Given the memory and the cpu runs of an engine
+    When we collect their results
+    Then we expect one result per engine and test with
+    both the timings and the peak memory.
+    """
+    # When
+    results = collect_results(runs)
+    # Then
+    assert len(results) == 5
+    baseline_a = results[0]
+    assert (baseline_a.engine, baseline_a.test) == (
+        BASELINE,
+        "test_a.py::test_a",
+    )
+    assert baseline_a.mean == 4.0
+    assert baseline_a.rounds == 10
+    assert baseline_a.peak_rss_mib == 42.0
+    assert results[1].peak_rss_mib is None
+
+
+def test_speedups_with_geometric_mean(runs):
+    """
+    Given the results of the baseline and two engines
+    When we compute their speedups
+    Then we expect the ratio of the mean times per test
+    and their geometric mean per engine.
+    """
+    # When
+    ratios = speedups(collect_results(runs), baseline=BASELINE)
+    # Then
+    assert ratios["Cython"] == pytest.approx(
+        {
+            "test_a.py::test_a": 4.0,
+            "test_b.py::test_b": 1.0,
+            "geometric_mean": 2.0,
+        }
+    )
+    assert ratios["Nuitka"] == pytest.approx(
+        {"test_a.py::test_a": 2.0, "geometric_mean": 2.0}
+    )
+    table = speedup_table(collect_results(runs), baseline=BASELINE)
+    assert "x4.00 [" in table
+    assert "faster" in table
+    assert table.splitlines()[-1].startswith("geometric_mean")
+
+
+def test_write_results_as_json_and_csv(runs, tmp_path):
+    """
+    Given the results of some runs
+    When we write them to a `.json` and a `.csv` file
+    Then we expect both of them to contain all the results.
+    """
+    # Given
+    results = collect_results(runs)
+    # When
+    write_results(results, baseline=BASELINE, output=tmp_path / "results.json")
+    write_results(results, baseline=BASELINE, output=tmp_path / "results.csv")
+    # Then
+    content = json.loads((tmp_path / "results.json").read_text())
+    assert content["baseline"] == BASELINE
+    assert len(content["results"]) == 5
+    assert content["speedups"]["Cython"]["geometric_mean"] == pytest.approx(2.0)
+    assert content["comparisons"]["Cython"]["test_a.py::test_a"]["speedup"] == (
+        pytest.approx(4.0)
+    )
+    assert "samples" not in content["results"][0]
+    with open(tmp_path / "results.csv", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 5
+    assert rows[0]["peak_rss_mib"] == "42.0"
+
+
+def test_report_results_with_memory(runs, capsys, tmp_path):
+    """
+    Given the memory run of the baseline
+    When we report the results
+    Then we expect the memory table to be printed,
+    and the timeline to be written.
+    """
+    # When
+    report_results(runs, BASELINE, output=tmp_path / "results.json")
+    # Then
+    output = capsys.readouterr().out
+    assert "Memory (MiB)" in output
+    assert "20.0 |     42.0 |        - |         60.0" in output
+    content = json.loads((tmp_path / "results.json").read_text())
+    assert content["timelines"] == {
+        BASELINE: [[0.0, 20.0, None], [0.01, 42.0, None]]
+    }
+
+
+def test_report_results_without_engines(sample_cpu_run_fixture, capsys):
+    """
+    Given only the baseline runs
+    When we report them
+    Then we expect no speedups table to be printed.
+    """
+    report_results(
+        [sample_cpu_run_fixture(BASELINE, {"test_a.py::test_a": 1.0})], BASELINE
+    )
+    assert "Speedup" not in capsys.readouterr().out
+
+
+def _traced_run(engine, sites):
+    return IsolatedRun(
+        engine=engine,
+        bench_type="memory",
+        returncode=0,
+        tests={
+            "test_a.py::test_a": {
+                "outcome": "passed",
+                "peak_rss_mib": 50.0,
+                "peak_traced_mib": 12.0,
+                "retained_mib": 0.0,
+                "retained_blocks": 3,
+                "allocation_sites": [
+                    {"site": site, "size": size, "blocks": size // 64}
+                    for site, size in sites.items()
+                ],
+            }
+        },
+    )
+
+
+def test_allocation_diff_between_engines(capsys, tmp_path):
+    """
+    Given the traced memory runs of the baseline and of an engine
+    When we report their results
+    Then we expect the allocation sites of the engine to be diffed
+    from the baseline ones, with the largest difference first.
+    """
+    # Given
+    runs = [
+        _traced_run(BASELINE, {"a.py:2": 6400, "test_a.py:5": 640}),
+        _traced_run("Cython", {"test_a.py:5": 128000}),
+    ]
+    # When
+    results = report_results(runs, BASELINE, output=tmp_path / "results.json")
+    # Then
+    diff = allocation_diff(results, BASELINE)
+    assert diff == {
+        "Cython": {
+            "test_a.py::test_a": [
+                {
+                    "site": "test_a.py:5",
+                    "size_diff": 127360,
+                    "blocks_diff": 1990,
+                },
+                {"site": "a.py:2", "size_diff": -6400, "blocks_diff": -100},
+            ]
+        }
+    }
+    output = capsys.readouterr().out
+    assert "Allocations (MiB)" in output
+    assert "`Cython` test_a.py::test_a: test_a.py:5 +0.1 MiB, +1990 blocks" in (
+        output
+    )
+    content = json.loads((tmp_path / "results.json").read_text())
+    assert content["allocations"]["diffs"] == diff
+    assert content["allocations"]["sites"]["Cython"]["test_a.py::test_a"] == [
+        {"site": "test_a.py:5", "size": 128000, "blocks": 2000}
+    ]
+    assert "allocation_sites" not in content["results"][0]
@@ -0,0 +1,119 @@
+"""
+Test cases for the benchmark statistics
+"""
+import math
+
+import pytest
+
+from src.stats import (
+    FASTER,
+    MAX_BOOTSTRAP_SAMPLES,
+    NO_DIFFERENCE,
+    SLOWER,
+    SamplingOptions,
+    batch_means,
+    compare,
+    mann_whitney_u,
+    relative_ci,
+    sampling_from_options,
+    summarize,
+)
+
+BASELINE = [1.0, 1.02, 0.98, 1.01, 0.99, 1.03, 0.97, 1.0]
+
+
+def test_sampling_options_pytest_args():
+    """
+    Given the sampling options
+    When we get the arguments of a rerun
+    Then we expect twice the minimum rounds on each rerun,
+    and no warmup without warmup iterations.
+    """
+    sampling = SamplingOptions(min_rounds=5)
+    assert "--benchmark-min-rounds=5" in sampling.pytest_args()
+    assert "--benchmark-min-rounds=20" in sampling.pytest_args(rerun=2)
+    assert "--benchmark-warmup=on" in sampling.pytest_args()
+    assert (
+        "--benchmark-warmup=off"
+        in SamplingOptions(warmup_iterations=0).pytest_args()
+    )
+    assert sampling_from_options(0, 5, 0.001, 1.0, target_ci=0).max_reruns == 0
+    assert (
+        "--benchmark-min-time=0.001"
+        in sampling_from_options(0, 5, 0.001, 1.0, target_ci=5).pytest_args()
+    )
+
+
+def test_summarize_and_relative_ci():
+    """
+    Given some samples
+    Then we expect their statistics and the relative width
+    of the confidence interval of their mean.
+    """
+    stats = summarize([1.0, 2.0, 3.0])
+    assert stats == {
+        "min": 1.0,
+        "max": 3.0,
+        "mean": 2.0,
+        "median": 2.0,
+        "stddev": 1.0,
+        "rounds": 3,
+    }
+    assert relative_ci([1.0, 2.0, 3.0]) == pytest.approx(
+        1.959964 / math.sqrt(3) / 2 * 100
+    )
+    assert relative_ci([1.0]) == math.inf
+    assert relative_ci(BASELINE) < relative_ci([1.0, 2.0, 3.0])
+
+
+def test_mann_whitney_u():
+    """
+    Given two groups of samples
+    Then we expect a small p-value only if they are separated.
+    """
+    assert mann_whitney_u([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]) == pytest.approx(
+        0.0122, abs=1e-3
+    )
+    assert mann_whitney_u([1, 2, 3, 4, 5], [1, 2, 3, 4, 5]) == 1.0
+    assert mann_whitney_u([1, 1, 1], [1, 1, 1]) == 1.0
+
+
+@pytest.mark.parametrize(
+    "factor, verdict",
+    [(0.5, FASTER), (2.0, SLOWER), (1.0, NO_DIFFERENCE)],
+)
+def test_compare(factor, verdict):
+    """
+    Given the samples of the baseline and of an engine
+    When we compare them
+    Then we expect the speedup with its confidence interval and the verdict.
+    """
+    # Given
+    samples = [value * factor for value in reversed(BASELINE)]
+    # When
+    comparison = compare(BASELINE, samples)
+    # Then
+    assert comparison.verdict == verdict
+    assert comparison.low <= comparison.speedup <= comparison.high
+    assert comparison.speedup == pytest.approx(1 / factor)
+    assert verdict in str(comparison)
+    assert compare(BASELINE, [1.0]) is None
+
+
+def test_compare_large_samples():
+    """
+    Given large groups of samples of the baseline and of an engine
+    When we compare them
+    Then we expect them to be bootstrapped as the means of their batches.
+    """
+    # Given
+    baseline = BASELINE * 2500
+    samples = [value * 0.5 for value in baseline]
+    # When
+    comparison = compare(baseline, samples)
+    # Then
+    assert len(batch_means(baseline)) == MAX_BOOTSTRAP_SAMPLES
+    assert batch_means(BASELINE) == BASELINE
+    assert comparison.verdict == FASTER
+    assert comparison.low <= comparison.speedup <= comparison.high
+    assert comparison.speedup == pytest.approx(2.0)
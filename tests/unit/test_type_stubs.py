@@ -0,0 +1,164 @@
+"""
+Test cases for the Cython typing stubs
+"""
+
+
+from src.type_stubs import (
+    GENERATED_HEADER,
+    TypedCythonWrapper,
+    cython_type,
+    eligible_functions,
+    stubs_table,
+    trace_types,
+    write_stubs,
+)
+
+MODULE = "src.type_stubs"
+
+
+# A module with a typed loop, a closure, a function with a huge integer
+# and functions with locals which can be None, with its test file.
+PROJECT_FILES = {
+    "loops.py": (
+        "def total(n, scale=1.0):\n"
+        "    result = 0.0\n"
+        "    for index in range(n):\n"
+        "        result += index * scale\n"
+        "    return result\n\n\n"
+        "def mean(values):\n"
+        "    return sum(value for value in values) / len(values)\n\n\n"
+        "def huge():\n"
+        "    value = 2**70\n"
+        "    return value\n\n\n"
+        "def biggest(values):\n"
+        "    best = None\n"
+        "    for value in values:\n"
+        "        if best is None or value > best:\n"
+        "            best = value\n"
+        "    return best\n\n\n"
+        "def clamp(value):\n"
+        "    result = value\n"
+        "    if value < 0:\n"
+        "        result = None\n"
+        "    return result\n"
+    ),
+    "test_loops.py": (
+        "from loops import biggest, clamp, huge, mean, total\n\n\n"
+        "def test_loops():\n"
+        "    assert total(10) == 45.0\n"
+        "    assert mean([1.0, 2.0]) == 1.5\n"
+        "    assert huge() == 2**70\n"
+        "    assert biggest([3, 7, 5]) == 7\n"
+        "    assert clamp(5) == 5\n"
+    ),
+}
+
+
+def test_cython_type():
+    """
+    Given the traced types of a few variables
+    When we get their cython type
+    Then we expect only the stable and safe ones to be typed.
+    """
+    assert cython_type({"types": ["int"], "max_abs": 10}) == "cython.longlong"
+    assert cython_type({"types": ["int"], "max_abs": 2**60}) is None
+    assert cython_type({"types": ["float"], "max_abs": 0}) == "cython.double"
+    assert cython_type({"types": ["list", "NoneType"], "max_abs": 0}) == "list"
+    assert cython_type({"types": ["int", "float"], "max_abs": 1}) is None
+    assert cython_type({"types": ["object"], "max_abs": 0}) is None
+
+
+def test_eligible_functions():
+    """
+    Given functions which can't be `cpdef` ones
+    When we check the eligible functions
+    Then we expect the reason of each one.
+    """
+    source = (
+        "import functools\n\n"
+        "def plain(a):\n    return [a for _ in range(3)]\n\n"
+        "@functools.cache\ndef cached(a):\n    return a\n\n"
+        "def many(*args):\n    return args\n\n"
+        "def gen():\n    yield 1\n\n"
+        "def outer():\n    return lambda: 1\n"
+    )
+    assert eligible_functions(source) == {
+        "plain": None,
+        "cached": "decorated",
+        "many": "variable or keyword-only arguments",
+        "gen": "generator",
+        "outer": "closure",
+    }
+
+
+def test_trace_types_and_write_stubs(sample_project_fixture):
+    """
+    Given a module with its tests
+    When we trace its types and write its stubs
+    Then we expect the `.pxd` file to type the stable variables,
+    and the other functions to be skipped.
+    """
+    project = sample_project_fixture(PROJECT_FILES)
+    # When
+    stubs = trace_types(project, [project / "loops.py"])
+    written = write_stubs(stubs)
+    # Then
+    assert written == [project.resolve() / "loops.pxd"]
+    pxd = written[0].read_text()
+    assert pxd.startswith(GENERATED_HEADER)
+    assert (
+        "@cython.locals(n=cython.longlong, scale=cython.double, "
+        "result=cython.double, index=cython.longlong)\n"
+        "cpdef double total(n, scale=*)"
+    ) in pxd
+    assert "mean" not in pxd
+    assert "huge" not in pxd
+    assert (
+        "@cython.locals(values=list, value=cython.longlong)\n"
+        "cpdef biggest(values)"
+    ) in pxd
+    assert "@cython.locals(value=cython.longlong)\ncpdef clamp(value)" in pxd
+    table = stubs_table(stubs, root=project.resolve())
+    assert "skipped: closure" in table
+    assert "skipped: no stable types" in table
+
+
+def test_write_stubs_keeps_the_existing_pxd(sample_project_fixture):
+    """
+    Given a hand-written `.pxd` file
+    When we write the stubs of its module
+    Then we expect it to be kept.
+    """
+    # Given
+    project = sample_project_fixture(PROJECT_FILES)
+    (project / "loops.pxd").write_text("cpdef total(n, scale=*)\n")
+    stubs = trace_types(project, [project / "loops.py"])
+    # When
+    written = write_stubs(stubs)
+    # Then
+    assert not written
+    assert (project / "loops.pxd").read_text() == "cpdef total(n, scale=*)\n"
+
+
+def test_typed_cython_wrapper_writes_the_stubs_of_a_copy(
+    sample_project_fixture, tmp_path
+):
+    """
+    Given the stubs of a project
+    When the typed compiler writes them within a copy of it
+    Then we expect the `.pxd` files to be written within the copy.
+    """
+    # Given
+    project = sample_project_fixture(PROJECT_FILES)
+    copy = tmp_path / "copy"
+    copy.mkdir()
+    (copy / "loops.py").write_text((project / "loops.py").read_text())
+    compiler = TypedCythonWrapper(
+        stubs=trace_types(project, [project / "loops.py"]), root=project
+    )
+    # When
+    written = compiler.write_stubs(copy)
+    # Then
+    assert written == [copy / "loops.pxd"]
+    assert not (project / "loops.pxd").exists()
+    assert str(compiler) == "Cython (typed)"
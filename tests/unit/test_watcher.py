@@ -0,0 +1,181 @@
+"""
+Test cases for the watch mode
+"""
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.watcher import (
+    InotifyWatcher,
+    PollingWatcher,
+    WatchHandler,
+    debounce,
+    is_ignored_dir,
+)
+from tests.fakes import FakeCompilerWrapper
+
+MODULE = "src.watcher"
+
+
+class FakeWatcher:
+    """
+    Replays a list of changes.
+    """
+
+    def __init__(self, changes):
+        self._changes = list(changes)
+
+    def changes(self, timeout):  # pylint: disable=unused-argument
+        return self._changes.pop(0) if self._changes else set()
+
+    def close(self):
+        pass
+
+
+def test_polling_watcher_changes(sample_python_file_fixture):
+    """
+    Given a watched directory
+    When a module is modified and another one is created
+    Then we expect both of them (and the `.pxd` file) to be reported,
+    but not the other files.
+    """
+    # Given
+    sample_folder = sample_python_file_fixture.resolve()
+    watcher = PollingWatcher(sample_folder, interval=0.01)
+    assert watcher.changes(timeout=0.05) == set()
+    # When
+    (sample_folder / "hello.py").write_text("print('changed module')")
+    (sample_folder / "new.py").write_text("x = 1")
+    (sample_folder / "hello.pxd").write_text("cdef int x")
+    (sample_folder / "hello.c").write_text("int x;")
+    # Then
+    assert watcher.changes(timeout=1) == {
+        sample_folder / "hello.py",
+        sample_folder / "new.py",
+        sample_folder / "hello.pxd",
+    }
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="requires inotify"
+)
+def test_inotify_watcher_changes(sample_python_file_fixture):
+    """
+    Given a watched directory
+    When a module (and its `.pxd` file) is modified and a module is created
+    within a new directory
+    Then we expect all of them to be reported, but not the build files.
+    """
+    # Given
+    sample_folder = sample_python_file_fixture.resolve()
+    watcher = InotifyWatcher(sample_folder)
+    try:
+        assert watcher.changes(timeout=0.05) == set()
+        # When
+        (sample_folder / "hello.py").write_text("print('changed module')")
+        (sample_folder / "hello.pxd").write_text("cdef int x")
+        (sample_folder / "hello.build").mkdir()
+        (sample_folder / "hello.build" / "module.py").touch()
+        assert debounce(watcher, delay=0.2) == {
+            sample_folder / "hello.py",
+            sample_folder / "hello.pxd",
+        }
+        (sample_folder / "sub").mkdir()
+        (sample_folder / "sub" / "new.py").write_text("x = 1")
+        changed = debounce(watcher, delay=0.2)
+        # Then
+        assert sample_folder / "sub" / "new.py" in changed
+    finally:
+        watcher.close()
+
+
+def test_debounce_merges_bursts_of_changes():
+    """
+    Given a burst of changes
+    When we debounce them
+    Then we expect all of them at once.
+    """
+    watcher = FakeWatcher([{Path("a.py")}, {Path("b.py")}, set(), {"c.py"}])
+    assert debounce(watcher, delay=0.1) == {Path("a.py"), Path("b.py")}
+
+
+def test_is_ignored_dir():
+    """
+    Given the build and the tools directories
+    Then we expect them not to be watched.
+    """
+    assert is_ignored_dir(Path("hello.build"))
+    assert is_ignored_dir(Path(".pycompile"))
+    assert not is_ignored_dir(Path("module"))
+
+
+@patch(MODULE + ".CompilerHandler")
+def test_watch_handler_rebuilds_the_dependents(mocked_handler, tmp_path):
+    """
+    Given a watched module which is imported by another one
+    When it changes
+    Then we expect only the module and its dependents to be compiled (using
+    the manifest) and rebuilt, with the changed tests,
+    and the changes of its `.pxd` file to rebuild them without a rediscovery.
+    """
+    # Given
+    folder = tmp_path.resolve()
+    (folder / "base.py").write_text("X = 1\n")
+    (folder / "app.py").write_text("import base\n")
+    (folder / "other.py").write_text("Y = 2\n")
+    (folder / "test_app.py").write_text("def test_app():\n    pass\n")
+    watch_handler = WatchHandler(
+        input_path=folder, compiler=FakeCompilerWrapper()
+    )
+    # When
+    rebuilt = watch_handler.rebuild(
+        {folder / "base.py", folder / "test_app.py"}
+    )
+    # Then
+    assert rebuilt == {
+        folder / "base.py",
+        folder / "app.py",
+        folder / "test_app.py",
+    }
+    assert mocked_handler.call_args.kwargs["files"] == {
+        str(folder): [folder / "app.py", folder / "base.py"]
+    }
+    assert mocked_handler.call_args.kwargs["manifest"] is watch_handler.manifest
+    mocked_handler.return_value.start.assert_called_once()
+    assert watch_handler.test_files(rebuilt) == {folder: ["test_app.py"]}
+    (folder / "base.pxd").write_text("cdef int X\n")
+    with patch.object(watch_handler, "_discover") as mocked_discover:
+        assert watch_handler.rebuild({folder / "base.pxd"}) == {
+            folder / "base.py",
+            folder / "app.py",
+        }
+    mocked_discover.assert_not_called()
+
+
+@patch(MODULE + ".Benchmark.test_bench")
+@patch(MODULE + ".create_watcher")
+@patch(MODULE + ".CompilerHandler")
+def test_watch_handler_start_with_bench(
+    _, mocked_create_watcher, mocked_test_bench, tmp_path
+):
+    """
+    Given a `WatchHandler` with `bench` on
+    When a module with a test file changes
+    Then we expect its test file to be benchmarked after the rebuild.
+    """
+    # Given
+    folder = tmp_path.resolve()
+    (folder / "fib.py").write_text("X = 1\n")
+    (folder / "test_fib.py").write_text("def test_fib():\n    pass\n")
+    mocked_create_watcher.return_value = FakeWatcher([{folder / "fib.py"}])
+    watch_handler = WatchHandler(
+        input_path=folder, compiler=FakeCompilerWrapper(), bench=True
+    )
+    # When
+    watch_handler.start(rebuilds=1)
+    # Then
+    mocked_test_bench.assert_called_once_with(
+        input_path=folder, test_files=["test_fib.py"]
+    )
@@ -0,0 +1,89 @@
+"""
+Test cases for the benchmark `Workspace`
+"""
+import os
+from unittest.mock import patch
+
+from src.helpers import decorate_functions
+from src.workspace import Workspace
+
+MODULE = "src.workspace"
+
+
+def _project(root):
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "module.py").write_text("def fn():\n    return 1\n")
+    (root / "data.json").write_text("{}")
+    (root / ".venv" / "lib").mkdir(parents=True)
+    (root / ".venv" / "lib" / "site.py").touch()
+    (root / "__pycache__").mkdir()
+    return root
+
+
+def test_workspace_links_the_data_files(tmp_path):
+    """
+    Given a project with a virtual environment and data files
+    When we materialise its workspace
+    Then we expect the modules to be independent files, the data files to be
+    hardlinked and the virtual environment to be skipped.
+    """
+    # Given
+    project = _project(tmp_path / "project")
+    workspace = Workspace(from_dir=project)
+    # When
+    with workspace as temp_dir:
+        # Then
+        assert (temp_dir / "pkg" / "module.py").read_text() == (
+            project / "pkg" / "module.py"
+        ).read_text()
+        assert not (temp_dir / ".venv").exists()
+        assert not (temp_dir / "__pycache__").exists()
+        assert not os.path.samefile(
+            temp_dir / "pkg" / "module.py", project / "pkg" / "module.py"
+        )
+        if workspace.stats.hardlinked:
+            assert os.path.samefile(
+                temp_dir / "data.json", project / "data.json"
+            )
+        assert (
+            workspace.stats.reflinked
+            + workspace.stats.copied
+            + workspace.stats.hardlinked
+            == 2
+        )
+    assert not temp_dir.exists()
+
+
+@patch(MODULE + ".fcntl.ioctl", side_effect=OSError("not supported"))
+@patch(MODULE + ".os.link", side_effect=OSError("cross-device link"))
+def test_workspace_falls_back_to_copies(_, __, tmp_path):
+    """
+    Given a filesystem without reflinks and hardlinks
+    When we materialise a workspace
+    Then we expect all the files to be copied.
+    """
+    project = _project(tmp_path / "project")
+    workspace = Workspace(from_dir=project)
+    workspace.materialize(tmp_path)
+    assert (workspace.stats.copied, workspace.stats.hardlinked) == (2, 0)
+    assert (tmp_path / "data.json").read_text() == "{}"
+
+
+def test_decorate_functions_replaces_hardlinked_files(tmp_path):
+    """
+    Given a module hardlinked to its original
+    When we decorate its functions
+    Then we expect the original to be unchanged.
+    """
+    original = tmp_path / "module.py"
+    original.write_text("def fn_benchmark():\n    return 1\n")
+    linked = tmp_path / "linked.py"
+    os.link(original, linked)
+    decorate_functions(
+        "from memory_profiler import profile",
+        "profile",
+        files=[linked],
+        func_name_pattern="benchmark",
+    )
+    assert "@profile" in linked.read_text()
+    assert "@profile" not in original.read_text()